@@ -1,13 +1,29 @@
-import kagglehub
-    
-    # Authenticate
-    kagglehub.login() # This will prompt you for your credentials.
-    # We also offer other ways to authenticate (credential file & env variables): https://github.com/Kaggle/kagglehub?tab=readme-ov-file#authenticate
-    
-    # Download latest version
-    path = kagglehub.model_download("google/gemma/pyTorch/2b")
-    
-    # Download specific version (here version 1)
-    path = kagglehub.model_download("google/gemma/pyTorch/2b/1")
-    
-    print("Path to model files:", path)
\ No newline at end of file
+# MIMIC.py
+# Fetch the Gemma 2B PyTorch weights through the chuk_fetch cache.
+#
+# The model is fetched once into the content-addressed cache; later runs find
+# it there without a prompt or network access. Point --mirror (or
+# $CHUK_FETCH_MIRRORS) at a local directory or file server holding the model to
+# avoid Kaggle entirely. Kaggle credentials, when needed, come from the
+# KAGGLE_USERNAME/KAGGLE_KEY environment variables or ~/.kaggle/kaggle.json.
+#
+#   python MIMIC.py
+#   python MIMIC.py --mirror http://models.local:8000 --offline
+import argparse
+
+import chuk_fetch
+
+MODEL_HANDLE = "google/gemma/pyTorch/2b/1"  # pinned, so the cache entry never goes stale
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch the Gemma model files")
+    parser.add_argument("--handle", default=MODEL_HANDLE, help=f"model handle (default: {MODEL_HANDLE})")
+    parser.add_argument("--mirror", action="append", default=None, help="local directory or http(s) URL to fetch from")
+    parser.add_argument("--cache-dir", default=None, help="cache location")
+    parser.add_argument("--offline", action="store_true", help="never fall back to Kaggle")
+    args = parser.parse_args()
+    try:
+        path = chuk_fetch.fetch(args.handle, args.cache_dir, args.mirror, args.offline or None)
+    except chuk_fetch.FetchError as error:
+        raise SystemExit(str(error))
+    print("Path to model files:", path)
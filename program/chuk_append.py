@@ -0,0 +1,117 @@
+# chuk_append.py
+# Support for extending an existing dataset by a new time window.
+#
+# chuk_dataset_summary.json records the watermark (the end of the generated
+# time-series window) and the entity counts. An append run reads both, loads
+# the reference entities back from disk, generates the time-series records of
+# [watermark, new end) only and writes them as further chunk files. Counts
+# for the window follow the per-day rate of the existing data. Admissions that
+# were still open at the old watermark are closed if their stay ends inside
+# the new window; only the chunk files holding such admissions are rewritten.
+import datetime
+import json
+import os
+
+import numpy as np
+
+import chuk_io
+from chuk_vocab import DISCHARGE_REASONS
+
+SUMMARY_FILE = "chuk_dataset_summary.json"
+MAX_STAY_DAYS = 30  # matches the 1-30 day stays of chuk_batch.generate_admissions
+
+# --- Summary ---
+def load_summary(data_dir):
+    path = os.path.join(data_dir, SUMMARY_FILE)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{path} not found; generate a dataset before appending to it")
+    with open(path) as f:
+        return json.load(f)
+
+def data_window(summary):
+    """(start, watermark) datetimes of the time-series data a summary describes.
+
+    Summaries written before watermarks were recorded only have the
+    "YYYY-MM-DD to YYYY-MM-DD" data_period; their window ended at generation
+    time.
+    """
+    info = summary["dataset_info"]
+    if "watermark" in info:
+        return (datetime.datetime.fromisoformat(info["start_date"]),
+                datetime.datetime.fromisoformat(info["watermark"]))
+    start = datetime.datetime.fromisoformat(info["data_period"].split(" to ")[0])
+    return start, datetime.datetime.fromisoformat(info["generation_date"])
+
+def window_counts(summary, entities, window_start, window_end, overrides=None):
+    """Records per entity for a new window, at the per-day rate of the existing data"""
+    start, watermark = data_window(summary)
+    existing_days = max((watermark - start).total_seconds(), 1) / 86400
+    window_days = (window_end - window_start).total_seconds() / 86400
+    counts = {}
+    for entity in entities:
+        override = (overrides or {}).get(entity)
+        if override is not None:
+            counts[entity] = override
+        else:
+            counts[entity] = int(round(summary["entity_counts"].get(entity, 0) / existing_days * window_days))
+    return counts
+
+def window_seed(seed, window_start):
+    """Seed for the random streams of one appended window"""
+    sequence = np.random.SeedSequence([seed, int(window_start.timestamp())])
+    return int(sequence.generate_state(1)[0])
+
+# --- Existing Files ---
+def next_chunk_index(entity, data_dir):
+    """Number of the first chunk file an append may write without overwriting"""
+    numbers = [chuk_io.chunk_number(os.path.basename(path)) for path in chuk_io.entity_files(entity, data_dir)]
+    numbers = [number for number in numbers if number >= 0]
+    return max(numbers) + 1 if numbers else 0
+
+def load_patient_columns(data_dir):
+    """Patient IDs and insurance coverage, streamed from the patient files"""
+    patient_ids, coverage = [], []
+    for patient in chuk_io.iter_entity("patients", data_dir):
+        patient_ids.append(patient["patient_id"])
+        coverage.append(patient["insurance_info"]["coverage_percentage"])
+    return patient_ids, coverage
+
+# --- Open Admissions ---
+def close_open_admissions(data_dir, rng, watermark, window_end):
+    """Discharge open admissions whose stay ends by window_end.
+
+    An admission that is open was still in hospital at the watermark, so each
+    draws a remaining stay of 1-30 days from rng, in whole days from the last
+    time of day it was admitted at before the watermark. Discharges thus fall
+    after the watermark and keep the admission's time of day, as in first
+    generation. If the stay ends by window_end the admission gets a discharge
+    date, reason and total cost, like the admissions that were discharged
+    when first generated. Returns the number of admissions closed.
+    """
+    watermark = np.datetime64(watermark, "us")
+    window_end = np.datetime64(window_end, "us")
+    closed = 0
+    for path in chuk_io.entity_files("admissions", data_dir):
+        records = list(chuk_io.iter_file(path))
+        open_rows = [i for i, record in enumerate(records) if record.get("discharge_date") is None]
+        if not open_rows:
+            continue
+        admitted = np.array([records[i]["admission_date"] for i in open_rows], dtype="datetime64[us]")
+        stay = rng.randint(1, MAX_STAY_DAYS + 1, len(open_rows)).astype("timedelta64[D]")
+        # Whole days from admission up to the watermark, then the stay
+        past = np.maximum((watermark - admitted) // np.timedelta64(1, "D"), 0)
+        discharge = admitted + past.astype("timedelta64[D]") + stay
+        ends = discharge <= window_end
+        if not ends.any():
+            continue
+        reasons = rng.randint(0, len(DISCHARGE_REASONS), len(open_rows))
+        costs = np.round(rng.uniform(50000, 2000000, len(open_rows)), 0)  # RWF
+        discharge_dates = np.datetime_as_string(discharge, unit="us").tolist()
+        for k, i in enumerate(open_rows):
+            if ends[k]:
+                records[i]["discharge_date"] = discharge_dates[k]
+                records[i]["discharge_reason"] = DISCHARGE_REASONS[reasons[k]]
+                records[i]["total_cost"] = float(costs[k])
+        chuk_io.rewrite_file(path, records)
+        closed += int(ends.sum())
+    return closed
@@ -0,0 +1,588 @@
+# chuk_batch.py
+# Vectorized batch generation for the six time-series entities.
+#
+# Rather than building one dict per record, each entity is drawn as a set of
+# NumPy columns in a handful of calls: integer indices into the patient and
+# doctor tables, datetime64 timestamps, small integer codes for categorical
+# fields, and float arrays for costs and vital signs. Variable-length lists
+# (secondary diagnoses, prescription items, billing services) are stored as a
+# nested column group holding an "offsets" array plus one array per child
+# field. Records are only assembled into dicts when they are exported.
+import numpy as np
+
+from chuk_vocab import (
+    get_medical_conditions, get_lab_tests, get_medications,
+    APPOINTMENT_TYPES, APPOINTMENT_STATUSES, APPOINTMENT_COMPLAINTS, APPOINTMENT_PRIORITIES,
+    ADMISSION_TYPES, DISCHARGE_REASONS, VISIT_TYPES, VISIT_COMPLAINTS,
+    HIV_RESULTS, GENERIC_RESULTS, LAB_STATUSES, DOSAGES, FREQUENCIES, PRESCRIPTION_STATUSES,
+    SERVICE_TYPES, PAYMENT_STATUSES, PAYMENT_METHODS,
+)
+
+TIMESERIES_ENTITIES = ["appointments", "admissions", "medical_records",
+                       "laboratory_tests", "prescriptions", "billing_records"]
+
+# Lab technicians are drawn from the first names of the chuk_pools name pool
+LAB_TECHNICIAN_POOL_SIZE = 1000
+
+# Rows drawn per column batch; bounds memory when records are streamed
+BLOCK_SIZE = 10000
+
+APPOINTMENT_TIMES = [f"{hour:02d}:{minute}" for hour in range(8, 18) for minute in ["00", "30"]]
+LAB_RESULTS = HIV_RESULTS + GENERIC_RESULTS
+
+# Vocabulary of every categorical column, keyed by entity then column name.
+# Columns inside a nested group are addressed as "<group>.<field>".
+CATEGORIES = {
+    "appointments": {
+        "appointment_time": APPOINTMENT_TIMES,
+        "type": APPOINTMENT_TYPES,
+        "status": APPOINTMENT_STATUSES,
+        "chief_complaint": APPOINTMENT_COMPLAINTS,
+        "priority": APPOINTMENT_PRIORITIES,
+        "notes": get_medical_conditions(),
+    },
+    "admissions": {
+        "admission_type": ADMISSION_TYPES,
+        "primary_diagnosis": get_medical_conditions(),
+        "secondary_diagnoses.values": get_medical_conditions(),
+        "admission_reason": get_medical_conditions(),
+        "discharge_reason": DISCHARGE_REASONS,
+    },
+    "medical_records": {
+        "visit_type": VISIT_TYPES,
+        "chief_complaint": VISIT_COMPLAINTS,
+        "history_of_present_illness": get_medical_conditions(),
+        "diagnosis": get_medical_conditions(),
+        "medications_prescribed.values": get_medications(),
+    },
+    "laboratory_tests": {
+        "test_name": get_lab_tests(),
+        "result": LAB_RESULTS,
+        "status": LAB_STATUSES,
+    },
+    "prescriptions": {
+        "medications.medication_name": get_medications(),
+        "medications.dosage": DOSAGES,
+        "medications.frequency": FREQUENCIES,
+        "status": PRESCRIPTION_STATUSES,
+    },
+    "billing_records": {
+        "services.service_type": SERVICE_TYPES,
+        "payment_status": PAYMENT_STATUSES,
+        "payment_method": PAYMENT_METHODS,
+    },
+}
+
+# --- Reference Tables ---
+def build_refs(patient_ids, patient_coverage, doctors, pools, patient_registration=None):
+    """Flatten the reference entities into the arrays the batch generators index into.
+
+    Patients are passed as their IDs and insurance coverage percentages only,
+    so the full patient records never have to be held in memory. pools are
+    the chuk_pools value pools; "names" and "sentences" are only needed for
+    laboratory tests and billing records. Registration dates are only needed by
+    chuk_journeys.
+    """
+    refs = {
+        "patient_ids": np.array(patient_ids, dtype=object),
+        "patient_coverage": np.array(patient_coverage, dtype=np.int16),
+        "doctor_ids": np.array([d["doctor_id"] for d in doctors], dtype=object),
+        "doctor_departments": np.array([d["department_id"] for d in doctors], dtype=object),
+    }
+    # Only laboratory tests and billing records draw from the pools
+    if "names" in pools:
+        refs["lab_technicians"] = np.array(pools["names"][:LAB_TECHNICIAN_POOL_SIZE], dtype=object)
+    if "sentences" in pools:
+        refs["service_sentences"] = np.array(pools["sentences"], dtype=object)
+    if patient_registration is not None:
+        refs["patient_registration"] = np.array(patient_registration, dtype="datetime64[us]")
+    return refs
+
+# --- Column Helpers ---
+def random_datetimes(rng, n, start_date, end_date):
+    """Uniform datetime64[us] timestamps between two datetimes"""
+    start = np.datetime64(start_date, "us")
+    span = (np.datetime64(end_date, "us") - start).astype(np.int64)
+    return start + (rng.random_sample(n) * span).astype("timedelta64[us]")
+
+def random_codes(rng, vocabulary, n):
+    """Uniform categorical codes into a vocabulary list"""
+    return rng.randint(0, len(vocabulary), n).astype(np.int8)
+
+def random_costs(rng, low, high, n, decimals=0):
+    return np.round(rng.uniform(low, high, n), decimals)
+
+def _offsets(counts):
+    offsets = np.zeros(len(counts) + 1, dtype=np.int64)
+    np.cumsum(counts, out=offsets[1:])
+    return offsets
+
+def random_lists(rng, n, count_low, count_high):
+    """Offsets for n lists with count_low..count_high items each"""
+    return _offsets(rng.randint(count_low, count_high + 1, n))
+
+def random_samples(rng, n, vocabulary, count_low, count_high):
+    """Per-row samples of distinct vocabulary items, like random.sample, as a nested group"""
+    counts = rng.randint(count_low, count_high + 1, n)
+    picks = rng.random_sample((n, len(vocabulary))).argsort(axis=1)[:, :count_high]
+    mask = np.arange(count_high) < counts[:, None]
+    return {"offsets": _offsets(counts), "values": picks[mask].astype(np.int8)}
+
+def num_rows(columns):
+    for value in columns.values():
+        return len(value["offsets"]) - 1 if isinstance(value, dict) else len(value)
+    return 0
+
+def slice_rows(columns, start, stop):
+    """Rows [start, stop) of a column batch, re-basing nested group offsets"""
+    sliced = {}
+    for name, value in columns.items():
+        if isinstance(value, dict):
+            offsets = value["offsets"][start:stop + 1]
+            lo, hi = offsets[0], offsets[-1]
+            group = {"offsets": offsets - lo}
+            for child, child_value in value.items():
+                if child != "offsets":
+                    group[child] = child_value[lo:hi]
+            sliced[name] = group
+        else:
+            sliced[name] = value[start:stop]
+    return sliced
+
+# --- Batch Generators ---
+def generate_appointments(rng, n, refs, start_date, end_date):
+    return {
+        "patient_idx": rng.randint(0, len(refs["patient_ids"]), n).astype(np.int32),
+        "doctor_idx": rng.randint(0, len(refs["doctor_ids"]), n).astype(np.int32),
+        "appointment_date": random_datetimes(rng, n, start_date, end_date),
+        "appointment_time": random_codes(rng, APPOINTMENT_TIMES, n),
+        "type": random_codes(rng, APPOINTMENT_TYPES, n),
+        "status": random_codes(rng, APPOINTMENT_STATUSES, n),
+        "chief_complaint": random_codes(rng, APPOINTMENT_COMPLAINTS, n),
+        "priority": random_codes(rng, APPOINTMENT_PRIORITIES, n),
+        "estimated_duration": rng.randint(15, 121, n).astype(np.int16),  # minutes
+        "notes": random_codes(rng, get_medical_conditions(), n),
+    }
+
+def generate_admissions(rng, n, refs, start_date, end_date):
+    admission_date = random_datetimes(rng, n, start_date, end_date)
+    # Some patients are still admitted
+    stay = rng.randint(1, 31, n).astype("timedelta64[D]")
+    discharged = (rng.random_sample(n) < 0.7) & (admission_date + stay <= np.datetime64(end_date, "us"))
+    discharge_date = np.where(discharged, admission_date + stay, np.datetime64("NaT", "us"))
+    return {
+        "patient_idx": rng.randint(0, len(refs["patient_ids"]), n).astype(np.int32),
+        "doctor_idx": rng.randint(0, len(refs["doctor_ids"]), n).astype(np.int32),
+        "admission_date": admission_date,
+        "discharge_date": discharge_date,
+        "admission_type": random_codes(rng, ADMISSION_TYPES, n),
+        "room_number": (rng.randint(1, 6, n) * 100 + rng.randint(10, 100, n)).astype(np.int16),
+        "bed_number": rng.randint(1, 5, n).astype(np.int8),
+        "primary_diagnosis": random_codes(rng, get_medical_conditions(), n),
+        "secondary_diagnoses": random_samples(rng, n, get_medical_conditions(), 0, 2),
+        "admission_reason": random_codes(rng, get_medical_conditions(), n),
+        "discharge_reason": np.where(discharged, random_codes(rng, DISCHARGE_REASONS, n), -1).astype(np.int8),
+        "total_cost": np.where(discharged, random_costs(rng, 50000, 2000000, n), np.nan),  # RWF
+    }
+
+def generate_medical_records(rng, n, refs, start_date, end_date):
+    follow_up_required = rng.randint(0, 2, n).astype(np.bool_)
+    has_follow_up_date = rng.randint(0, 2, n).astype(np.bool_)
+    return {
+        "patient_idx": rng.randint(0, len(refs["patient_ids"]), n).astype(np.int32),
+        "doctor_idx": rng.randint(0, len(refs["doctor_ids"]), n).astype(np.int32),
+        "visit_date": random_datetimes(rng, n, start_date, end_date),
+        "visit_type": random_codes(rng, VISIT_TYPES, n),
+        "chief_complaint": random_codes(rng, VISIT_COMPLAINTS, n),
+        "history_of_present_illness": random_codes(rng, get_medical_conditions(), n),
+        "systolic_bp": rng.randint(90, 181, n).astype(np.int16),
+        "diastolic_bp": rng.randint(60, 121, n).astype(np.int16),
+        "heart_rate": rng.randint(60, 121, n).astype(np.int16),
+        "temperature": random_costs(rng, 36.0, 39.5, n, decimals=1),
+        "respiratory_rate": rng.randint(12, 26, n).astype(np.int8),
+        "oxygen_saturation": rng.randint(85, 101, n).astype(np.int8),
+        "weight": random_costs(rng, 40, 120, n, decimals=1),
+        "height": rng.randint(140, 201, n).astype(np.int16),
+        "diagnosis": random_codes(rng, get_medical_conditions(), n),
+        "medications_prescribed": random_samples(rng, n, get_medications(), 1, 4),
+        "follow_up_required": follow_up_required,
+        "follow_up_days": np.where(has_follow_up_date, rng.randint(7, 31, n), -1).astype(np.int8),
+    }
+
+def generate_laboratory_tests(rng, n, refs, start_date, end_date):
+    lab_tests = get_lab_tests()
+    test_name = random_codes(rng, lab_tests, n)
+    # Only HIV and the generic tests carry a categorical result
+    hiv = test_name == lab_tests.index("HIV Test")
+    numeric = np.isin(test_name, [lab_tests.index("Complete Blood Count"), lab_tests.index("Blood Glucose")])
+    result = np.where(hiv, random_codes(rng, HIV_RESULTS, n),
+                      len(HIV_RESULTS) + random_codes(rng, GENERIC_RESULTS, n))
+    return {
+        "patient_idx": rng.randint(0, len(refs["patient_ids"]), n).astype(np.int32),
+        "test_date": random_datetimes(rng, n, start_date, end_date),
+        "test_name": test_name,
+        "ordered_by": rng.randint(0, len(refs["doctor_ids"]), n).astype(np.int32),
+        "result_hours": rng.randint(2, 73, n).astype(np.int8),
+        "result": np.where(numeric, -1, result).astype(np.int8),
+        "hemoglobin": random_costs(rng, 10, 18, n, decimals=1),
+        "white_blood_cells": rng.randint(4000, 12001, n).astype(np.int32),
+        "platelets": rng.randint(150000, 400001, n).astype(np.int32),
+        "glucose_level": random_costs(rng, 70, 200, n, decimals=1),
+        "status": random_codes(rng, LAB_STATUSES, n),
+        "cost": random_costs(rng, 5000, 50000, n),  # RWF
+        "lab_technician": rng.randint(0, len(refs["lab_technicians"]), n).astype(np.int32),
+    }
+
+def generate_prescriptions(rng, n, refs, start_date, end_date):
+    offsets = random_lists(rng, n, 1, 4)
+    items = int(offsets[-1])
+    quantity = rng.randint(10, 91, items).astype(np.int16)
+    unit_cost = random_costs(rng, 500, 10000, items)  # RWF
+    item_total = quantity * unit_cost
+    return {
+        "patient_idx": rng.randint(0, len(refs["patient_ids"]), n).astype(np.int32),
+        "doctor_idx": rng.randint(0, len(refs["doctor_ids"]), n).astype(np.int32),
+        "prescription_date": random_datetimes(rng, n, start_date, end_date),
+        "medications": {
+            "offsets": offsets,
+            "medication_name": random_codes(rng, get_medications(), items),
+            "dosage": random_codes(rng, DOSAGES, items),
+            "frequency": random_codes(rng, FREQUENCIES, items),
+            "duration": rng.randint(3, 31, items).astype(np.int8),  # days
+            "quantity": quantity,
+            "unit_cost": unit_cost,
+            "total_cost": item_total,
+        },
+        "total_cost": np.add.reduceat(item_total, offsets[:-1]) if n else np.zeros(0),
+        "status": random_codes(rng, PRESCRIPTION_STATUSES, n),
+        "partial_dispensing": rng.random_sample(n) >= 0.8,
+        "refills_remaining": rng.randint(0, 4, n).astype(np.int8),
+    }
+
+def generate_billing_records(rng, n, refs, start_date, end_date):
+    patient_idx = rng.randint(0, len(refs["patient_ids"]), n).astype(np.int32)
+    offsets = random_lists(rng, n, 1, 5)
+    services = int(offsets[-1])
+    cost = random_costs(rng, 5000, 200000, services)  # RWF
+    subtotal = np.add.reduceat(cost, offsets[:-1]) if n else np.zeros(0)
+    coverage = refs["patient_coverage"][patient_idx]
+    insurance_amount = np.where(coverage > 0, np.round(subtotal * (coverage / 100)), 0)
+    return {
+        "patient_idx": patient_idx,
+        "billing_date": random_datetimes(rng, n, start_date, end_date),
+        "services": {
+            "offsets": offsets,
+            "service_type": random_codes(rng, SERVICE_TYPES, services),
+            "description": rng.randint(0, len(refs["service_sentences"]), services).astype(np.int32),
+            "cost": cost,
+        },
+        "subtotal": subtotal,
+        "insurance_coverage_percent": coverage,
+        "insurance_amount": insurance_amount,
+        "patient_amount": subtotal - insurance_amount,
+        "payment_status": random_codes(rng, PAYMENT_STATUSES, n),
+        "payment_method": random_codes(rng, PAYMENT_METHODS, n),
+        "invoice_number": rng.randint(100000, 1000000, n).astype(np.int32),
+    }
+
+GENERATORS = {
+    "appointments": generate_appointments,
+    "admissions": generate_admissions,
+    "medical_records": generate_medical_records,
+    "laboratory_tests": generate_laboratory_tests,
+    "prescriptions": generate_prescriptions,
+    "billing_records": generate_billing_records,
+}
+
+def iter_blocks(rng, entity, n, refs, start_date, end_date, block_size=BLOCK_SIZE):
+    """Draw n rows of an entity as a sequence of column batches of at most block_size rows"""
+    for start in range(0, n, block_size):
+        yield GENERATORS[entity](rng, min(block_size, n - start), refs, start_date, end_date)
+
+# --- Record Assembly ---
+def _decode(entity, column, codes):
+    """Categorical codes to their string values (None for code -1)"""
+    vocabulary = np.array(CATEGORIES[entity][column] + [None], dtype=object)
+    return vocabulary[codes].tolist()
+
+def _isoformat(timestamps):
+    return np.datetime_as_string(timestamps, unit="us").tolist()
+
+def _split(values, offsets):
+    offsets = offsets.tolist()
+    return [values[offsets[i]:offsets[i + 1]] for i in range(len(offsets) - 1)]
+
+def _appointment_records(cols, refs, ids):
+    departments = refs["doctor_departments"][cols["doctor_idx"]].tolist()
+    notes = np.array(["Patient appointment for " + c.lower() for c in get_medical_conditions()], dtype=object)
+    for row in zip(refs["patient_ids"][cols["patient_idx"]].tolist(),
+                   refs["doctor_ids"][cols["doctor_idx"]].tolist(),
+                   departments,
+                   _isoformat(cols["appointment_date"]),
+                   _decode("appointments", "appointment_time", cols["appointment_time"]),
+                   _decode("appointments", "type", cols["type"]),
+                   _decode("appointments", "status", cols["status"]),
+                   _decode("appointments", "chief_complaint", cols["chief_complaint"]),
+                   _decode("appointments", "priority", cols["priority"]),
+                   cols["estimated_duration"].tolist(),
+                   notes[cols["notes"]].tolist()):
+        yield {
+            "appointment_id": next(ids),
+            "patient_id": row[0],
+            "doctor_id": row[1],
+            "department_id": row[2],
+            "appointment_date": row[3],
+            "appointment_time": row[4],
+            "type": row[5],
+            "status": row[6],
+            "chief_complaint": row[7],
+            "priority": row[8],
+            "estimated_duration": row[9],
+            "notes": row[10],
+        }
+
+def _admission_records(cols, refs, ids):
+    conditions = get_medical_conditions()
+    reasons = np.array(["Admitted for treatment of " + c.lower() for c in conditions], dtype=object)
+    discharged = ~np.isnat(cols["discharge_date"])
+    discharge_dates = np.where(discharged, np.datetime_as_string(cols["discharge_date"], unit="us"), None).tolist()
+    total_cost = np.where(discharged, cols["total_cost"], None).tolist()
+    secondary = _split(_decode("admissions", "secondary_diagnoses.values", cols["secondary_diagnoses"]["values"]),
+                       cols["secondary_diagnoses"]["offsets"])
+    for row in zip(refs["patient_ids"][cols["patient_idx"]].tolist(),
+                   refs["doctor_ids"][cols["doctor_idx"]].tolist(),
+                   refs["doctor_departments"][cols["doctor_idx"]].tolist(),
+                   _isoformat(cols["admission_date"]),
+                   discharge_dates,
+                   _decode("admissions", "admission_type", cols["admission_type"]),
+                   cols["room_number"].tolist(),
+                   cols["bed_number"].tolist(),
+                   _decode("admissions", "primary_diagnosis", cols["primary_diagnosis"]),
+                   secondary,
+                   reasons[cols["admission_reason"]].tolist(),
+                   _decode("admissions", "discharge_reason", cols["discharge_reason"]),
+                   total_cost):
+        yield {
+            "admission_id": next(ids),
+            "patient_id": row[0],
+            "admitting_doctor_id": row[1],
+            "department_id": row[2],
+            "admission_date": row[3],
+            "discharge_date": row[4],
+            "admission_type": row[5],
+            "room_number": str(row[6]),
+            "bed_number": row[7],
+            "primary_diagnosis": row[8],
+            "secondary_diagnoses": row[9],
+            "admission_reason": row[10],
+            "discharge_reason": row[11],
+            "total_cost": row[12],  # RWF
+        }
+
+def _medical_record_records(cols, refs, ids):
+    illnesses = np.array(["Patient presents with symptoms of " + c.lower() for c in get_medical_conditions()], dtype=object)
+    has_follow_up_date = cols["follow_up_days"] >= 0
+    follow_up_dates = np.where(
+        has_follow_up_date,
+        np.datetime_as_string(cols["visit_date"] + cols["follow_up_days"].astype("timedelta64[D]"), unit="us"),
+        None).tolist()
+    medications = _split(_decode("medical_records", "medications_prescribed.values",
+                                 cols["medications_prescribed"]["values"]),
+                         cols["medications_prescribed"]["offsets"])
+    for row in zip(refs["patient_ids"][cols["patient_idx"]].tolist(),
+                   refs["doctor_ids"][cols["doctor_idx"]].tolist(),
+                   _isoformat(cols["visit_date"]),
+                   _decode("medical_records", "visit_type", cols["visit_type"]),
+                   _decode("medical_records", "chief_complaint", cols["chief_complaint"]),
+                   illnesses[cols["history_of_present_illness"]].tolist(),
+                   cols["systolic_bp"].tolist(),
+                   cols["diastolic_bp"].tolist(),
+                   cols["heart_rate"].tolist(),
+                   cols["temperature"].tolist(),
+                   cols["respiratory_rate"].tolist(),
+                   cols["oxygen_saturation"].tolist(),
+                   cols["weight"].tolist(),
+                   cols["height"].tolist(),
+                   _decode("medical_records", "diagnosis", cols["diagnosis"]),
+                   medications,
+                   cols["follow_up_required"].tolist(),
+                   follow_up_dates):
+        yield {
+            "record_id": next(ids),
+            "patient_id": row[0],
+            "doctor_id": row[1],
+            "visit_date": row[2],
+            "visit_type": row[3],
+            "chief_complaint": row[4],
+            "history_of_present_illness": row[5],
+            "physical_examination": "Physical exam reveals findings consistent with primary complaint",
+            "vital_signs": {
+                "blood_pressure": f"{row[6]}/{row[7]}",
+                "heart_rate": row[8],
+                "temperature": row[9],
+                "respiratory_rate": row[10],
+                "oxygen_saturation": row[11],
+                "weight": row[12],
+                "height": row[13],
+            },
+            "diagnosis": row[14],
+            "treatment_plan": "Treatment plan developed based on diagnosis and patient condition",
+            "medications_prescribed": row[15],
+            "follow_up_required": row[16],
+            "follow_up_date": row[17],
+        }
+
+def _laboratory_test_records(cols, refs, ids):
+    lab_tests = get_lab_tests()
+    blood_count = lab_tests.index("Complete Blood Count")
+    glucose = lab_tests.index("Blood Glucose")
+    result_dates = _isoformat(cols["test_date"] + cols["result_hours"].astype("timedelta64[h]"))
+    for row in zip(refs["patient_ids"][cols["patient_idx"]].tolist(),
+                   cols["test_name"].tolist(),
+                   _decode("laboratory_tests", "test_name", cols["test_name"]),
+                   _isoformat(cols["test_date"]),
+                   refs["doctor_ids"][cols["ordered_by"]].tolist(),
+                   result_dates,
+                   _decode("laboratory_tests", "result", cols["result"]),
+                   cols["hemoglobin"].tolist(),
+                   cols["white_blood_cells"].tolist(),
+                   cols["platelets"].tolist(),
+                   cols["glucose_level"].tolist(),
+                   _decode("laboratory_tests", "status", cols["status"]),
+                   cols["cost"].tolist(),
+                   refs["lab_technicians"][cols["lab_technician"]].tolist()):
+        # Generate realistic test results based on test type
+        if row[1] == blood_count:
+            test_results = {
+                "hemoglobin": f"{row[7]} g/dL",
+                "white_blood_cells": f"{row[8]} cells/µL",
+                "platelets": f"{row[9]} cells/µL",
+            }
+        elif row[1] == glucose:
+            test_results = {"glucose_level": f"{row[10]} mg/dL"}
+        else:
+            test_results = {"result": row[6]}
+        yield {
+            "test_id": next(ids),
+            "patient_id": row[0],
+            "test_name": row[2],
+            "test_date": row[3],
+            "ordered_by": row[4],
+            "sample_collected_date": row[3],
+            "result_date": row[5],
+            "test_results": test_results,
+            "reference_range": "Within normal limits" if row[6] == "Normal" else "See detailed report",
+            "status": row[11],
+            "cost": row[12],  # RWF
+            "lab_technician": row[13],
+        }
+
+def _prescription_records(cols, refs, ids):
+    group = cols["medications"]
+    items = [
+        {
+            "medication_name": item[0],
+            "dosage": item[1],
+            "frequency": item[2],
+            "duration": f"{item[3]} days",
+            "quantity": item[4],
+            "unit_cost": item[5],
+            "total_cost": item[6],
+        }
+        for item in zip(_decode("prescriptions", "medications.medication_name", group["medication_name"]),
+                        _decode("prescriptions", "medications.dosage", group["dosage"]),
+                        _decode("prescriptions", "medications.frequency", group["frequency"]),
+                        group["duration"].tolist(),
+                        group["quantity"].tolist(),
+                        group["unit_cost"].tolist(),
+                        group["total_cost"].tolist())
+    ]
+    for row in zip(refs["patient_ids"][cols["patient_idx"]].tolist(),
+                   refs["doctor_ids"][cols["doctor_idx"]].tolist(),
+                   _isoformat(cols["prescription_date"]),
+                   _split(items, group["offsets"]),
+                   cols["total_cost"].tolist(),
+                   _decode("prescriptions", "status", cols["status"]),
+                   cols["partial_dispensing"].tolist(),
+                   cols["refills_remaining"].tolist()):
+        yield {
+            "prescription_id": next(ids),
+            "patient_id": row[0],
+            "doctor_id": row[1],
+            "prescription_date": row[2],
+            "medications": row[3],
+            "total_cost": row[4],
+            "status": row[5],
+            "pharmacy_notes": "Partial dispensing due to stock" if row[6] else "Dispensed as prescribed",
+            "refills_remaining": row[7],
+        }
+
+def _billing_records(cols, refs, ids):
+    group = cols["services"]
+    billing_dates = _isoformat(cols["billing_date"])
+    service_dates = np.repeat(np.array(billing_dates, dtype=object), np.diff(group["offsets"])).tolist()
+    due_dates = _isoformat(cols["billing_date"] + np.timedelta64(30, "D"))
+    services = [
+        {
+            "service_type": service[0],
+            "description": f"{service[0]} - {service[1]}",
+            "cost": service[2],
+            "date": service[3],
+        }
+        for service in zip(_decode("billing_records", "services.service_type", group["service_type"]),
+                           refs["service_sentences"][group["description"]].tolist(),
+                           group["cost"].tolist(),
+                           service_dates)
+    ]
+    for row in zip(refs["patient_ids"][cols["patient_idx"]].tolist(),
+                   billing_dates,
+                   _split(services, group["offsets"]),
+                   cols["subtotal"].tolist(),
+                   cols["insurance_coverage_percent"].tolist(),
+                   cols["insurance_amount"].tolist(),
+                   cols["patient_amount"].tolist(),
+                   _decode("billing_records", "payment_status", cols["payment_status"]),
+                   _decode("billing_records", "payment_method", cols["payment_method"]),
+                   cols["invoice_number"].tolist(),
+                   due_dates):
+        yield {
+            "billing_id": next(ids),
+            "patient_id": row[0],
+            "billing_date": row[1],
+            "services": row[2],
+            "subtotal": row[3],
+            "insurance_coverage_percent": row[4],
+            "insurance_amount": row[5] if row[4] > 0 else 0,
+            "patient_amount": row[6],
+            "total_amount": row[3],
+            "payment_status": row[7],
+            "payment_method": row[8],
+            "invoice_number": f"INV_{row[9]}",
+            "due_date": row[10],
+        }
+
+ASSEMBLERS = {
+    "appointments": _appointment_records,
+    "admissions": _admission_records,
+    "medical_records": _medical_record_records,
+    "laboratory_tests": _laboratory_test_records,
+    "prescriptions": _prescription_records,
+    "billing_records": _billing_records,
+}
+
+def iter_records(entity, columns, refs, ids):
+    """Assemble a column batch into the same record dicts the per-record loops build.
+
+    ids holds the batch's string IDs, one per row.
+    """
+    return ASSEMBLERS[entity](columns, refs, iter(ids))
+
+def iter_entity(rng, entity, n, refs, start_date, end_date, id_sequence, block_size=BLOCK_SIZE):
+    """Lazily generate n records of an entity, one column batch at a time.
+
+    Each batch takes its IDs from id_sequence (a chuk_ids.IdSequence) and
+    keeps their integer keys in the "key" column.
+    """
+    for columns in iter_blocks(rng, entity, n, refs, start_date, end_date, block_size):
+        columns["key"], ids = id_sequence.take(num_rows(columns))
+        yield from iter_records(entity, columns, refs, ids.tolist())
@@ -0,0 +1,277 @@
+# chuk_beds.py
+# Capacity-aware bed allocation for the admissions of a generated dataset.
+#
+# The generators give every admission a random room_number/bed_number, so the
+# same bed can hold several patients at once and occupancy ignores each
+# department's bed_capacity. allocate() replays admissions and discharges as
+# one time-ordered sweep (discharges first at equal timestamps) and keeps a
+# heap of free bed indexes per department:
+#   - an admission takes the lowest free bed of its department
+#   - if the department is full it is transferred to the department with the
+#     most free beds, and a "transfer" event is recorded
+#     (the admitting department is the admission's department_id, or its
+#     transferred_from_department_id once it has been transferred)
+#   - if every department is full it gets a surge bed of its own department
+#     beyond bed_capacity, and an "overflow" event is recorded
+#   - a discharge returns the bed to its heap; admissions that are still open
+#     keep their bed up to the dataset watermark
+# Sorting the 2n events and the heap operations make the sweep O(n log n);
+# choosing a transfer target scans the departments, a constant.
+#
+# Beds are grouped BEDS_PER_ROOM to a room. Department DEPT_004 has rooms
+# "501", "502", ... and surge rooms "5S1", "5S2", ...; bed_number is 1-4.
+# Admissions chunks are rewritten in place (only those whose beds changed).
+# department_id becomes the ward the admission occupies, so department-level
+# occupancy and capacity figures agree with the rooms; a transferred
+# admission keeps its admitting department in transferred_from_department_id.
+# chuk_beds/ receives events.ndjson, the per-department daily occupancy
+# series (occupancy.npz: end-of-day census, daily peak, admissions placed,
+# transfers in, overflows) and summary.json.
+#
+#   python chuk_beds.py --data-dir out
+#   python chuk_beds.py --data-dir out --dry-run
+import argparse
+import heapq
+import json
+import os
+import time
+
+import numpy as np
+
+import chuk_append
+import chuk_io
+
+BEDS_DIR = "chuk_beds"
+EVENTS_FILE = "events.ndjson"
+OCCUPANCY_FILE = "occupancy.npz"
+SUMMARY_FILE = "summary.json"
+TRANSFER_FIELD = "transferred_from_department_id"
+BEDS_PER_ROOM = 4
+DISCHARGE, ADMISSION = 0, 1  # event kinds, in tie-break order
+DAY_US = 86400 * 10 ** 6
+
+# --- Beds ---
+def bed_label(department, bed, capacity):
+    """(room_number, bed_number) of a department's bed index; surge beds follow the regular ones"""
+    if bed < capacity:
+        return f"{department + 1}{bed // BEDS_PER_ROOM + 1:02d}", bed % BEDS_PER_ROOM + 1
+    bed -= capacity
+    return f"{department + 1}S{bed // BEDS_PER_ROOM + 1}", bed % BEDS_PER_ROOM + 1
+
+def _microseconds(values):
+    return np.array(values, dtype="datetime64[us]").astype(np.int64)
+
+def load_admissions(data_dir, departments):
+    """Admission columns in file order plus the record count of every admissions file"""
+    codes = {department["department_id"]: i for i, department in enumerate(departments)}
+    ids, department, admitted, discharged, counts = [], [], [], [], []
+    for path in chuk_io.entity_files("admissions", data_dir):
+        count = 0
+        for record in chuk_io.iter_file(path):
+            ids.append(record["admission_id"])
+            department.append(codes.get(record.get(TRANSFER_FIELD) or record.get("department_id"), 0))
+            admitted.append(record["admission_date"])
+            discharged.append(record.get("discharge_date"))
+            count += 1
+        counts.append((path, count))
+    return {
+        "admission_ids": ids,
+        "department": np.array(department, dtype=np.int32),
+        "admitted": _microseconds(admitted),
+        "discharged": _microseconds(discharged),  # NaT (int64 min) while still admitted
+    }, counts
+
+# --- Sweep ---
+def allocate(columns, capacities):
+    """Assign every admission a (department, bed index) without overlapping stays.
+
+    Returns the ward and bed arrays, the recorded events as (kind, row, from
+    department, to department) tuples and the occupancy changes in sweep order
+    as (time, ward, +1/-1) arrays.
+    """
+    n = len(columns["department"])
+    admitted, discharged = columns["admitted"], columns["discharged"]
+    # A stay that does not end after it starts never frees its bed
+    closes = np.flatnonzero(discharged > admitted)
+    times = np.concatenate([admitted, discharged[closes]])
+    kinds = np.concatenate([np.full(n, ADMISSION, np.int8), np.full(len(closes), DISCHARGE, np.int8)])
+    rows = np.concatenate([np.arange(n), closes])
+    order = np.lexsort((rows, kinds, times))
+    times, kinds, rows = times[order], kinds[order], rows[order]
+
+    free = [list(range(capacity)) for capacity in capacities]  # ascending lists are valid heaps
+    surge_free = [[] for _ in capacities]
+    surge_used = [0] * len(capacities)
+    ward, bed = [-1] * n, [-1] * n
+    home = columns["department"].tolist()
+    events = []
+    for row, kind in zip(rows.tolist(), kinds.tolist()):
+        if kind == DISCHARGE:
+            w, b = ward[row], bed[row]
+            heapq.heappush(free[w] if b < capacities[w] else surge_free[w], b)
+            continue
+        w = home[row]
+        if free[w]:
+            b = heapq.heappop(free[w])
+        else:
+            target = max(range(len(free)), key=lambda d: len(free[d]))
+            if free[target]:
+                events.append(("transfer", row, w, target))
+                w, b = target, heapq.heappop(free[target])
+            else:
+                events.append(("overflow", row, w, w))
+                if surge_free[w]:
+                    b = heapq.heappop(surge_free[w])
+                else:
+                    b = capacities[w] + surge_used[w]
+                    surge_used[w] += 1
+        ward[row], bed[row] = w, b
+    ward, bed = np.array(ward, dtype=np.int32), np.array(bed, dtype=np.int32)
+    changes = (times, ward[rows], np.where(kinds == ADMISSION, 1, -1))
+    return ward, bed, events, changes
+
+def occupancy_series(changes, events, columns, n_departments, first_day, last_day):
+    """Per-department daily [department, day] arrays: census at midnight after the day, peak,
+    admissions placed, transfers in and overflows"""
+    days = last_day - first_day + 1
+    shape = (n_departments, days)
+    at, wards, delta = changes
+    # Changes are in time order; a stable sort groups them by ward keeping that order
+    order = np.argsort(wards, kind="stable")
+    at, wards, delta = at[order], wards[order].astype(np.int64), delta[order]
+    level = np.cumsum(delta)
+    ward_starts = np.searchsorted(wards, np.arange(n_departments))
+    before = np.concatenate([[0], level])[ward_starts]
+    level = level - before[wards]
+    day = np.clip(at // DAY_US - first_day, 0, days - 1)
+    cell = wards * days + day
+    census = np.full(n_departments * days, -1, dtype=np.int64)
+    peak = np.zeros(n_departments * days, dtype=np.int64)
+    if len(cell):
+        starts = np.flatnonzero(np.r_[True, cell[1:] != cell[:-1]])
+        ends = np.r_[starts[1:], len(cell)] - 1
+        census[cell[ends]] = level[ends]
+        peak[cell[starts]] = np.maximum.reduceat(level, starts)
+    # Carry the census forward over days without changes
+    census = census.reshape(shape)
+    known = np.where(census >= 0, np.arange(days), -1)
+    carried = np.maximum.accumulate(known, axis=1)
+    census = np.where(carried >= 0, np.take_along_axis(census, np.maximum(carried, 0), axis=1), 0)
+    opening = np.concatenate([np.zeros((n_departments, 1), np.int64), census[:, :-1]], axis=1)
+    peak = np.maximum(peak.reshape(shape), opening)
+
+    admitted_day = np.clip(columns["admitted"] // DAY_US - first_day, 0, days - 1)
+    placed = np.bincount(wards[delta > 0] * days + day[delta > 0], minlength=n_departments * days)
+    counts = {"transfer": np.zeros(n_departments * days, np.int64),
+              "overflow": np.zeros(n_departments * days, np.int64)}
+    for kind, row, _, target in events:
+        counts[kind][target * days + admitted_day[row]] += 1
+    return {
+        "census": census,
+        "peak": peak,
+        "admissions": placed.reshape(shape),
+        "transfers_in": counts["transfer"].reshape(shape),
+        "overflows": counts["overflow"].reshape(shape),
+    }
+
+# --- Dataset ---
+def allocate_dataset(data_dir=".", out_dir=None, rewrite=True, watermark=None):
+    """Allocate beds for every admission of a dataset, rewrite its admissions and write chuk_beds/.
+
+    Open admissions hold their bed up to watermark, by default the one in the dataset summary.
+    """
+    out_dir = out_dir or os.path.join(data_dir, BEDS_DIR)
+    departments = list(chuk_io.iter_entity("departments", data_dir))
+    capacities = [int(department.get("bed_capacity") or 0) for department in departments]
+    if watermark is None:
+        _, watermark = chuk_append.data_window(chuk_append.load_summary(data_dir))
+    timings = {}
+
+    started = time.perf_counter()
+    columns, files = load_admissions(data_dir, departments)
+    timings["load_s"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    ward, bed, events, changes = allocate(columns, capacities)
+    timings["sweep_s"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    first_day = int(columns["admitted"].min() // DAY_US) if len(ward) else 0
+    last_day = max(int(_microseconds([watermark])[0] // DAY_US), first_day)
+    series = occupancy_series(changes, events, columns, len(departments), first_day, last_day)
+    os.makedirs(out_dir, exist_ok=True)
+    np.savez_compressed(os.path.join(out_dir, OCCUPANCY_FILE),
+                        days=np.arange(first_day, last_day + 1).astype("datetime64[D]"),
+                        departments=np.array([department["department_id"] for department in departments]),
+                        capacity=np.array(capacities, dtype=np.int64), **series)
+    ids = columns["admission_ids"]
+    with open(os.path.join(out_dir, EVENTS_FILE), "w") as f:
+        for kind, row, source, target in events:
+            room_number, bed_number = bed_label(target, int(bed[row]), capacities[target])
+            event = {"event": kind, "admission_id": ids[row],
+                     "time": str(columns["admitted"][row].astype("datetime64[us]")),
+                     "department_id": departments[source]["department_id"],
+                     "to_department_id": departments[target]["department_id"],
+                     "room_number": room_number, "bed_number": bed_number}
+            f.write(json.dumps(event, separators=(",", ":")))
+            f.write("\n")
+    timings["series_s"] = time.perf_counter() - started
+
+    rewritten = 0
+    if rewrite:
+        started = time.perf_counter()
+        labels = [bed_label(w, b, capacities[w]) for w, b in zip(ward.tolist(), bed.tolist())]
+        department_ids = [department["department_id"] for department in departments]
+        row = 0
+        for path, _ in files:
+            records = list(chuk_io.iter_file(path))
+            changed = False
+            for record, w, home in zip(records, ward[row:].tolist(), columns["department"][row:].tolist()):
+                room_number, bed_number = labels[row]
+                transferred_from = department_ids[home] if w != home else None
+                if (record.get("room_number"), record.get("bed_number"), record.get("department_id"),
+                        record.get(TRANSFER_FIELD)) != (room_number, bed_number, department_ids[w], transferred_from):
+                    record["room_number"], record["bed_number"] = room_number, bed_number
+                    record["department_id"] = department_ids[w]
+                    if transferred_from:
+                        record[TRANSFER_FIELD] = transferred_from
+                    else:
+                        record.pop(TRANSFER_FIELD, None)
+                    changed = True
+                row += 1
+            if changed:
+                chuk_io.rewrite_file(path, records)
+                rewritten += 1
+        timings["rewrite_s"] = time.perf_counter() - started
+
+    kinds = [event[0] for event in events]
+    summary = {
+        "admissions": len(ward),
+        "beds": sum(capacities),
+        "transfers": kinds.count("transfer"),
+        "overflows": kinds.count("overflow"),
+        "surge_beds": sum(max(int(bed[ward == w].max(initial=-1)) + 1 - capacity, 0)
+                          for w, capacity in enumerate(capacities)),
+        "peak_occupancy": float((series["peak"].max(axis=1) / np.maximum(capacities, 1)).max())
+        if len(ward) else 0.0,
+        "files_rewritten": rewritten,
+        "timings": timings,
+    }
+    with open(os.path.join(out_dir, SUMMARY_FILE), "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+def print_summary(summary):
+    timings = ", ".join(f"{name[:-2]} {seconds:.2f}s" for name, seconds in summary["timings"].items())
+    print(f"Allocated {summary['admissions']:,} admissions to {summary['beds']:,} beds: "
+          f"{summary['transfers']:,} transfers, {summary['overflows']:,} overflows "
+          f"(peak {summary['peak_occupancy']:.0%} of capacity), "
+          f"{summary['files_rewritten']} file(s) rewritten [{timings}]")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Allocate concrete beds to the admissions of a CHUK dataset")
+    parser.add_argument("--data-dir", default=".", help="directory holding the chuk_* files")
+    parser.add_argument("--out-dir", default=None, help=f"events and occupancy location (default: <data-dir>/{BEDS_DIR})")
+    parser.add_argument("--dry-run", action="store_true", help="write events and occupancy without rewriting admissions")
+    args = parser.parse_args()
+    print_summary(allocate_dataset(args.data_dir, args.out_dir, rewrite=not args.dry_run))
@@ -0,0 +1,261 @@
+# chuk_bench.py
+# Per-stage profiling of a generation run and a multi-scale benchmark harness.
+#
+# StageProfiler wraps each stage of dataset-CHUK.py (departments, staff,
+# patients, equipment, the six time-series entities, export) and records its
+# wall time, CPU time (including worker processes), records per second, peak
+# RSS and the bytes it added to the chuk_* outputs of the output directory
+# (0 for stages that only remove or shrink files). The generator writes
+# the result to chuk_profile.json next to chuk_dataset_summary.json.
+#
+# Run as a script, it generates the dataset at several scale factors in fresh
+# processes, collects every profile into chuk_benchmark.json and optionally
+# compares it against a saved baseline report:
+#
+#   python chuk_bench.py --scale-factors 0.1,1 --out-dir bench
+#   python chuk_bench.py --scale-factors 0.1,1 --out-dir bench --baseline old/chuk_benchmark.json
+import argparse
+import contextlib
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+PROFILE_FILE = "chuk_profile.json"
+REPORT_FILE = "chuk_benchmark.json"
+GENERATOR_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "dataset-CHUK.py")
+DEFAULT_SCALE_FACTORS = [0.1, 0.5, 1.0]
+DEFAULT_TOLERANCE = 0.2  # relative slowdown or memory growth flagged as a regression
+MIN_COMPARED_SECONDS = 0.05  # stages without records are compared by wall time once this slow
+
+# --- Process Metrics ---
+def _status_kb(field):
+    """A kB field of /proc/self/status (Linux), or None"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+def _reset_peak_rss():
+    """Reset the kernel's peak RSS watermark so the next stage gets its own peak (Linux only)"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    peak = _status_kb("VmHWM")
+    if peak is None and resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if sys.platform == "darwin":
+            peak //= 1024  # bytes on macOS
+    return (peak or 0) / 1024
+
+def children_peak_rss_mb():
+    """Largest peak RSS of any finished child process in MB"""
+    if resource is None:
+        return 0.0
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    return (peak // 1024 if sys.platform == "darwin" else peak) / 1024
+
+def cpu_seconds():
+    """User + system CPU time of this process and its finished children"""
+    times = os.times()
+    return times.user + times.system + times.children_user + times.children_system
+
+def directory_bytes(path):
+    """Bytes of the chuk_* files and directories in path, the generator's outputs"""
+    total = 0
+    try:
+        entries = [entry for entry in os.scandir(path) if entry.name.startswith("chuk_")]
+    except OSError:
+        return 0
+    for entry in entries:
+        try:
+            if not entry.is_dir():
+                total += entry.stat().st_size
+                continue
+        except OSError:
+            continue
+        for root, _, files in os.walk(entry.path):
+            for name in files:
+                try:
+                    total += os.path.getsize(os.path.join(root, name))
+                except OSError:
+                    pass
+    return total
+
+# --- Stage Profiler ---
+class StageProfiler:
+    """Collects wall time, CPU time, throughput, peak RSS and output bytes per stage"""
+
+    def __init__(self, out_dir):
+        self.out_dir = out_dir
+        self.stages = []
+        self.started = time.perf_counter()
+        self.cpu_started = cpu_seconds()
+
+    @contextlib.contextmanager
+    def stage(self, name):
+        """Profile the enclosed block; set "records" on the yielded dict to get a rate"""
+        entry = {"stage": name, "records": 0}
+        per_stage_peak = _reset_peak_rss()
+        bytes_before = directory_bytes(self.out_dir)
+        children_before = children_peak_rss_mb()
+        cpu_before = cpu_seconds()
+        started = time.perf_counter()
+        yield entry
+        wall = time.perf_counter() - started
+        # Worker processes only count towards the stage that started them
+        children_peak = children_peak_rss_mb()
+        children_peak = children_peak if children_peak > children_before else 0.0
+        entry.update(
+            wall_seconds=round(wall, 4),
+            cpu_seconds=round(cpu_seconds() - cpu_before, 4),
+            records_per_second=round(entry["records"] / wall, 1) if wall > 0 else 0.0,
+            peak_rss_mb=round(max(peak_rss_mb(), children_peak), 1),
+            peak_rss_scope="stage" if per_stage_peak else "process",
+            bytes_written=max(directory_bytes(self.out_dir) - bytes_before, 0),
+        )
+        self.stages.append(entry)
+
+    def report(self, **info):
+        wall = time.perf_counter() - self.started
+        records = sum(stage["records"] for stage in self.stages)
+        return {
+            "generated": datetime.datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            **info,
+            "total": {
+                "wall_seconds": round(wall, 4),
+                "cpu_seconds": round(cpu_seconds() - self.cpu_started, 4),
+                "records": records,
+                "records_per_second": round(records / wall, 1) if wall > 0 else 0.0,
+                "peak_rss_mb": max([stage["peak_rss_mb"] for stage in self.stages] or [0.0]),
+                "bytes_written": sum(stage["bytes_written"] for stage in self.stages),
+            },
+            "stages": self.stages,
+        }
+
+    def write(self, **info):
+        report = self.report(**info)
+        with open(os.path.join(self.out_dir, PROFILE_FILE), "w") as f:
+            json.dump(report, f, indent=2)
+        return report
+
+# --- Benchmark Harness ---
+def run_scale(scale_factor, out_root, extra_args=()):
+    """Generate the dataset at one scale factor in a fresh process and return its profile"""
+    out_dir = os.path.join(out_root, f"sf{scale_factor:g}")
+    command = [sys.executable, GENERATOR_SCRIPT, "--scale-factor", f"{scale_factor:g}",
+               "--out-dir", out_dir, *extra_args]
+    with open(os.path.join(out_root, f"sf{scale_factor:g}.log"), "w") as log:
+        subprocess.run(command, stdout=log, stderr=subprocess.STDOUT, check=True)
+    with open(os.path.join(out_dir, PROFILE_FILE)) as f:
+        return json.load(f)
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Stage-by-stage ratios against a baseline report and the stages that regressed.
+
+    A stage regresses when its throughput drops, or (for stages without
+    records) its wall time grows, or its peak RSS grows beyond the tolerance.
+    """
+    previous = {(run["scale_factor"], stage["stage"]): stage
+                for run in baseline["runs"] for stage in run["stages"]}
+    rows, regressions = [], []
+    for run in report["runs"]:
+        for stage in run["stages"]:
+            old = previous.get((run["scale_factor"], stage["stage"]))
+            if old is None:
+                continue
+            row = {"scale_factor": run["scale_factor"], "stage": stage["stage"],
+                   "wall_ratio": _ratio(stage["wall_seconds"], old["wall_seconds"]),
+                   "throughput_ratio": _ratio(stage["records_per_second"], old["records_per_second"]),
+                   "peak_rss_ratio": _ratio(stage["peak_rss_mb"], old["peak_rss_mb"])}
+            rows.append(row)
+            if stage["records"] and old["records"]:
+                slower = row["throughput_ratio"] is not None and row["throughput_ratio"] < 1 - tolerance
+            else:
+                # Setup and export stages have no record count; compare their wall time
+                # unless both runs were too short to measure reliably
+                slower = (row["wall_ratio"] is not None and row["wall_ratio"] > 1 + tolerance and
+                          max(stage["wall_seconds"], old["wall_seconds"]) >= MIN_COMPARED_SECONDS)
+            larger = row["peak_rss_ratio"] is not None and row["peak_rss_ratio"] > 1 + tolerance
+            if slower or larger:
+                regressions.append(row)
+    return {"tolerance": tolerance, "stages": rows, "regressions": regressions}
+
+def _ratio(new, old):
+    return round(new / old, 3) if old else None
+
+def print_report(report):
+    for run in report["runs"]:
+        total = run["total"]
+        print(f"\nScale factor {run['scale_factor']:g}: {total['records']:,} records in "
+              f"{total['wall_seconds']:.1f}s, peak RSS {total['peak_rss_mb']:.0f} MB, "
+              f"{total['bytes_written'] / 1e6:.1f} MB written")
+        print(f"  {'stage':<20}{'wall s':>9}{'cpu s':>9}{'records/s':>13}{'peak MB':>9}{'MB out':>9}")
+        for stage in run["stages"]:
+            print(f"  {stage['stage']:<20}{stage['wall_seconds']:>9.2f}{stage['cpu_seconds']:>9.2f}"
+                  f"{stage['records_per_second']:>13,.0f}{stage['peak_rss_mb']:>9.0f}"
+                  f"{stage['bytes_written'] / 1e6:>9.1f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark CHUK dataset generation at several scale factors")
+    parser.add_argument("--scale-factors", default=",".join(f"{sf:g}" for sf in DEFAULT_SCALE_FACTORS),
+                        help="comma-separated scale factors (default: %(default)s)")
+    parser.add_argument("--out-dir", default="chuk_benchmark", help="directory for the runs and the report")
+    parser.add_argument("--baseline", default=None, help="earlier chuk_benchmark.json to compare against")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="relative throughput drop, wall time growth (stages without records) or "
+                             "peak RSS growth treated as a regression")
+    parser.add_argument("--keep-data", action="store_true", help="keep the generated datasets")
+    args, generator_args = parser.parse_known_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    runs = []
+    for scale_factor in [float(value) for value in args.scale_factors.split(",")]:
+        print(f"Running scale factor {scale_factor:g}...")
+        profile = run_scale(scale_factor, args.out_dir, generator_args)
+        runs.append({"scale_factor": scale_factor, **profile})
+        if not args.keep_data:
+            run_dir = os.path.join(args.out_dir, f"sf{scale_factor:g}")
+            for root, dirs, files in os.walk(run_dir, topdown=False):
+                for name in files:
+                    if name != PROFILE_FILE:
+                        os.remove(os.path.join(root, name))
+                for name in dirs:
+                    os.rmdir(os.path.join(root, name))
+    report = {"generator_args": generator_args, "runs": runs}
+    if args.baseline:
+        with open(args.baseline) as f:
+            report["comparison"] = compare(report, json.load(f), args.tolerance)
+    with open(os.path.join(args.out_dir, REPORT_FILE), "w") as f:
+        json.dump(report, f, indent=2)
+
+    print_report(report)
+    print(f"\nReport written to {os.path.join(args.out_dir, REPORT_FILE)}")
+    if args.baseline:
+        comparison = report["comparison"]
+        for row in comparison["regressions"]:
+            print(f"REGRESSION sf{row['scale_factor']:g} {row['stage']}: wall time x{row['wall_ratio']}, "
+                  f"throughput x{row['throughput_ratio']}, peak RSS x{row['peak_rss_ratio']}")
+        if comparison["regressions"]:
+            sys.exit(1)
+        print(f"No regressions beyond {args.tolerance:.0%} against {args.baseline}")
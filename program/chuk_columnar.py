@@ -0,0 +1,304 @@
+# chuk_columnar.py
+# Columnar export of the CHUK time-series entities.
+#
+# Every scalar field is written as one raw fixed-width NumPy array file, so a
+# reader can np.memmap a single column instead of parsing whole records:
+#   - "category" fields are dictionary encoded as int32 codes (-1 for None)
+#     with the dictionary stored next to them as <column>.dict.json
+#   - "datetime" fields are datetime64[us] (NaT for None)
+#   - "S<n>" fields (IDs and invoice numbers) are fixed-width byte strings,
+#     empty for None
+#   - numeric and bool fields keep their NumPy dtype (NaN for missing floats)
+# Nested lists become an int64 offsets array (rows + 1 entries) plus one
+# values file per child field. manifest.json describes every file, its dtype
+# and length. chuk_columnar_reader.py opens the result.
+import argparse
+import json
+import os
+
+import numpy as np
+
+import chuk_io
+
+FORMAT_VERSION = 1
+BLOCK_ROWS = 65536
+
+# Field path -> column kind. A one-element list marks a nested list whose
+# items have the given kind (or schema, for lists of dicts). Dotted paths
+# reach into embedded dicts such as vital_signs and test_results. The
+# cross-reference IDs at the end of a schema (appointment_id, record_id,
+# admission_id, readmission_of) are only filled for --journeys datasets.
+SCHEMAS = {
+    "appointments": {
+        "appointment_id": "S19",
+        "patient_id": "category",
+        "doctor_id": "category",
+        "department_id": "category",
+        "appointment_date": "datetime",
+        "appointment_time": "category",
+        "type": "category",
+        "status": "category",
+        "chief_complaint": "category",
+        "priority": "category",
+        "estimated_duration": "int16",
+        "notes": "category",
+    },
+    "admissions": {
+        "admission_id": "S17",
+        "patient_id": "category",
+        "admitting_doctor_id": "category",
+        "department_id": "category",
+        "admission_date": "datetime",
+        "discharge_date": "datetime",
+        "admission_type": "category",
+        "room_number": "category",
+        "bed_number": "int8",
+        "primary_diagnosis": "category",
+        "secondary_diagnoses": ["category"],
+        "admission_reason": "category",
+        "discharge_reason": "category",
+        "total_cost": "float64",
+        "record_id": "S19",
+        "readmission_of": "S17",
+        "transferred_from_department_id": "category",
+    },
+    "medical_records": {
+        "record_id": "S19",
+        "patient_id": "category",
+        "doctor_id": "category",
+        "visit_date": "datetime",
+        "visit_type": "category",
+        "chief_complaint": "category",
+        "history_of_present_illness": "category",
+        "physical_examination": "category",
+        "vital_signs.blood_pressure": "category",
+        "vital_signs.heart_rate": "int16",
+        "vital_signs.temperature": "float64",
+        "vital_signs.respiratory_rate": "int16",
+        "vital_signs.oxygen_saturation": "int16",
+        "vital_signs.weight": "float64",
+        "vital_signs.height": "int16",
+        "diagnosis": "category",
+        "treatment_plan": "category",
+        "medications_prescribed": ["category"],
+        "follow_up_required": "bool",
+        "follow_up_date": "datetime",
+        "appointment_id": "S19",
+    },
+    "laboratory_tests": {
+        "test_id": "S17",
+        "patient_id": "category",
+        "test_name": "category",
+        "test_date": "datetime",
+        "ordered_by": "category",
+        "sample_collected_date": "datetime",
+        "result_date": "datetime",
+        "test_results.hemoglobin": "category",
+        "test_results.white_blood_cells": "category",
+        "test_results.platelets": "category",
+        "test_results.glucose_level": "category",
+        "test_results.result": "category",
+        "reference_range": "category",
+        "status": "category",
+        "cost": "float64",
+        "lab_technician": "category",
+        "record_id": "S19",
+    },
+    "prescriptions": {
+        "prescription_id": "S17",
+        "patient_id": "category",
+        "doctor_id": "category",
+        "prescription_date": "datetime",
+        "medications": [{
+            "medication_name": "category",
+            "dosage": "category",
+            "frequency": "category",
+            "duration": "category",
+            "quantity": "int16",
+            "unit_cost": "float64",
+            "total_cost": "float64",
+        }],
+        "total_cost": "float64",
+        "status": "category",
+        "pharmacy_notes": "category",
+        "refills_remaining": "int8",
+        "record_id": "S19",
+    },
+    "billing_records": {
+        "billing_id": "S17",
+        "patient_id": "category",
+        "billing_date": "datetime",
+        "services": [{
+            "service_type": "category",
+            "description": "category",
+            "cost": "float64",
+            "date": "datetime",
+        }],
+        "subtotal": "float64",
+        "insurance_coverage_percent": "int16",
+        "insurance_amount": "float64",
+        "patient_amount": "float64",
+        "total_amount": "float64",
+        "payment_status": "category",
+        "payment_method": "category",
+        "invoice_number": "S10",
+        "due_date": "datetime",
+        "record_id": "S19",
+        "admission_id": "S17",
+    },
+}
+
+def _get(record, path):
+    for key in path:
+        if record is None:
+            return None
+        record = record.get(key)
+    return record
+
+# --- Column Sinks ---
+class _ScalarColumn:
+    """Buffers one field and appends it to a raw array file in blocks"""
+
+    def __init__(self, directory, name, kind):
+        self.name = name
+        self.kind = kind
+        self.file = f"{name}.bin"
+        self.length = 0
+        self.dictionary = {} if kind == "category" else None
+        if kind == "category":
+            self.dtype = np.dtype(np.int32)
+        elif kind == "datetime":
+            self.dtype = np.dtype("datetime64[us]")
+        else:
+            self.dtype = np.dtype(kind)
+        self._out = open(os.path.join(directory, self.file), "wb")
+        self._buffer = []
+
+    def append(self, value):
+        if self.dictionary is not None:
+            if value is None:
+                value = -1
+            else:
+                value = self.dictionary.setdefault(value, len(self.dictionary))
+        elif value is None and self.dtype.kind == "S":
+            value = ""
+        self._buffer.append(value)
+
+    def flush(self):
+        if self._buffer:
+            # NumPy parses ISO timestamps and maps None to NaT/NaN in bulk
+            array = np.array(self._buffer, dtype=self.dtype)
+            self._out.write(array.tobytes())
+            self.length += len(array)
+            self._buffer = []
+
+    def close(self, directory):
+        self.flush()
+        self._out.close()
+        entry = {"kind": self.kind, "dtype": self.dtype.str, "file": self.file, "length": self.length}
+        if self.dictionary is not None:
+            entry["dictionary"] = f"{self.name}.dict.json"
+            with open(os.path.join(directory, entry["dictionary"]), "w") as f:
+                json.dump(list(self.dictionary), f)
+        return entry
+
+class _ListColumn:
+    """A nested list: an offsets array plus one column per item field"""
+
+    def __init__(self, directory, name, item_schema):
+        self.name = name
+        self.offsets = _ScalarColumn(directory, f"{name}.offsets", "int64")
+        self.offsets.append(0)
+        self.total = 0
+        if isinstance(item_schema, dict):
+            self.children = {field: _ScalarColumn(directory, f"{name}.{field}", kind)
+                             for field, kind in item_schema.items()}
+        else:
+            self.children = {"values": _ScalarColumn(directory, f"{name}.values", item_schema)}
+
+    def append(self, items):
+        items = items or []
+        for item in items:
+            if "values" in self.children:
+                self.children["values"].append(item)
+            else:
+                for field, column in self.children.items():
+                    column.append(item.get(field))
+        self.total += len(items)
+        self.offsets.append(self.total)
+
+    def flush(self):
+        self.offsets.flush()
+        for column in self.children.values():
+            column.flush()
+
+    def close(self, directory):
+        return {
+            "kind": "list",
+            "offsets": self.offsets.close(directory),
+            "columns": {field: column.close(directory) for field, column in self.children.items()},
+        }
+
+# --- Writer ---
+class ColumnarWriter:
+    """Streams records of one entity into per-field column files"""
+
+    def __init__(self, entity, out_dir, schema=None, block_rows=BLOCK_ROWS):
+        self.entity = entity
+        self.directory = os.path.join(out_dir, entity)
+        os.makedirs(self.directory, exist_ok=True)
+        self.block_rows = block_rows
+        self.rows = 0
+        self.columns = []
+        for field, kind in (schema or SCHEMAS[entity]).items():
+            if isinstance(kind, list):
+                column = _ListColumn(self.directory, field, kind[0])
+            else:
+                column = _ScalarColumn(self.directory, field, kind)
+            self.columns.append((tuple(field.split(".")), column))
+
+    def write(self, record):
+        for path, column in self.columns:
+            column.append(_get(record, path))
+        self.rows += 1
+        if self.rows % self.block_rows == 0:
+            for _, column in self.columns:
+                column.flush()
+
+    def write_all(self, records):
+        for record in records:
+            self.write(record)
+        return self
+
+    def close(self):
+        """Flush every column and return this entity's manifest entry"""
+        return {
+            "rows": self.rows,
+            "directory": self.entity,
+            "columns": {column.name: column.close(self.directory) for _, column in self.columns},
+        }
+
+def write_manifest(out_dir, entities):
+    manifest = {"format": "chuk-columnar", "version": FORMAT_VERSION, "entities": entities}
+    with open(os.path.join(out_dir, "manifest.json"), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+def export_dataset(data_dir=".", out_dir="chuk_columnar", entities=None):
+    """Convert the chunked JSON/NDJSON output of each entity into the columnar layout"""
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_entities = {}
+    for entity in entities or SCHEMAS:
+        writer = ColumnarWriter(entity, out_dir)
+        writer.write_all(chuk_io.iter_entity(entity, data_dir))
+        manifest_entities[entity] = writer.close()
+        print(f"- {entity}: {manifest_entities[entity]['rows']:,} rows -> {writer.directory}")
+    return write_manifest(out_dir, manifest_entities)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert a generated CHUK dataset to the columnar layout")
+    parser.add_argument("--data-dir", default=".", help="directory holding the chuk_*.json/ndjson files")
+    parser.add_argument("--out-dir", default="chuk_columnar", help="columnar output directory")
+    parser.add_argument("--entities", default=None, help="comma-separated entities (default: all time-series)")
+    args = parser.parse_args()
+    export_dataset(args.data_dir, args.out_dir, args.entities.split(",") if args.entities else None)
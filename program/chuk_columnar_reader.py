@@ -0,0 +1,112 @@
+# chuk_columnar_reader.py
+# Memory-mapped reader for the layout written by chuk_columnar.py.
+#
+# Columns are opened lazily with np.memmap, so filtering on one field only
+# touches that field's file. Example:
+#
+#   tests = open_table("chuk_columnar", "laboratory_tests")
+#   hiv = tests.equals("test_name", "HIV Test")
+#   print(tests.column("cost")[hiv].sum(), tests.decode("patient_id", hiv)[:5])
+import json
+import os
+
+import numpy as np
+
+def _memmap(directory, entry):
+    if entry["length"] == 0:
+        return np.zeros(0, dtype=np.dtype(entry["dtype"]))
+    return np.memmap(os.path.join(directory, entry["file"]), dtype=np.dtype(entry["dtype"]),
+                     mode="r", shape=(entry["length"],))
+
+def load_manifest(root):
+    with open(os.path.join(root, "manifest.json")) as f:
+        return json.load(f)
+
+class ColumnarTable:
+    """One entity of a columnar export"""
+
+    def __init__(self, root, entity, manifest=None):
+        manifest = manifest or load_manifest(root)
+        self.entity = entity
+        self.layout = manifest["entities"][entity]
+        self.directory = os.path.join(root, self.layout["directory"])
+        self.rows = self.layout["rows"]
+        self._columns = {}
+        self._dictionaries = {}
+
+    @property
+    def column_names(self):
+        return list(self.layout["columns"])
+
+    def _entry(self, name):
+        group, _, child = name.partition(".")
+        entry = self.layout["columns"].get(name)
+        if entry is None and child:
+            entry = self.layout["columns"][group]["columns"][child]
+        if entry is None:
+            raise KeyError(f"{self.entity} has no column {name!r}")
+        return entry
+
+    def column(self, name):
+        """Raw memory-mapped array (category codes for dictionary-encoded columns)"""
+        if name not in self._columns:
+            self._columns[name] = _memmap(self.directory, self._entry(name))
+        return self._columns[name]
+
+    def dictionary(self, name):
+        if name not in self._dictionaries:
+            with open(os.path.join(self.directory, self._entry(name)["dictionary"])) as f:
+                self._dictionaries[name] = json.load(f)
+        return self._dictionaries[name]
+
+    def code(self, name, value):
+        """Dictionary code of a category value, or -2 if it never occurs"""
+        try:
+            return self.dictionary(name).index(value)
+        except ValueError:
+            return -2
+
+    def equals(self, name, value):
+        """Boolean row mask for column == value, comparing codes for categories"""
+        entry = self._entry(name)
+        if entry["kind"] == "category":
+            return self.column(name) == self.code(name, value)
+        if entry["kind"] == "datetime":
+            value = np.datetime64(value, "us")
+        elif entry["kind"].startswith("S"):
+            value = value.encode("ascii")
+        return self.column(name) == value
+
+    def isin(self, name, values):
+        codes = [self.code(name, value) for value in values]
+        return np.isin(self.column(name), codes)
+
+    def decode(self, name, rows=slice(None)):
+        """Values of a column for the selected rows, with categories decoded to strings"""
+        entry = self._entry(name)
+        values = self.column(name)[rows]
+        if entry["kind"] == "category":
+            lookup = np.array(self.dictionary(name) + [None], dtype=object)
+            return lookup[values].tolist()
+        if entry["kind"].startswith("S"):
+            return [value.decode("ascii") or None for value in values.tolist()]
+        return values
+
+    def list_column(self, name):
+        """(offsets, {field: values}) of a nested list column"""
+        entry = self.layout["columns"][name]
+        offsets = _memmap(self.directory, entry["offsets"])
+        return offsets, {field: self.column(f"{name}.{field}") for field in entry["columns"]}
+
+    def list_rows(self, name):
+        """Row index of each item of a nested list, for grouping item values by record"""
+        offsets, _ = self.list_column(name)
+        return np.repeat(np.arange(self.rows), np.diff(offsets))
+
+def open_table(root, entity):
+    return ColumnarTable(root, entity)
+
+def open_dataset(root):
+    """All tables of a columnar export, keyed by entity"""
+    manifest = load_manifest(root)
+    return {entity: ColumnarTable(root, entity, manifest) for entity in manifest["entities"]}
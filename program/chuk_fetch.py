@@ -0,0 +1,394 @@
+# chuk_fetch.py
+# Cached, resumable fetching of model and data artifacts.
+#
+# An artifact is a handle (e.g. "google/gemma/pyTorch/2b/1") naming a set of
+# files. Fetched files live in a content-addressed cache:
+#   <cache>/objects/<sha256[:2]>/<sha256>   file contents, stored once
+#   <cache>/artifacts/<handle>/<path>       hard links (or copies) of them
+#   <cache>/partial/<sha256>.part           interrupted transfers
+#   <cache>/manifest.json                   handle -> {path: sha256, size}
+# A handle already in the manifest with all its files present is returned
+# without touching the network, in milliseconds.
+#
+# Otherwise each mirror is tried in turn. A mirror is a local directory or an
+# http(s) URL laid out as <mirror>/<handle>/<path>, with a manifest.json of the
+# same format listing the checksums (a local directory without one is hashed
+# as it is read). Files are copied in CHUNK_BYTES pieces with progress
+# reports; an interrupted transfer resumes from its .part file (with an HTTP
+# Range request, restarting if the server answers 416) and every file is
+# checked against its sha256. A mirror that fails part-way is skipped for the
+# next one, its .part files kept for a later resume. Only when no
+# mirror has the artifact, and fetching is not offline, is kagglehub imported
+# and asked for it non-interactively: credentials come from the environment
+# or kaggle.json, never from a login prompt. The result is ingested into the
+# cache like any other source.
+#
+# publish() copies a directory into a local mirror, and --serve runs a file
+# server with Range support to stand in for a remote mirror.
+#
+#   python chuk_fetch.py google/gemma/pyTorch/2b/1 --mirror /srv/models
+#   python chuk_fetch.py google/gemma/pyTorch/2b/1 --offline
+#   python chuk_fetch.py google/gemma/pyTorch/2b/1 --publish path/to/files --mirror /srv/models
+#   python chuk_fetch.py --serve /srv/models --port 8000
+import argparse
+import datetime
+import functools
+import hashlib
+import http.client
+import http.server
+import json
+import os
+import shutil
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+CACHE_DIR = os.environ.get("CHUK_FETCH_CACHE", os.path.join(os.path.expanduser("~"), ".cache", "chuk_fetch"))
+MIRRORS = [mirror for mirror in os.environ.get("CHUK_FETCH_MIRRORS", "").split(os.pathsep) if mirror]
+OFFLINE = os.environ.get("CHUK_FETCH_OFFLINE", "") not in ("", "0")
+MANIFEST_FILE = "manifest.json"
+CHUNK_BYTES = 1024 * 1024
+PROGRESS_INTERVAL = 1.0  # seconds between progress lines
+TIMEOUT = 30  # seconds per HTTP request
+
+class FetchError(RuntimeError):
+    pass
+
+# --- Checksums ---
+def sha256_file(path, chunk_bytes=CHUNK_BYTES):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_bytes), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {"version": 1, "artifacts": {}}
+    with open(path) as f:
+        return json.load(f)
+
+def save_manifest(path, manifest):
+    temporary = path + ".tmp"
+    with open(temporary, "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(temporary, path)
+
+def scan_directory(directory):
+    """{relative path: {"sha256", "size"}} of every file below a directory"""
+    files = {}
+    for root, _, names in os.walk(directory):
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            relative = os.path.relpath(path, directory).replace(os.sep, "/")
+            files[relative] = {"sha256": sha256_file(path), "size": os.path.getsize(path)}
+    return files
+
+# --- Progress ---
+class Progress:
+    """Prints bytes done, percentage and rate for one transfer at most every PROGRESS_INTERVAL seconds"""
+
+    def __init__(self, name, total, done=0, report=print):
+        self.name, self.total, self.done = name, total, done
+        self.resumed = done
+        self.report = report
+        self.started = self.last = time.perf_counter()
+
+    def update(self, size):
+        self.done += size
+        now = time.perf_counter()
+        if self.report and now - self.last >= PROGRESS_INTERVAL:
+            self.last = now
+            self.report(f"  {self.name}: {self.done / 1e6:,.1f}/{self.total / 1e6:,.1f} MB "
+                        f"({self.done / max(self.total, 1):.0%}), {self._rate(now):,.1f} MB/s")
+
+    def _rate(self, now):
+        return (self.done - self.resumed) / 1e6 / max(now - self.started, 1e-9)
+
+    def close(self):
+        if self.report:
+            resumed = f", resumed at {self.resumed / 1e6:,.1f} MB" if self.resumed else ""
+            self.report(f"- {self.name}: {self.done / 1e6:,.1f} MB in {time.perf_counter() - self.started:.1f}s "
+                        f"({self._rate(time.perf_counter()):,.1f} MB/s{resumed})")
+
+# --- Sources ---
+def _is_url(mirror):
+    return urllib.parse.urlparse(mirror).scheme in ("http", "https")
+
+def _file_url(mirror, handle, relative):
+    return f"{mirror.rstrip('/')}/{urllib.parse.quote(handle)}/{urllib.parse.quote(relative)}"
+
+def mirror_files(mirror, handle):
+    """{relative path: {"sha256", "size"}} a mirror holds for a handle, or None"""
+    if _is_url(mirror):
+        try:
+            with urllib.request.urlopen(f"{mirror.rstrip('/')}/{MANIFEST_FILE}", timeout=TIMEOUT) as response:
+                manifest = json.load(response)
+        except (urllib.error.URLError, OSError, ValueError):
+            return None
+        entry = manifest.get("artifacts", {}).get(handle)
+        return entry["files"] if entry else None
+    manifest_path = os.path.join(mirror, MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        entry = load_manifest(manifest_path)["artifacts"].get(handle)
+        if entry:
+            return entry["files"]
+    directory = os.path.join(mirror, *handle.split("/"))
+    return scan_directory(directory) if os.path.isdir(directory) else None
+
+def _open_source(mirror, handle, relative, offset):
+    """Readable stream of a mirror file starting at offset, and whether it honoured the offset"""
+    if _is_url(mirror):
+        request = urllib.request.Request(_file_url(mirror, handle, relative))
+        if offset:
+            request.add_header("Range", f"bytes={offset}-")
+        try:
+            response = urllib.request.urlopen(request, timeout=TIMEOUT)
+        except urllib.error.HTTPError as error:
+            if error.code != 416 or not offset:
+                raise
+            error.close()
+            return _open_source(mirror, handle, relative, 0)  # the .part no longer fits the file
+        return response, response.status == 206
+    f = open(os.path.join(mirror, *handle.split("/"), *relative.split("/")), "rb")
+    f.seek(offset)
+    return f, True
+
+# --- Cache ---
+class ArtifactCache:
+    """Content-addressed store of fetched files plus the manifest of complete artifacts"""
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or CACHE_DIR
+        self.manifest_path = os.path.join(self.cache_dir, MANIFEST_FILE)
+
+    def object_path(self, sha256):
+        return os.path.join(self.cache_dir, "objects", sha256[:2], sha256)
+
+    def artifact_dir(self, handle):
+        return os.path.join(self.cache_dir, "artifacts", *handle.split("/"))
+
+    def cached(self, handle):
+        """Artifact directory if the handle is complete in the cache, else None; checks sizes only"""
+        entry = load_manifest(self.manifest_path)["artifacts"].get(handle)
+        if entry is None:
+            return None
+        directory = self.artifact_dir(handle)
+        for relative, meta in entry["files"].items():
+            path = os.path.join(directory, *relative.split("/"))
+            if not os.path.exists(path) or os.path.getsize(path) != meta["size"]:
+                return None
+        return directory
+
+    def transfer(self, mirror, handle, relative, meta, progress=print):
+        """Copy one mirror file into the object store, resuming a partial copy; returns its object path"""
+        target = self.object_path(meta["sha256"])
+        if os.path.exists(target):
+            return target
+        partial = os.path.join(self.cache_dir, "partial", meta["sha256"] + ".part")
+        os.makedirs(os.path.dirname(partial), exist_ok=True)
+        offset = os.path.getsize(partial) if os.path.exists(partial) else 0
+        if offset > meta["size"]:
+            offset = 0
+        digest = hashlib.sha256()
+        if offset:
+            with open(partial, "rb") as f:
+                for chunk in iter(lambda: f.read(CHUNK_BYTES), b""):
+                    digest.update(chunk)
+        if offset < meta["size"]:
+            try:
+                source, resumed = _open_source(mirror, handle, relative, offset)
+                if not resumed:
+                    offset, digest = 0, hashlib.sha256()
+                meter = Progress(relative, meta["size"], offset, progress)
+                with source, open(partial, "ab" if offset else "wb") as out:
+                    for chunk in iter(lambda: source.read(CHUNK_BYTES), b""):
+                        out.write(chunk)
+                        digest.update(chunk)
+                        meter.update(len(chunk))
+                meter.close()
+            except (urllib.error.URLError, http.client.HTTPException, OSError) as error:
+                raise FetchError(f"{handle}/{relative} from {mirror}: {error}") from error
+        if digest.hexdigest() != meta["sha256"]:
+            os.remove(partial)
+            raise FetchError(f"{handle}/{relative} from {mirror}: checksum mismatch")
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(partial, target)
+        return target
+
+    def ingest(self, path, progress=print):
+        """Hash a local file into the object store; returns its {"sha256", "size"}"""
+        meta = {"sha256": sha256_file(path), "size": os.path.getsize(path)}
+        target = self.object_path(meta["sha256"])
+        if not os.path.exists(target):
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            temporary = target + ".tmp"
+            meter = Progress(os.path.basename(path), meta["size"], report=progress)
+            with open(path, "rb") as source, open(temporary, "wb") as out:
+                for chunk in iter(lambda: source.read(CHUNK_BYTES), b""):
+                    out.write(chunk)
+                    meter.update(len(chunk))
+            meter.close()
+            os.replace(temporary, target)
+        return meta
+
+    def commit(self, handle, files, source):
+        """Link the objects of a complete artifact into place and record it in the manifest"""
+        directory = self.artifact_dir(handle)
+        for relative, meta in files.items():
+            path = os.path.join(directory, *relative.split("/"))
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            if os.path.exists(path):
+                os.remove(path)
+            try:
+                os.link(self.object_path(meta["sha256"]), path)
+            except OSError:
+                shutil.copyfile(self.object_path(meta["sha256"]), path)
+        manifest = load_manifest(self.manifest_path)
+        manifest["artifacts"][handle] = {"source": source, "fetched_at": datetime.datetime.now().isoformat(),
+                                         "files": files}
+        save_manifest(self.manifest_path, manifest)
+        return directory
+
+    def verify(self, handle):
+        """Relative paths of an artifact whose contents no longer match their checksum"""
+        entry = load_manifest(self.manifest_path)["artifacts"].get(handle)
+        if entry is None:
+            raise FetchError(f"{handle} is not in the cache")
+        directory = self.artifact_dir(handle)
+        return [relative for relative, meta in entry["files"].items()
+                if sha256_file(os.path.join(directory, *relative.split("/"))) != meta["sha256"]]
+
+# --- Fetching ---
+def _kaggle_download(handle):
+    """Download through kagglehub without a login prompt; returns its local directory"""
+    try:
+        import kagglehub
+    except ImportError:
+        raise FetchError(f"{handle} is on no mirror and kagglehub is not installed")
+    return kagglehub.model_download(handle)
+
+def fetch(handle, cache_dir=None, mirrors=None, offline=None, progress=print):
+    """Local directory holding an artifact's files, fetching them into the cache if needed"""
+    cache = ArtifactCache(cache_dir)
+    directory = cache.cached(handle)
+    if directory:
+        return directory
+    for mirror in MIRRORS if mirrors is None else mirrors:
+        files = mirror_files(mirror, handle)
+        if files is None:
+            continue
+        if progress:
+            progress(f"Fetching {handle} ({sum(meta['size'] for meta in files.values()) / 1e6:,.1f} MB) "
+                     f"from {mirror}")
+        try:
+            for relative, meta in files.items():
+                cache.transfer(mirror, handle, relative, meta, progress)
+        except FetchError as error:
+            if progress:
+                progress(f"{error}; trying the next source")
+            continue
+        return cache.commit(handle, files, mirror)
+    if OFFLINE if offline is None else offline:
+        raise FetchError(f"{handle} is not cached and no mirror has it (offline)")
+    if progress:
+        progress(f"Fetching {handle} from Kaggle")
+    source = _kaggle_download(handle)
+    files = {}
+    for root, _, names in os.walk(source):
+        for name in sorted(names):
+            path = os.path.join(root, name)
+            files[os.path.relpath(path, source).replace(os.sep, "/")] = cache.ingest(path, progress)
+    return cache.commit(handle, files, "kaggle")
+
+def publish(handle, source_dir, mirror_dir):
+    """Copy a directory into a local mirror as <mirror>/<handle>/ and list it in the mirror manifest"""
+    target = os.path.join(mirror_dir, *handle.split("/"))
+    if os.path.abspath(source_dir) != os.path.abspath(target):
+        shutil.copytree(source_dir, target, dirs_exist_ok=True)
+    manifest_path = os.path.join(mirror_dir, MANIFEST_FILE)
+    manifest = load_manifest(manifest_path)
+    files = scan_directory(target)
+    manifest["artifacts"][handle] = {"files": files}
+    save_manifest(manifest_path, manifest)
+    return files
+
+# --- Stand-in Server ---
+class RangeRequestHandler(http.server.SimpleHTTPRequestHandler):
+    """Static file handler that honours single "bytes=start-[end]" Range requests"""
+
+    def send_head(self):
+        header = self.headers.get("Range", "")
+        path = self.translate_path(self.path)
+        if not header.startswith("bytes=") or not os.path.isfile(path):
+            return super().send_head()
+        size = os.path.getsize(path)
+        first, _, last = header[len("bytes="):].partition("-")
+        start = int(first or 0)
+        end = min(int(last), size - 1) if last else size - 1
+        if start >= size:
+            self.send_error(416, "Requested Range Not Satisfiable")
+            return None
+        f = open(path, "rb")
+        f.seek(start)
+        self.send_response(206)
+        self.send_header("Content-Type", self.guess_type(path))
+        self.send_header("Content-Range", f"bytes {start}-{end}/{size}")
+        self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+        self._remaining = end - start + 1
+        return f
+
+    def copyfile(self, source, outputfile):
+        remaining = getattr(self, "_remaining", None)
+        if remaining is None:
+            return super().copyfile(source, outputfile)
+        while remaining > 0:
+            chunk = source.read(min(CHUNK_BYTES, remaining))
+            if not chunk:
+                break
+            outputfile.write(chunk)
+            remaining -= len(chunk)
+
+def serve(directory, port=8000, bind="127.0.0.1"):
+    handler = functools.partial(RangeRequestHandler, directory=directory)
+    with http.server.ThreadingHTTPServer((bind, port), handler) as server:
+        print(f"Serving {os.path.abspath(directory)} on http://{bind}:{port}/")
+        server.serve_forever()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fetch artifacts through the content-addressed cache")
+    parser.add_argument("handle", nargs="?", help="artifact handle, e.g. google/gemma/pyTorch/2b/1")
+    parser.add_argument("--cache-dir", default=None, help=f"cache location (default: {CACHE_DIR})")
+    parser.add_argument("--mirror", action="append", default=None,
+                        help="local directory or http(s) URL to fetch from; repeatable "
+                             "(default: $CHUK_FETCH_MIRRORS)")
+    parser.add_argument("--offline", action="store_true", help="never fall back to Kaggle")
+    parser.add_argument("--verify", action="store_true", help="re-hash the cached files of the handle")
+    parser.add_argument("--publish", metavar="DIR", default=None,
+                        help="copy DIR into the first --mirror (a local directory) as the handle")
+    parser.add_argument("--serve", metavar="DIR", default=None, help="serve DIR over HTTP with Range support")
+    parser.add_argument("--port", type=int, default=8000, help="port for --serve (default: 8000)")
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args.serve, args.port)
+    elif not args.handle:
+        parser.error("a handle is required")
+    elif args.publish:
+        if not args.mirror or _is_url(args.mirror[0]):
+            parser.error("--publish needs a local --mirror directory")
+        published = publish(args.handle, args.publish, args.mirror[0])
+        print(f"Published {len(published)} file(s) of {args.handle} to {args.mirror[0]}")
+    else:
+        started = time.perf_counter()
+        try:
+            path = fetch(args.handle, args.cache_dir, args.mirror, args.offline or None)
+        except FetchError as error:
+            raise SystemExit(str(error))
+        print(f"{args.handle}: {path} ({(time.perf_counter() - started) * 1000:.1f} ms)")
+        if args.verify:
+            damaged = ArtifactCache(args.cache_dir).verify(args.handle)
+            print("verified" if not damaged else f"checksum mismatch: {', '.join(damaged)}")
+            raise SystemExit(1 if damaged else 0)
@@ -0,0 +1,133 @@
+# chuk_ids.py
+# Seeded, collision-free surrogate IDs in the CHUK_XXX_<hex> format.
+#
+# Every entity numbers its rows with a dense integer key (0, 1, 2, ...). The
+# key is pushed through a keyed Feistel network over exactly 4 * width bits,
+# which is a bijection on that range, so distinct keys always give distinct
+# hex digits while the IDs still look random. The round keys come from
+# (seed, entity), so a run is reproducible and any worker can produce the IDs
+# of any key range on its own. decode_ids() inverts the permutation, turning
+# a string ID back into its integer key for joins without a lookup table.
+import numpy as np
+
+# Prefix and hex width of each ID, matching the original uuid4 slices
+ID_FORMATS = {
+    "patients": ("CHUK_PAT_", 8),
+    "doctors": ("CHUK_DOC_", 6),
+    "nurses": ("CHUK_NUR_", 6),
+    "equipment_serials": ("SN_", 8),
+    "appointments": ("CHUK_APT_", 10),
+    "admissions": ("CHUK_ADM_", 8),
+    "medical_records": ("CHUK_REC_", 10),
+    "laboratory_tests": ("CHUK_LAB_", 8),
+    "prescriptions": ("CHUK_PRX_", 8),
+    "billing_records": ("CHUK_BIL_", 8),
+}
+# Fixed namespace order for seeding; append new entities at the end
+ID_NAMESPACES = ["patients", "doctors", "nurses", "equipment_serials", "appointments", "admissions",
+                 "medical_records", "laboratory_tests", "prescriptions", "billing_records"]
+
+FEISTEL_ROUNDS = 6
+BLOCK_SIZE = 4096
+HEX_DIGITS = np.frombuffer(b"0123456789ABCDEF", dtype=np.uint8)
+
+# --- Permutation ---
+def round_keys(entity, seed):
+    sequence = np.random.SeedSequence([seed, ID_NAMESPACES.index(entity)])
+    return sequence.generate_state(FEISTEL_ROUNDS, dtype=np.uint64)
+
+def _mix(half, key, mask):
+    x = (half ^ key) * np.uint64(0x9E3779B97F4A7C15)
+    x ^= x >> np.uint64(29)
+    x *= np.uint64(0xBF58476D1CE4E5B9)
+    x ^= x >> np.uint64(32)
+    return x & mask
+
+def permute(keys, rounds, bits):
+    """Keyed bijection of integer keys onto [0, 2**bits); bits must be even"""
+    half = np.uint64(bits // 2)
+    mask = np.uint64((1 << (bits // 2)) - 1)
+    values = np.asarray(keys, dtype=np.uint64)
+    left, right = values >> half, values & mask
+    for key in rounds:
+        left, right = right, left ^ _mix(right, key, mask)
+    return (left << half) | right
+
+def unpermute(values, rounds, bits):
+    """Inverse of permute()"""
+    half = np.uint64(bits // 2)
+    mask = np.uint64((1 << (bits // 2)) - 1)
+    values = np.asarray(values, dtype=np.uint64)
+    left, right = values >> half, values & mask
+    for key in rounds[::-1]:
+        left, right = right ^ _mix(left, key, mask), left
+    return (left << half) | right
+
+# --- Formatting ---
+def format_ids(prefix, width, values):
+    """Unicode array of prefix + zero-padded uppercase hex, built without a per-ID Python call"""
+    values = np.asarray(values, dtype=np.uint64)
+    shifts = np.arange(width - 1, -1, -1, dtype=np.uint64) * np.uint64(4)
+    digits = HEX_DIGITS[(values[:, None] >> shifts) & np.uint64(0xF)]
+    prefix_bytes = np.frombuffer(prefix.encode("ascii"), dtype=np.uint8)
+    raw = np.empty((len(values), len(prefix_bytes) + width), dtype=np.uint8)
+    raw[:, :len(prefix_bytes)] = prefix_bytes
+    raw[:, len(prefix_bytes):] = digits
+    return raw.view(f"S{raw.shape[1]}").ravel().astype(f"U{raw.shape[1]}")
+
+def parse_ids(prefix, width, ids):
+    """Hex part of each ID as uint64 (inverse of format_ids)"""
+    raw = np.asarray(ids, dtype=f"S{len(prefix) + width}")
+    digits = raw.view(np.uint8).reshape(len(raw), -1)[:, len(prefix):]
+    nibbles = np.where(digits >= ord("A"), digits - (ord("A") - 10), digits - ord("0")).astype(np.uint64)
+    shifts = np.arange(width - 1, -1, -1, dtype=np.uint64) * np.uint64(4)
+    return np.bitwise_or.reduce(nibbles << shifts, axis=1)
+
+# --- Sequences ---
+def capacity(entity):
+    return 1 << (4 * ID_FORMATS[entity][1])
+
+def encode_ids(entity, seed, keys):
+    """String IDs of integer keys"""
+    prefix, width = ID_FORMATS[entity]
+    return format_ids(prefix, width, permute(keys, round_keys(entity, seed), 4 * width))
+
+def decode_ids(entity, seed, ids):
+    """Integer keys of string IDs generated with the same seed"""
+    prefix, width = ID_FORMATS[entity]
+    return unpermute(parse_ids(prefix, width, ids), round_keys(entity, seed), 4 * width).astype(np.int64)
+
+class IdSequence:
+    """Consecutive keys of one entity and their IDs, drawn in vectorized blocks.
+
+    take(n) returns the next n (keys, ids) as arrays; calling the sequence
+    returns one ID at a time from a prefetched block, for per-record loops.
+    Use one style or the other on a given sequence.
+    """
+
+    def __init__(self, entity, seed, start=0, block_size=BLOCK_SIZE):
+        self.entity = entity
+        self.prefix, self.width = ID_FORMATS[entity]
+        self.rounds = round_keys(entity, seed)
+        self.next_key = start
+        self.block_size = block_size
+        self._buffer = []
+
+    def take(self, n):
+        """Integer keys and string IDs of the next n rows"""
+        if self.next_key + n > capacity(self.entity):
+            raise ValueError(f"{self.entity} IDs exhausted: {self.next_key + n:,} keys requested, "
+                             f"{self.width} hex digits allow {capacity(self.entity):,}")
+        keys = np.arange(self.next_key, self.next_key + n, dtype=np.int64)
+        self.next_key += n
+        return keys, format_ids(self.prefix, self.width, permute(keys, self.rounds, 4 * self.width))
+
+    def __call__(self):
+        if not self._buffer:
+            block = min(self.block_size, capacity(self.entity) - self.next_key) or 1
+            self._buffer = self.take(block)[1][::-1].tolist()
+        return self._buffer.pop()
+
+def id_sequences(seed):
+    """A fresh IdSequence for every ID_FORMATS entity"""
+    return {entity: IdSequence(entity, seed) for entity in ID_FORMATS}
@@ -0,0 +1,264 @@
+# chuk_index.py
+# Persistent random-access index over the chunked chuk_<name>_<i> outputs.
+#
+# Each chunk file gets one index segment holding, for every record, its
+# primary key, its patient_id (where the entity has one), and the byte offset
+# and length of the record inside the chunk. Segments are stored under
+# chuk_index/<entity>/ together with the size and mtime of the chunk they
+# describe, so refresh() only indexes chunks that are new or have changed.
+# After every refresh the segments are merged into key- and patient-sorted
+# postings saved as .npy files; lookups memory-map those, binary-search them
+# and seek straight to the record bytes instead of parsing whole chunks.
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+import chuk_io
+
+PRIMARY_KEYS = {
+    "departments": "department_id",
+    "doctors": "doctor_id",
+    "nurses": "nurse_id",
+    "patients": "patient_id",
+    "medical_equipment": "equipment_id",
+    "appointments": "appointment_id",
+    "admissions": "admission_id",
+    "medical_records": "record_id",
+    "laboratory_tests": "test_id",
+    "prescriptions": "prescription_id",
+    "billing_records": "billing_id",
+}
+
+PATIENT_ENTITIES = ["patients", "appointments", "admissions", "medical_records",
+                    "laboratory_tests", "prescriptions", "billing_records"]
+
+# --- Record Offsets ---
+def iter_record_spans(path):
+    """(offset, length, record) for every record of an NDJSON chunk or JSON array file"""
+    if chuk_io.is_ndjson(path):
+        offset = 0
+        with chuk_io.open_file(path, "rb") as f:
+            for line in f:
+                if line.strip():
+                    yield offset, len(line.rstrip(b"\r\n")), json.loads(line)
+                offset += len(line)
+        return
+    # JSON arrays are written with ensure_ascii, so character and byte offsets agree
+    with chuk_io.open_file(path, encoding="ascii") as f:
+        text = f.read()
+    decoder = json.JSONDecoder()
+    position = text.index("[") + 1
+    while True:
+        while position < len(text) and text[position] in " \t\r\n,":
+            position += 1
+        if position >= len(text) or text[position] == "]":
+            return
+        record, end = decoder.raw_decode(text, position)
+        yield position, end - position, record
+        position = end
+
+def _fingerprint(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def _key_array(values):
+    return np.array([value.encode("ascii") if value else b"" for value in values], dtype=bytes)
+
+def build_segment(entity, path):
+    """Index arrays for one chunk file"""
+    key_field = PRIMARY_KEYS[entity]
+    keys, patients, offsets, lengths = [], [], [], []
+    for offset, length, record in iter_record_spans(path):
+        keys.append(record.get(key_field))
+        patients.append(record.get("patient_id"))
+        offsets.append(offset)
+        lengths.append(length)
+    return {
+        "keys": _key_array(keys),
+        "patients": _key_array(patients),
+        "offsets": np.array(offsets, dtype=np.int64),
+        "lengths": np.array(lengths, dtype=np.int32),
+    }
+
+# --- Index ---
+class DatasetIndex:
+    """Primary-key and patient_id postings for every entity of a generated dataset"""
+
+    def __init__(self, data_dir=".", index_dir=None):
+        self.data_dir = data_dir
+        self.index_dir = index_dir or os.path.join(data_dir, "chuk_index")
+        self._merged = {}
+        self._handles = {}
+
+    def _catalog_path(self, entity):
+        return os.path.join(self.index_dir, entity, "catalog.json")
+
+    def _load_catalog(self, entity):
+        path = self._catalog_path(entity)
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def refresh(self, entities=None):
+        """Index new or changed chunks and drop segments of chunks that disappeared.
+
+        Returns {entity: number of chunk files (re)indexed}.
+        """
+        indexed = {}
+        for entity in entities or PRIMARY_KEYS:
+            catalog = self._load_catalog(entity)
+            files = [os.path.basename(path) for path in chuk_io.entity_files(entity, self.data_dir)]
+            entity_dir = os.path.join(self.index_dir, entity)
+            updated = {}
+            count = 0
+            for name in files:
+                fingerprint = _fingerprint(os.path.join(self.data_dir, name))
+                entry = catalog.get(name)
+                if entry and entry["size"] == fingerprint["size"] and entry["mtime_ns"] == fingerprint["mtime_ns"]:
+                    updated[name] = entry
+                    continue
+                os.makedirs(entity_dir, exist_ok=True)
+                segment = build_segment(entity, os.path.join(self.data_dir, name))
+                np.savez(os.path.join(entity_dir, f"{name}.npz"), **segment)
+                updated[name] = {**fingerprint, "records": len(segment["offsets"])}
+                self._close_handle(os.path.join(self.data_dir, name))
+                count += 1
+            for name in set(catalog) - set(updated):
+                self._close_handle(os.path.join(self.data_dir, name))
+                segment_path = os.path.join(entity_dir, f"{name}.npz")
+                if os.path.exists(segment_path):
+                    os.remove(segment_path)
+                count += 1
+            if count or not os.path.exists(self._catalog_path(entity)):
+                os.makedirs(entity_dir, exist_ok=True)
+                with open(self._catalog_path(entity), "w") as f:
+                    json.dump(updated, f, indent=2)
+                # Drop any memory maps before their files are rewritten
+                self._merged.pop(entity, None)
+                self._write_merged(entity)
+            indexed[entity] = count
+        return indexed
+
+    def _close_handle(self, path):
+        """Close the open handle of a chunk file that was rewritten or removed"""
+        handle = self._handles.pop(path, None)
+        if handle is not None:
+            handle.close()
+
+    def _write_merged(self, entity):
+        """Concatenate an entity's segments into key- and patient-sorted postings on disk"""
+        catalog = self._load_catalog(entity)
+        segments = []
+        for chunk, name in enumerate(catalog):
+            with np.load(os.path.join(self.index_dir, entity, f"{name}.npz")) as segment:
+                segment = dict(segment)
+            segment["chunks"] = np.full(len(segment["offsets"]), chunk, dtype=np.int32)
+            segments.append(segment)
+        if segments:
+            merged = {field: np.concatenate([segment[field] for segment in segments])
+                      for field in segments[0]}
+        else:
+            merged = {"keys": np.zeros(0, "S1"), "patients": np.zeros(0, "S1"),
+                      "offsets": np.zeros(0, np.int64), "lengths": np.zeros(0, np.int32),
+                      "chunks": np.zeros(0, np.int32)}
+        by_key = np.argsort(merged["keys"], kind="stable")
+        # Patient postings keep file order, so a patient's records come back in chunk order
+        by_patient = np.argsort(merged["patients"], kind="stable")
+        postings = {
+            "sorted_keys": merged["keys"][by_key],
+            "by_key": by_key,
+            "sorted_patients": merged["patients"][by_patient],
+            "by_patient": by_patient,
+            "chunks": merged["chunks"],
+            "offsets": merged["offsets"],
+            "lengths": merged["lengths"],
+        }
+        merged_dir = os.path.join(self.index_dir, entity, "merged")
+        os.makedirs(merged_dir, exist_ok=True)
+        for field, values in postings.items():
+            np.save(os.path.join(merged_dir, f"{field}.npy"), values)
+
+    def _merge(self, entity):
+        """Memory-map an entity's merged postings"""
+        if entity not in self._merged:
+            merged_dir = os.path.join(self.index_dir, entity, "merged")
+            if not os.path.isdir(merged_dir):
+                self._write_merged(entity)
+            merged = {field: np.load(os.path.join(merged_dir, f"{field}.npy"), mmap_mode="r")
+                      for field in ["sorted_keys", "by_key", "sorted_patients", "by_patient",
+                                    "chunks", "offsets", "lengths"]}
+            merged["files"] = [os.path.join(self.data_dir, name) for name in self._load_catalog(entity)]
+            self._merged[entity] = merged
+        return self._merged[entity]
+
+    def _read(self, merged, row):
+        path = merged["files"][merged["chunks"][row]]
+        handle = self._handles.get(path)
+        if handle is None:
+            handle = self._handles[path] = chuk_io.open_file(path, "rb")
+        handle.seek(int(merged["offsets"][row]))
+        return json.loads(handle.read(int(merged["lengths"][row])))
+
+    def locate(self, entity, key):
+        """(chunk file, byte offset, length) of a record by primary key, or None"""
+        merged = self._merge(entity)
+        rows = self._matching(merged["sorted_keys"], merged["by_key"], key)
+        if not len(rows):
+            return None
+        row = rows[0]
+        return merged["files"][merged["chunks"][row]], int(merged["offsets"][row]), int(merged["lengths"][row])
+
+    def _matching(self, sorted_values, permutation, value):
+        needle = np.array(value.encode("ascii"), dtype=bytes)
+        lo = np.searchsorted(sorted_values, needle, side="left")
+        hi = np.searchsorted(sorted_values, needle, side="right")
+        return permutation[lo:hi]
+
+    def get(self, entity, key):
+        """Point lookup of one record by primary key"""
+        merged = self._merge(entity)
+        rows = self._matching(merged["sorted_keys"], merged["by_key"], key)
+        return self._read(merged, rows[0]) if len(rows) else None
+
+    def for_patient(self, entity, patient_id):
+        """Every record of an entity that belongs to one patient"""
+        merged = self._merge(entity)
+        rows = self._matching(merged["sorted_patients"], merged["by_patient"], patient_id)
+        return [self._read(merged, row) for row in rows]
+
+    def patient_journey(self, patient_id):
+        """The patient record plus their records from every time-series entity"""
+        return {entity: self.for_patient(entity, patient_id) for entity in PATIENT_ENTITIES}
+
+    def close(self):
+        for handle in self._handles.values():
+            handle.close()
+        self._handles = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or query the CHUK random-access index")
+    parser.add_argument("--data-dir", default=".", help="directory holding the chuk_* files")
+    parser.add_argument("--index-dir", default=None, help="index location (default: <data-dir>/chuk_index)")
+    parser.add_argument("--patient", default=None, help="print the journey of this patient_id")
+    args = parser.parse_args()
+
+    with DatasetIndex(args.data_dir, args.index_dir) as index:
+        started = time.perf_counter()
+        indexed = index.refresh()
+        print(f"Indexed {sum(indexed.values())} chunk file(s) in {time.perf_counter() - started:.2f}s")
+        if args.patient:
+            started = time.perf_counter()
+            journey = index.patient_journey(args.patient)
+            print(json.dumps(journey, indent=2))
+            print(f"Fetched {sum(len(records) for records in journey.values())} records "
+                  f"in {(time.perf_counter() - started) * 1000:.1f} ms")
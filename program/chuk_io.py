@@ -0,0 +1,439 @@
+# chuk_io.py
+# Streaming output for the CHUK dataset generator.
+#
+# Time-series entities are written as newline-delimited JSON (one compact
+# record per line) into chuk_<name>_<i>.ndjson chunk files. The writer keeps
+# only a small line buffer in memory and rolls over to the next chunk once a
+# record-count or byte-size limit is reached, so peak memory does not depend
+# on how many records are generated.
+#
+# With a compression codec (gzip, bz2 or lzma), every output file is cut into
+# independent blocks of about COMPRESS_BLOCK_BYTES, each ending on a line
+# boundary, which a thread pool compresses while the generator keeps writing.
+# The blocks are complete gzip/bz2/xz streams, so the concatenated file still
+# decompresses with the standard tools; a <file>.idx sidecar records where
+# each block starts in the raw and compressed data, so open_file() can seek
+# to any raw offset and decompress only the blocks a reader touches.
+import bz2
+import collections
+import concurrent.futures
+import glob
+import gzip
+import io
+import json
+import lzma
+import os
+import re
+
+import numpy as np
+
+CHUNK_RECORDS = 50000
+CHUNK_BYTES = 64 * 1024 * 1024
+BUFFER_BYTES = 1024 * 1024
+READ_CHARS = 1024 * 1024  # characters read at a time from JSON array files
+COMPRESSION = {"gzip": (".gz", gzip), "bz2": (".bz2", bz2), "lzma": (".xz", lzma)}
+COMPRESS_BLOCK_BYTES = 256 * 1024  # raw bytes per independently compressed block
+COMPRESS_THREADS = os.cpu_count() or 1
+GZIP_LEVEL = 6
+INDEX_SUFFIX = ".idx"
+CACHE_BLOCKS = 8  # decompressed blocks kept per open file
+READAHEAD_BLOCKS = 8  # blocks decompressed ahead of a sequential reader
+CHUNK_PATTERN = re.compile(r"_(\d+)\.(?:nd)?json(?:\.(?:gz|bz2|xz))?$")
+
+# --- Block Compression ---
+_pool = None
+_pool_pid = None
+
+def compression_pool():
+    """Thread pool shared by the compressed writers and readers of this process.
+
+    zlib, bz2 and lzma release the GIL while they work, so blocks compress in
+    parallel. The pool is recreated after a fork, whose child has no threads.
+    """
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        _pool = concurrent.futures.ThreadPoolExecutor(COMPRESS_THREADS, thread_name_prefix="chuk-compress")
+        _pool_pid = os.getpid()
+    return _pool
+
+def compression_of(path):
+    """Codec of a compressed chunk file, or None for plain JSON/NDJSON"""
+    for codec, (suffix, _) in COMPRESSION.items():
+        if path.endswith(suffix):
+            return codec
+    return None
+
+def compressed_name(path, codec):
+    return path + COMPRESSION[codec][0] if codec else path
+
+def is_ndjson(path):
+    codec = compression_of(path)
+    return (path[:-len(COMPRESSION[codec][0])] if codec else path).endswith(".ndjson")
+
+def _compress_block(codec, data):
+    if codec == "gzip":
+        # mtime=0 keeps the output identical from run to run
+        return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+    return COMPRESSION[codec][1].compress(data)
+
+def load_block_index(path):
+    """(raw offsets, compressed offsets) of every block, each ending with the file total"""
+    index = np.load(path + INDEX_SUFFIX)
+    return index[:, 0], index[:, 1]
+
+class BlockCompressedWriter:
+    """Text writer that compresses line-aligned blocks in the shared thread pool"""
+
+    def __init__(self, path, codec, block_bytes=COMPRESS_BLOCK_BYTES):
+        self.path = path
+        self.codec = codec
+        self.block_bytes = block_bytes
+        self.raw_bytes = 0
+        self.compressed_bytes = 0
+        self._file = open(path, "wb")
+        self._index = [(0, 0)]
+        self._buffer = []
+        self._buffered = 0
+        self._pending = collections.deque()
+        self._max_pending = 2 * COMPRESS_THREADS
+
+    def write(self, text):
+        self._buffer.append(text)
+        self._buffered += len(text)
+        if self._buffered >= self.block_bytes:
+            self._submit()
+        return len(text)
+
+    def _submit(self, final=False):
+        data = "".join(self._buffer).encode("utf-8")
+        self._buffer, self._buffered = [], 0
+        # Blocks end on a line boundary; the partial line waits for the next block
+        cut = len(data) if final else data.rfind(b"\n") + 1
+        if cut == 0:
+            cut = len(data)
+        if cut < len(data):
+            rest = data[cut:].decode("utf-8")
+            self._buffer, self._buffered = [rest], len(rest)
+        if cut:
+            self._pending.append((cut, compression_pool().submit(_compress_block, self.codec, data[:cut])))
+        while len(self._pending) > (0 if final else self._max_pending):
+            self._write_block()
+
+    def _write_block(self):
+        size, future = self._pending.popleft()
+        block = future.result()
+        self._file.write(block)
+        self.raw_bytes += size
+        self.compressed_bytes += len(block)
+        self._index.append((self.raw_bytes, self.compressed_bytes))
+
+    def close(self):
+        if self._file is None:
+            return
+        self._submit(final=True)
+        self._file.close()
+        self._file = None
+        with open(self.path + INDEX_SUFFIX, "wb") as f:
+            np.save(f, np.array(self._index, dtype=np.int64))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+class BlockCache:
+    """LRU of decompressed blocks (as futures) keyed by (path, block), which BlockReaders may share"""
+
+    def __init__(self, max_blocks=CACHE_BLOCKS):
+        self.max_blocks = max_blocks
+        self._blocks = collections.OrderedDict()
+
+    def get(self, key):
+        future = self._blocks.get(key)
+        if future is not None:
+            self._blocks.move_to_end(key)
+        return future
+
+    def put(self, key, future):
+        self._blocks[key] = future
+        while len(self._blocks) > self.max_blocks:
+            self._blocks.popitem(last=False)
+
+    def clear(self):
+        self._blocks.clear()
+
+    def __len__(self):
+        return len(self._blocks)
+
+class BlockReader(io.RawIOBase):
+    """Seekable raw view of a block-compressed file that decompresses only the blocks it reads.
+
+    Each reader keeps its own cache of cache_blocks blocks unless it is given a
+    shared BlockCache, which bounds the memory of many open readers together.
+    """
+
+    def __init__(self, path, cache_blocks=CACHE_BLOCKS, readahead=READAHEAD_BLOCKS, cache=None):
+        super().__init__()
+        self.path = path
+        self.codec = compression_of(path)
+        self.raw_offsets, self.compressed_offsets = load_block_index(path)
+        self.size = int(self.raw_offsets[-1])
+        self.readahead = readahead
+        self.blocks_decompressed = 0
+        self._file = open(path, "rb")
+        self._position = 0
+        self._owns_cache = cache is None
+        self._cache = BlockCache(max(cache_blocks, readahead + 1)) if cache is None else cache
+        self._last_block = -1
+        self._sequential = 1  # the first block counts as sequential
+
+    def readable(self):
+        return True
+
+    def seekable(self):
+        return True
+
+    def tell(self):
+        return self._position
+
+    def seek(self, offset, whence=io.SEEK_SET):
+        base = {io.SEEK_SET: 0, io.SEEK_CUR: self._position, io.SEEK_END: self.size}[whence]
+        self._position = max(base + offset, 0)
+        return self._position
+
+    def _fetch(self, block):
+        """Future of a decompressed block, started now if it is not cached"""
+        future = self._cache.get((self.path, block))
+        if future is None:
+            start, end = int(self.compressed_offsets[block]), int(self.compressed_offsets[block + 1])
+            self._file.seek(start)
+            future = compression_pool().submit(COMPRESSION[self.codec][1].decompress, self._file.read(end - start))
+            self._cache.put((self.path, block), future)
+            self.blocks_decompressed += 1
+        return future
+
+    def _block(self, block):
+        self._sequential = self._sequential + 1 if block == self._last_block + 1 else 0
+        if self._sequential >= 2:
+            # Sequential reading: decompress the next blocks in the background
+            for ahead in range(block + 1, min(block + 1 + self.readahead, len(self.raw_offsets) - 1)):
+                self._fetch(ahead)
+        self._last_block = block
+        return self._fetch(block).result()
+
+    def readinto(self, buffer):
+        if self._position >= self.size:
+            return 0
+        block = int(np.searchsorted(self.raw_offsets, self._position, side="right")) - 1
+        data = self._block(block)
+        start = self._position - int(self.raw_offsets[block])
+        count = min(len(buffer), len(data) - start)
+        buffer[:count] = data[start:start + count]
+        self._position += count
+        return count
+
+    def close(self):
+        if not self.closed:
+            self._file.close()
+            if self._owns_cache:
+                self._cache.clear()
+        super().close()
+
+def open_file(path, mode="r", encoding=None):
+    """Open a chunk file for reading, decompressing it transparently when it is compressed.
+
+    Files with a block index can seek to raw offsets; a compressed file
+    without one (for example recompressed by hand) is read sequentially.
+    """
+    codec = compression_of(path)
+    if codec is None:
+        return open(path, mode, encoding=encoding)
+    if os.path.exists(path + INDEX_SUFFIX):
+        raw = io.BufferedReader(BlockReader(path), buffer_size=64 * 1024)
+        return raw if "b" in mode else io.TextIOWrapper(raw, encoding=encoding or "utf-8")
+    return COMPRESSION[codec][1].open(path, "rb" if "b" in mode else "rt", encoding=encoding)
+
+def open_output(path, codec=None):
+    """Text file for writing path exactly, block-compressed when a codec is given"""
+    if codec:
+        return BlockCompressedWriter(path, codec)
+    return open(path, "w", encoding="ascii")
+
+def replace_file(source, target):
+    """os.replace for a chunk file together with its block index"""
+    os.replace(source, target)
+    if os.path.exists(source + INDEX_SUFFIX):
+        os.replace(source + INDEX_SUFFIX, target + INDEX_SUFFIX)
+
+def rewrite_file(path, records):
+    """Replace a chunk or JSON array file with records, in its format and compression"""
+    temporary = path + ".tmp"
+    with open_output(temporary, compression_of(path)) as f:
+        if is_ndjson(path):
+            for record in records:
+                f.write(json.dumps(record, separators=(",", ":")))
+                f.write("\n")
+        else:
+            json.dump(records, f, indent=2)
+    replace_file(temporary, path)
+
+def compression_summary(data_dir, entities):
+    """Raw and compressed bytes per entity and in total, from the block indexes"""
+    summary = {"entities": {}, "raw_bytes": 0, "compressed_bytes": 0}
+    for entity in entities:
+        raw = compressed = 0
+        for path in entity_files(entity, data_dir):
+            if compression_of(path) and os.path.exists(path + INDEX_SUFFIX):
+                raw_offsets, compressed_offsets = load_block_index(path)
+                raw += int(raw_offsets[-1])
+                compressed += int(compressed_offsets[-1])
+            else:
+                size = os.path.getsize(path)
+                raw += size
+                compressed += size
+        summary["entities"][entity] = {"raw_bytes": raw, "compressed_bytes": compressed}
+        summary["raw_bytes"] += raw
+        summary["compressed_bytes"] += compressed
+    summary["ratio"] = round(summary["raw_bytes"] / max(summary["compressed_bytes"], 1), 2)
+    return summary
+
+class NDJSONChunkWriter:
+    """Buffered NDJSON writer that rolls over chunk files by record count or byte size"""
+
+    def __init__(self, name, out_dir=".", max_records=CHUNK_RECORDS, max_bytes=CHUNK_BYTES,
+                 buffer_bytes=BUFFER_BYTES, default=None, first_chunk=0, stem=None, compress=None):
+        self.name = name
+        self.out_dir = out_dir
+        self.stem = stem or f"chuk_{name}"
+        self.max_records = max_records
+        self.max_bytes = max_bytes
+        self.buffer_bytes = buffer_bytes
+        self.default = default
+        self.compress = compress
+        self.chunk_index = first_chunk - 1
+        self.files = []
+        self.records_written = 0
+        self.bytes_written = 0
+        self._file = None
+        self._buffer = []
+        self._buffered = 0
+        self._chunk_records = 0
+        self._chunk_bytes = 0
+
+    def _roll_over(self):
+        self._close_chunk()
+        self.chunk_index += 1
+        path = compressed_name(os.path.join(self.out_dir, f"{self.stem}_{self.chunk_index}.ndjson"), self.compress)
+        self._file = open_output(path, self.compress)
+        self.files.append(path)
+        self._chunk_records = 0
+        self._chunk_bytes = 0
+
+    def _flush(self):
+        if self._buffer:
+            self._file.write("".join(self._buffer))
+            self._buffer = []
+            self._buffered = 0
+
+    def _close_chunk(self):
+        if self._file is not None:
+            self._flush()
+            self._file.close()
+            self._file = None
+
+    def write(self, record):
+        # ensure_ascii keeps one character per byte, so len() is the byte size
+        line = json.dumps(record, default=self.default, separators=(",", ":")) + "\n"
+        size = len(line)
+        if (self._file is None or self._chunk_records >= self.max_records
+                or (self._chunk_records and self._chunk_bytes + size > self.max_bytes)):
+            self._roll_over()
+        self._buffer.append(line)
+        self._buffered += size
+        self._chunk_records += 1
+        self._chunk_bytes += size
+        self.records_written += 1
+        self.bytes_written += size
+        if self._buffered >= self.buffer_bytes:
+            self._flush()
+
+    def write_all(self, records):
+        for record in records:
+            self.write(record)
+        return self
+
+    def close(self):
+        self._close_chunk()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+# --- Readers ---
+def chunk_number(path):
+    match = CHUNK_PATTERN.search(path)
+    return int(match.group(1)) if match else -1
+
+def entity_files(name, data_dir="."):
+    """All files holding an entity: chuk_<name>.json or its numbered chunks, in chunk order.
+
+    Compressed files (chuk_<name>_<i>.ndjson.gz and so on) are listed the same way.
+    """
+    singles = [os.path.join(data_dir, f"chuk_{name}.json")]
+    singles += [compressed_name(singles[0], codec) for codec in COMPRESSION]
+    chunks = glob.glob(os.path.join(data_dir, f"chuk_{name}_*.ndjson*")) + \
+        glob.glob(os.path.join(data_dir, f"chuk_{name}_*.json*"))
+    chunks = [path for path in chunks if chunk_number(path) >= 0]
+    files = [path for path in singles if os.path.exists(path)][:1]
+    return files + sorted(chunks, key=chunk_number)
+
+def iter_file(path):
+    """Records from one NDJSON chunk or JSON array file, compressed or not"""
+    if is_ndjson(path):
+        with open_file(path, encoding="ascii") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    else:
+        with open_file(path) as f:
+            yield from _iter_json_array(f)
+
+def _iter_json_array(f, read_chars=READ_CHARS):
+    """Decode the items of a JSON array file one at a time from a sliding buffer.
+
+    Only the unread tail of the buffer and one item are held at a time, so
+    large chuk_<name>_<i>.json arrays stream like NDJSON chunks.
+    """
+    decoder = json.JSONDecoder()
+    buffer, position, eof = "", 0, False
+    started = False
+    while True:
+        while position < len(buffer) and buffer[position] in " \t\r\n,[":
+            started = started or buffer[position] == "["
+            position += 1
+        if position < len(buffer) and started:
+            if buffer[position] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                yield item
+                position = end
+                continue
+        elif eof:
+            return
+        # Keep the unread tail and read on
+        more = f.read(read_chars)
+        eof = not more
+        buffer, position = buffer[position:] + more, 0
+
+def iter_entity(name, data_dir="."):
+    """Stream every record of an entity across its chunk files"""
+    for path in entity_files(name, data_dir):
+        yield from iter_file(path)
@@ -0,0 +1,399 @@
+# chuk_journeys.py
+# Causally consistent per-patient journeys for the six time-series entities.
+#
+# The default generators draw every record of every entity independently, so
+# a lab test or bill has no link to any visit and may predate the patient's
+# registration. Here each patient instead walks through a time-ordered chain:
+#
+#   appointment -> medical record -> lab tests -> prescriptions -> bill
+#                                 \-> admission -> readmissions -> bill
+#
+# Appointments fall between the patient's registration (or the window start)
+# and the window end. Attended appointments are "Completed" and open a
+# medical record a few minutes later; lab tests follow the visit, and
+# prescriptions follow the last lab result of that visit. Some visits, more
+# often emergency ones, lead to an admission; a discharged admission may be
+# followed by a readmission a few days to weeks later, never overlapping
+# another stay of the same patient. The readmission chance rises with risk
+# factors (emergency start, chronic diagnosis, long stay, no insurance, an
+# earlier readmission), so readmission labels carry signal. Every visit and
+# every discharge is billed after its last event. Records carry the IDs of
+# what caused them:
+#
+#   medical_records.appointment_id, laboratory_tests.record_id,
+#   prescriptions.record_id, admissions.record_id / readmission_of,
+#   billing_records.record_id / admission_id
+#
+# Events past the window end are dropped; since every event comes after its
+# cause, dropping them never leaves a dangling reference. Patients are
+# processed in blocks of consecutive patients, each from its own seed, and
+# every entity is written sorted by (patient, time), so one patient's
+# records sit together in each entity's chunk files. Record attributes come
+# from the chuk_batch column generators; only patients, doctors, timestamps
+# and the fields tied to them are replaced. Counts follow the configured
+# entity sizes approximately, except billing records, of which there is one
+# per visit and one per discharge.
+import numpy as np
+
+import chuk_batch
+import chuk_io
+from chuk_vocab import (
+    APPOINTMENT_STATUSES, APPOINTMENT_TYPES, ADMISSION_TYPES, DISCHARGE_REASONS, VISIT_TYPES, SERVICE_TYPES,
+    get_medical_conditions,
+)
+
+BLOCK_PATIENTS = 1000
+JOURNEY_STREAM = len(chuk_batch.TIMESERIES_ENTITIES)  # keeps block seeds apart from the shard seeds
+READMISSION_RATE = 0.2  # average chance that a discharge is followed by a readmission
+# Readmission chance is a logistic function of the stay: the base log-odds plus
+# the weight of every risk factor present, about READMISSION_RATE on average
+READMISSION_LOGIT = -2.2
+READMISSION_RISKS = {
+    "emergency": 0.8,  # the chain started with an emergency visit
+    "chronic": 0.7,  # chronic primary diagnosis
+    "long_stay": 0.5,  # more than two weeks in hospital
+    "uninsured": 0.4,  # no insurance coverage
+    "readmitted": 0.6,  # the stay was itself a readmission
+}
+CHRONIC_CONDITIONS = ["Hypertension", "Diabetes Type 2", "HIV/AIDS", "Tuberculosis", "Hepatitis B"]
+READMISSION_GAP_DAYS = 20.0  # mean days between discharge and readmission
+MAX_READMISSIONS = 3  # readmissions chained onto one admission
+EMERGENCY_ADMISSION_WEIGHT = 3.0  # emergency visits lead to admissions this much more often
+MINUTE = 60 * 10 ** 6  # timestamps are int64 microseconds
+DAY = 24 * 60 * MINUTE
+OPEN = np.iinfo(np.int64).max  # end of a stay that has not ended by the window end
+
+CONDITIONS = get_medical_conditions()
+
+# Appointment type -> visit type of the medical record it opens
+VISIT_TYPE_OF_APPOINTMENT = {
+    "Consultation": "Consultation",
+    "Follow-up": "Follow-up",
+    "Emergency": "Emergency",
+    "Surgery": "Consultation",
+    "Routine Check": "Routine",
+}
+
+# Cross-reference fields per entity: (field, referenced entity, row column)
+REFERENCES = {
+    "appointments": [],
+    "admissions": [("record_id", "medical_records", "record"), ("readmission_of", "admissions", "parent")],
+    "medical_records": [("appointment_id", "appointments", "appointment")],
+    "laboratory_tests": [("record_id", "medical_records", "record")],
+    "prescriptions": [("record_id", "medical_records", "record")],
+    "billing_records": [("record_id", "medical_records", "record"), ("admission_id", "admissions", "admission")],
+}
+
+# --- Helpers ---
+def _micros(values):
+    return np.asarray(values, dtype="datetime64[us]").astype(np.int64)
+
+def _datetimes(micros):
+    return np.asarray(micros, dtype=np.int64).astype("datetime64[us]")
+
+def _minutes(rng, low, high, n):
+    return rng.randint(low, high + 1, n).astype(np.int64) * MINUTE
+
+def _by_patient_time(rows):
+    """Reorder a dict of row arrays by (patient, time), remapping its self-references in "parent" """
+    order = np.lexsort((rows["time"], rows["patient"]))
+    rows = {name: values[order] for name, values in rows.items()}
+    if "parent" in rows:
+        position = np.empty(len(order), dtype=np.int64)
+        position[order] = np.arange(len(order))
+        rows["parent"] = np.where(rows["parent"] >= 0, position[np.maximum(rows["parent"], 0)], -1)
+    return rows
+
+def _latest(initial, rows, times):
+    """Per parent row, the latest of initial and the times of its child rows"""
+    latest = initial.copy()
+    np.maximum.at(latest, rows, times)
+    return latest
+
+def _follow_chain(values, parent):
+    """Fill the -1 entries of readmissions from the admission they follow"""
+    for _ in range(MAX_READMISSIONS):
+        values = np.where((values < 0) & (parent >= 0), values[np.maximum(parent, 0)], values)
+    return values
+
+def journey_rates(counts, registration, start_date, end_date):
+    """Appointments per patient-day and per-visit rates close to the configured counts"""
+    start, end = _micros(start_date), _micros(end_date)
+    patient_days = np.maximum(end - np.maximum(_micros(registration), start), 0).sum() / DAY
+    visits = max(min(counts["medical_records"], counts["appointments"]), 1)
+    return {
+        "appointments_per_day": counts["appointments"] / patient_days if patient_days else 0.0,
+        "attendance": visits / max(counts["appointments"], 1),
+        "tests_per_visit": counts["laboratory_tests"] / visits,
+        "prescriptions_per_visit": counts["prescriptions"] / visits,
+        "admissions_per_visit": min(counts["admissions"] * (1 - READMISSION_RATE) / visits, 1.0),
+    }
+
+# --- Journey Steps ---
+def _appointments(rng, patients, window_start, end, rates):
+    days = np.maximum(end - window_start[patients], 0) / DAY
+    patient = np.repeat(patients, rng.poisson(rates["appointments_per_day"] * days))
+    begin = window_start[patient]
+    time = begin + (rng.random_sample(len(patient)) * (end - begin)).astype(np.int64)
+    return _by_patient_time({"patient": patient, "time": time})
+
+def _medical_records(rng, appointments, attended, end):
+    appointment = np.flatnonzero(attended)
+    rows = {"patient": appointments["patient"][appointment],
+            "time": appointments["time"][appointment] + _minutes(rng, 0, 30, len(appointment)),
+            "doctor": appointments["doctor"][appointment],
+            "appointment": appointment}
+    keep = rows["time"] < end
+    return _by_patient_time({name: values[keep] for name, values in rows.items()})
+
+def _visit_children(rng, visits, per_visit, delay, end, after=None):
+    """Rows of a per-visit entity, delay minutes after the visit and after after[visit] if given"""
+    record = np.repeat(np.arange(len(visits["time"])), rng.poisson(per_visit, len(visits["time"])))
+    time = visits["time"][record] + _minutes(rng, *delay, len(record))
+    if after is not None:
+        time = np.maximum(time, after[record] + _minutes(rng, 0, 60, len(record)))
+    keep = time < end
+    return _by_patient_time({"patient": visits["patient"][record][keep], "time": time[keep],
+                             "doctor": visits["doctor"][record][keep], "record": record[keep]})
+
+def _stay_end(discharge, end):
+    return np.where(discharge <= end, discharge, OPEN)
+
+def readmission_chance(emergency, chronic, stay_days, uninsured, readmitted):
+    """Chance that a discharged stay is followed by a readmission, from its risk factors"""
+    logit = (READMISSION_LOGIT
+             + READMISSION_RISKS["emergency"] * emergency
+             + READMISSION_RISKS["chronic"] * chronic
+             + READMISSION_RISKS["long_stay"] * (stay_days > 14)
+             + READMISSION_RISKS["uninsured"] * uninsured
+             + READMISSION_RISKS["readmitted"] * readmitted)
+    return 1 / (1 + np.exp(-logit))
+
+def _admissions(rng, visits, emergency, chronic, uninsured, rates, end):
+    """Admissions opened by visits plus their readmission chains, with no overlapping stays.
+
+    emergency and chronic flag the visits; uninsured flags the patients.
+    """
+    weight = np.where(emergency, EMERGENCY_ADMISSION_WEIGHT, 1.0)
+    chance = rates["admissions_per_visit"] * weight / weight.mean() if len(weight) else weight
+    record = np.flatnonzero(rng.random_sample(len(weight)) < chance)
+    time = visits["time"][record] + _minutes(rng, 30, 240, len(record))
+    rows = _by_patient_time({
+        "patient": visits["patient"][record], "time": time,
+        "discharge": time + rng.randint(1, 31, len(record)).astype(np.int64) * DAY,
+        "record": record, "parent": np.full(len(record), -1, dtype=np.int64),
+        "generation": np.zeros(len(record), dtype=np.int8),
+        "emergency": emergency[record], "chronic": chronic[record],
+    })
+    keep = rows["time"] < end
+    rows = {name: values[keep] for name, values in rows.items()}
+
+    # A stay may not start before an earlier stay of the same patient has ended.
+    # Stay ends are packed with the patient's run number so that one running
+    # maximum covers every patient; dropped stays still count, which only errs
+    # towards dropping more.
+    if len(rows["time"]):
+        base = rows["time"].min() // 10 ** 6
+        stay_end = np.minimum(_stay_end(rows["discharge"], end) // 10 ** 6 - base, 2 ** 40)
+        first = np.ones(len(stay_end), dtype=bool)
+        first[1:] = rows["patient"][1:] != rows["patient"][:-1]
+        run = np.cumsum(first).astype(np.int64) << 41
+        running = np.maximum.accumulate(run + stay_end)
+        previous = np.concatenate([[-1], running[:-1]])
+        overlaps = ~first & (previous - run > rows["time"] // 10 ** 6 - base)
+        rows = {name: values[~overlaps] for name, values in rows.items()}
+
+    # Readmissions fit between a discharge and the patient's next admission
+    for generation in range(1, MAX_READMISSIONS + 1):
+        stay_end = _stay_end(rows["discharge"], end)
+        same_patient = rows["patient"][1:] == rows["patient"][:-1]
+        next_start = np.append(np.where(same_patient, rows["time"][1:], OPEN), OPEN)
+        parent = np.flatnonzero((rows["generation"] == generation - 1) & (stay_end != OPEN))
+        chance = readmission_chance(rows["emergency"][parent], rows["chronic"][parent],
+                                    (rows["discharge"][parent] - rows["time"][parent]) / DAY,
+                                    uninsured[rows["patient"][parent]], generation > 1)
+        parent = parent[rng.random_sample(len(parent)) < chance]
+        gap = ((1 + rng.exponential(READMISSION_GAP_DAYS, len(parent))) * DAY).astype(np.int64)
+        time = stay_end[parent] + gap
+        discharge = time + rng.randint(1, 31, len(parent)).astype(np.int64) * DAY
+        fits = (time < end) & (_stay_end(discharge, end) <= next_start[parent])
+        if not fits.any():
+            break
+        added = {"patient": rows["patient"][parent][fits], "time": time[fits], "discharge": discharge[fits],
+                 "record": np.full(int(fits.sum()), -1, dtype=np.int64), "parent": parent[fits],
+                 "generation": np.full(int(fits.sum()), generation, dtype=np.int8),
+                 "emergency": rows["emergency"][parent][fits], "chronic": rows["chronic"][parent][fits]}
+        rows = _by_patient_time({name: np.concatenate([rows[name], added[name]]) for name in rows})
+    return rows
+
+def _bills(rng, visits, visit_ready, admissions, end):
+    """One bill per visit, after its last test or prescription, and one per discharge"""
+    discharged = np.flatnonzero(admissions["discharge"] <= end)
+    rows = {
+        "patient": np.concatenate([visits["patient"], admissions["patient"][discharged]]),
+        "time": np.concatenate([visit_ready + _minutes(rng, 10, 120, len(visit_ready)),
+                                admissions["discharge"][discharged] + _minutes(rng, 60, 48 * 60, len(discharged))]),
+        "record": np.concatenate([np.arange(len(visit_ready)), np.full(len(discharged), -1)]),
+        "admission": np.concatenate([np.full(len(visit_ready), -1), discharged]),
+    }
+    keep = rows["time"] < end
+    return _by_patient_time({name: values[keep] for name, values in rows.items()})
+
+# --- Journey Blocks ---
+def generate_block(rng, patients, window_start, start_date, end_date, rates, refs):
+    """Journeys of a block of patients as {entity: (column batch, row arrays)}"""
+    end = _micros(end_date)
+    n_doctors = len(refs["doctor_ids"])
+
+    appointments = _appointments(rng, patients, window_start, end, rates)
+    n = len(appointments["time"])
+    appointments["doctor"] = rng.randint(0, n_doctors, n)
+    attended = rng.random_sample(n) < rates["attendance"]
+    missed = np.array([APPOINTMENT_STATUSES.index("Cancelled"), APPOINTMENT_STATUSES.index("No-Show")])
+    appointment_cols = chuk_batch.generate_appointments(rng, n, refs, start_date, end_date)
+    appointment_cols.update(
+        patient_idx=appointments["patient"].astype(np.int32),
+        doctor_idx=appointments["doctor"].astype(np.int32),
+        appointment_date=_datetimes(appointments["time"]),
+        status=np.where(attended, APPOINTMENT_STATUSES.index("Completed"),
+                        missed[rng.randint(0, len(missed), n)]).astype(np.int8),
+    )
+
+    visits = _medical_records(rng, appointments, attended, end)
+    n = len(visits["time"])
+    visit_type_of = np.array([VISIT_TYPES.index(VISIT_TYPE_OF_APPOINTMENT[name]) for name in APPOINTMENT_TYPES],
+                             dtype=np.int8)
+    record_cols = chuk_batch.generate_medical_records(rng, n, refs, start_date, end_date)
+    record_cols.update(
+        patient_idx=visits["patient"].astype(np.int32),
+        doctor_idx=visits["doctor"].astype(np.int32),
+        visit_date=_datetimes(visits["time"]),
+        visit_type=visit_type_of[appointment_cols["type"][visits["appointment"]]],
+    )
+
+    tests = _visit_children(rng, visits, rates["tests_per_visit"], (5, 120), end)
+    test_cols = chuk_batch.generate_laboratory_tests(rng, len(tests["time"]), refs, start_date, end_date)
+    test_cols.update(
+        patient_idx=tests["patient"].astype(np.int32),
+        ordered_by=tests["doctor"].astype(np.int32),
+        test_date=_datetimes(tests["time"]),
+    )
+    results = tests["time"] + test_cols["result_hours"].astype(np.int64) * 60 * MINUTE
+    last_result = _latest(visits["time"], tests["record"], results)
+
+    prescriptions = _visit_children(rng, visits, rates["prescriptions_per_visit"], (15, 90), end, last_result)
+    prescription_cols = chuk_batch.generate_prescriptions(rng, len(prescriptions["time"]), refs,
+                                                          start_date, end_date)
+    prescription_cols.update(
+        patient_idx=prescriptions["patient"].astype(np.int32),
+        doctor_idx=prescriptions["doctor"].astype(np.int32),
+        prescription_date=_datetimes(prescriptions["time"]),
+    )
+
+    emergency = record_cols["visit_type"] == VISIT_TYPES.index("Emergency")
+    chronic = np.isin(record_cols["diagnosis"], [CONDITIONS.index(name) for name in CHRONIC_CONDITIONS])
+    admissions = _admissions(rng, visits, emergency, chronic, refs["patient_coverage"] == 0, rates, end)
+    n = len(admissions["time"])
+    from_visit = admissions["record"] >= 0
+    visit = np.maximum(admissions["record"], 0)
+    # Readmissions keep the doctor and diagnosis of the stay they follow
+    doctor = _follow_chain(np.where(from_visit, visits["doctor"][visit], -1), admissions["parent"])
+    diagnosis = _follow_chain(np.where(from_visit, record_cols["diagnosis"][visit], -1), admissions["parent"])
+    discharged = admissions["discharge"] <= end
+    admission_cols = chuk_batch.generate_admissions(rng, n, refs, start_date, end_date)
+    admission_cols.update(
+        patient_idx=admissions["patient"].astype(np.int32),
+        doctor_idx=doctor.astype(np.int32),
+        admission_date=_datetimes(admissions["time"]),
+        discharge_date=np.where(discharged, _datetimes(admissions["discharge"]), np.datetime64("NaT", "us")),
+        admission_type=np.where(from_visit & emergency[visit], ADMISSION_TYPES.index("Emergency"),
+                                admission_cols["admission_type"]).astype(np.int8),
+        primary_diagnosis=diagnosis.astype(np.int8),
+        admission_reason=diagnosis.astype(np.int8),
+        discharge_reason=np.where(discharged, chuk_batch.random_codes(rng, DISCHARGE_REASONS, n), -1).astype(np.int8),
+        total_cost=np.where(discharged, chuk_batch.random_costs(rng, 50000, 2000000, n), np.nan),  # RWF
+    )
+
+    visit_ready = _latest(_latest(visits["time"], tests["record"], tests["time"]),
+                          prescriptions["record"], prescriptions["time"])
+    bills = _bills(rng, visits, visit_ready, admissions, end)
+    bill_cols = chuk_batch.generate_billing_records(rng, len(bills["time"]), refs, start_date, end_date)
+    coverage = refs["patient_coverage"][bills["patient"]]
+    insurance_amount = np.where(coverage > 0, np.round(bill_cols["subtotal"] * (coverage / 100)), 0)
+    bill_cols.update(
+        patient_idx=bills["patient"].astype(np.int32),
+        billing_date=_datetimes(bills["time"]),
+        insurance_coverage_percent=coverage,
+        insurance_amount=insurance_amount,
+        patient_amount=bill_cols["subtotal"] - insurance_amount,
+    )
+    # The first service of a bill is the consultation or the admission it settles
+    first_service = bill_cols["services"]["offsets"][:-1]
+    bill_cols["services"]["service_type"][first_service] = np.where(
+        bills["admission"] >= 0, SERVICE_TYPES.index("Admission"), SERVICE_TYPES.index("Consultation"))
+
+    return {
+        "appointments": (appointment_cols, appointments),
+        "admissions": (admission_cols, admissions),
+        "medical_records": (record_cols, visits),
+        "laboratory_tests": (test_cols, tests),
+        "prescriptions": (prescription_cols, prescriptions),
+        "billing_records": (bill_cols, bills),
+    }
+
+def _references(ids, rows):
+    """Referenced IDs per row, None where the row refers to nothing (-1)"""
+    if not len(ids):
+        return [None] * len(rows)
+    return np.where(rows >= 0, ids[np.maximum(rows, 0)], None).tolist()
+
+def _with_references(records, references):
+    names = list(references)
+    for record, values in zip(records, zip(*references.values())):
+        record.update(zip(names, values))
+        yield record
+
+def iter_block_records(block, refs, id_sequences):
+    """(entity, records) of a generated block, with IDs and cross-reference IDs filled in"""
+    ids = {}
+    for entity in chuk_batch.TIMESERIES_ENTITIES:
+        columns, _ = block[entity]
+        columns["key"], ids[entity] = id_sequences[entity].take(chuk_batch.num_rows(columns))
+    for entity in chuk_batch.TIMESERIES_ENTITIES:
+        columns, rows = block[entity]
+        references = {field: _references(ids[target], rows[column])
+                      for field, target, column in REFERENCES[entity]}
+        records = chuk_batch.iter_records(entity, columns, refs, ids[entity].tolist())
+        yield entity, _with_references(records, references) if references else records
+
+def generate_journeys(refs, counts, start_date, end_date, seed, id_sequences, out_dir=".",
+                      block_patients=BLOCK_PATIENTS, max_records=chuk_io.CHUNK_RECORDS,
+                      max_bytes=chuk_io.CHUNK_BYTES, default=None, progress=None, compress=None):
+    """Write journeys for every patient into NDJSON chunk files; returns {entity: records written}.
+
+    refs must hold "patient_registration" (see chuk_batch.build_refs). Block
+    b of patients draws from SeedSequence([seed, JOURNEY_STREAM, b]), so the
+    output depends only on the seed, the block size and the inputs.
+    """
+    start = _micros(start_date)
+    window_start = np.maximum(_micros(refs["patient_registration"]), start)
+    rates = journey_rates(counts, refs["patient_registration"], start_date, end_date)
+    writers = {entity: chuk_io.NDJSONChunkWriter(entity, out_dir=out_dir, max_records=max_records,
+                                                 max_bytes=max_bytes, default=default, compress=compress)
+               for entity in chuk_batch.TIMESERIES_ENTITIES}
+    num_patients = len(window_start)
+    try:
+        for block, first in enumerate(range(0, num_patients, block_patients)):
+            sequence = np.random.SeedSequence([seed, JOURNEY_STREAM, block])
+            rng = np.random.RandomState(np.random.MT19937(sequence))
+            patients = np.arange(first, min(first + block_patients, num_patients))
+            generated = generate_block(rng, patients, window_start, start_date, end_date, rates, refs)
+            for entity, records in iter_block_records(generated, refs, id_sequences):
+                writers[entity].write_all(records)
+            if progress:
+                progress(f"  journeys: {patients[-1] + 1:,}/{num_patients:,} patients, "
+                         f"{sum(writer.records_written for writer in writers.values()):,} records")
+    finally:
+        for writer in writers.values():
+            writer.close()
+    return {entity: writer.records_written for entity, writer in writers.items()}
@@ -0,0 +1,49 @@
+# chuk_pools.py
+# Pre-generated Faker value pools and a cheap timestamp sampler.
+#
+# Faker takes tens of microseconds per call, which dominated the per-record
+# loops (two street names, a city and an emergency contact per patient, a
+# name per lab test, a sentence per billing service). Instead, a seeded Faker
+# instance fills a fixed-size pool of each kind once, and the generators pick
+# from the pools with the seeded random module (random.choice) or, in batch
+# mode, with NumPy index arrays. Timestamps are drawn as uniform offsets
+# instead of through fake.date_time_between. Each pool is seeded on its own,
+# so a run builds only the pools its entities draw from (Faker is imported
+# only then).
+import datetime
+import random
+
+LOCALE = "en_US"
+
+# Pool name -> (number of values, Faker call producing one value)
+POOLS = {
+    "names": (5000, lambda fake: fake.name()),
+    "cities": (2000, lambda fake: fake.city()),
+    "street_names": (5000, lambda fake: fake.street_name()),
+    "sentences": (5000, lambda fake: fake.sentence(nb_words=4)),
+}
+
+def build_pools(seed, sizes=None, locale=LOCALE, names=None):
+    """{pool name: list of values}, reproducible for a given seed and sizes.
+
+    sizes optionally overrides the number of values per pool; names limits
+    the pools built (default: all of them). Faker is only imported when a
+    pool is built.
+    """
+    if names is not None and not set(names) & set(POOLS):
+        return {}
+    from faker import Faker
+    fake = Faker(locale)
+    sizes = sizes or {}
+    pools = {}
+    for name, (size, make) in POOLS.items():
+        if names is not None and name not in names:
+            continue
+        fake.seed_instance(f"{seed}/{name}")
+        pools[name] = [make(fake) for _ in range(sizes.get(name, size))]
+    return pools
+
+def random_datetime(start_date, end_date):
+    """Uniform datetime between two datetimes, drawn from the seeded random module"""
+    span = (end_date - start_date).total_seconds()
+    return start_date + datetime.timedelta(seconds=random.random() * span)
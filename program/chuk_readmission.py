@@ -0,0 +1,172 @@
+# chuk_readmission.py
+# Readmission labels and per-admission features over chuk_admissions.
+#
+# Admissions are sorted once by (patient, admission time). Every feature is
+# then a vectorized pass over the sorted arrays:
+#   - prior admission counts come from each row's position in its patient run
+#   - days since the previous discharge come from a one-row shift
+#   - readmission within 7/30/90 days uses a single searchsorted for the first
+#     admission of the same patient that starts at or after this discharge
+# Patient and time are packed into one int64 key (patient << 32 | seconds),
+# so the searches stay O(n log n) overall with no per-patient scans.
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+import chuk_io
+
+READMISSION_WINDOWS = (7, 30, 90)  # days
+LOOKBACK_DAYS = 365
+DAY_SECONDS = 86400
+
+def _seconds(timestamps):
+    return timestamps.astype("datetime64[s]").astype(np.int64)
+
+def compute_features(patient, admission_date, discharge_date, windows=READMISSION_WINDOWS,
+                     observation_end=None):
+    """Per-admission readmission features, returned in the input row order.
+
+    patient is an integer code per admission; admission_date and
+    discharge_date are datetime64 arrays (NaT for admissions still open).
+    Times are compared at one-second resolution.
+    """
+    patient = np.asarray(patient, dtype=np.int64)
+    n = len(patient)
+    discharged = ~np.isnat(discharge_date)
+    admit = _seconds(admission_date)
+    discharge = np.where(discharged, _seconds(discharge_date), 0)
+    if observation_end is None:
+        observation_end = admit.max() if n else 0
+    else:
+        observation_end = int(_seconds(np.datetime64(observation_end)))
+
+    order = np.lexsort((admit, patient))
+    p, a, d, dis = patient[order], admit[order], discharge[order], discharged[order]
+    rows = np.arange(n)
+
+    # Position within each patient's run = number of earlier admissions
+    run_start = np.ones(n, dtype=bool)
+    run_start[1:] = p[1:] != p[:-1]
+    first_row = np.maximum.accumulate(np.where(run_start, rows, 0))
+    prior = rows - first_row
+
+    # Packed (patient, time) key; the base keeps every lookback query positive
+    base = (a.min() if n else 0) - LOOKBACK_DAYS * DAY_SECONDS - 1
+    key = (p << 32) | (a - base)
+
+    lookback_start = np.searchsorted(key, (p << 32) | (a - LOOKBACK_DAYS * DAY_SECONDS - base), side="left")
+    prior_recent = rows - lookback_start
+
+    previous_discharged = np.zeros(n, dtype=bool)
+    previous_discharged[1:] = dis[:-1] & ~run_start[1:]
+    previous_discharge = np.zeros(n, dtype=np.int64)
+    previous_discharge[1:] = d[:-1]
+    since_previous = np.where(previous_discharged, (a - previous_discharge) / DAY_SECONDS, np.nan)
+
+    # First admission of the same patient starting at or after this discharge
+    following = np.searchsorted(key, (p << 32) | np.maximum(d - base, 0), side="left")
+    has_following = dis & (following < n)
+    following = np.minimum(following, n - 1)
+    has_following &= p[following] == p
+    days_to_readmission = np.where(has_following, (a[following] - d) / DAY_SECONDS, np.nan)
+
+    length_of_stay = np.where(dis, (d - a) / DAY_SECONDS, np.nan)
+    followup = np.where(dis, (observation_end - d) / DAY_SECONDS, np.nan)
+
+    sorted_features = {
+        "patient": p.astype(np.int32),
+        "prior_admissions": prior.astype(np.int32),
+        f"prior_admissions_{LOOKBACK_DAYS}d": prior_recent.astype(np.int32),
+        "length_of_stay_days": length_of_stay.astype(np.float32),
+        "days_since_prev_discharge": since_previous.astype(np.float32),
+        "days_to_readmission": days_to_readmission.astype(np.float32),
+        "followup_days": followup.astype(np.float32),
+    }
+    for window in windows:
+        sorted_features[f"readmit_{window}d"] = has_following & (days_to_readmission <= window)
+
+    # Scatter back to the caller's row order
+    features = {}
+    for name, values in sorted_features.items():
+        unsorted = np.empty_like(values)
+        unsorted[order] = values
+        features[name] = unsorted
+    return features
+
+# --- Loaders ---
+def load_admissions(data_dir="."):
+    """Admission arrays from the chunked JSON/NDJSON output"""
+    admission_ids, patient_ids, admitted, discharged = [], [], [], []
+    for record in chuk_io.iter_entity("admissions", data_dir):
+        admission_ids.append(record["admission_id"])
+        patient_ids.append(record["patient_id"])
+        admitted.append(record["admission_date"])
+        discharged.append(record["discharge_date"])
+    dictionary, patient = np.unique(np.array(patient_ids, dtype=object), return_inverse=True)
+    return {
+        "admission_id": np.array(admission_ids),
+        "patient": patient.astype(np.int32),
+        "patient_ids": dictionary.tolist(),
+        "admission_date": np.array(admitted, dtype="datetime64[us]"),
+        "discharge_date": np.array(discharged, dtype="datetime64[us]"),
+    }
+
+def load_admissions_columnar(root):
+    """Admission arrays memory-mapped from a chuk_columnar export"""
+    from chuk_columnar_reader import open_table
+    table = open_table(root, "admissions")
+    return {
+        "admission_id": np.asarray(table.column("admission_id")).astype(str),
+        "patient": np.asarray(table.column("patient_id")),
+        "patient_ids": table.dictionary("patient_id"),
+        "admission_date": table.column("admission_date"),
+        "discharge_date": table.column("discharge_date"),
+    }
+
+def build_feature_table(admissions, windows=READMISSION_WINDOWS, observation_end=None):
+    features = compute_features(admissions["patient"], admissions["admission_date"],
+                                admissions["discharge_date"], windows, observation_end)
+    return {"admission_id": admissions["admission_id"],
+            "admission_date": np.asarray(admissions["admission_date"]), **features}
+
+def save_feature_table(table, path, patient_ids=None):
+    """Write the feature table as a compressed .npz (plus the patient dictionary, if given)"""
+    np.savez_compressed(path, **table)
+    if patient_ids is not None:
+        with open(os.path.splitext(path)[0] + ".patients.json", "w") as f:
+            json.dump(list(patient_ids), f)
+
+def readmission_rates(table, windows=READMISSION_WINDOWS):
+    """Share of discharged admissions with a full follow-up window that were readmitted"""
+    rates = {}
+    for window in windows:
+        eligible = table["followup_days"] >= window
+        flags = table[f"readmit_{window}d"][eligible]
+        rates[f"{window}d"] = {"eligible": int(eligible.sum()),
+                               "rate": float(flags.mean()) if len(flags) else 0.0}
+    return rates
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compute readmission labels and features for CHUK admissions")
+    parser.add_argument("--data-dir", default=".", help="directory holding chuk_admissions*.json/ndjson")
+    parser.add_argument("--columnar", default=None, help="read admissions from this columnar export instead")
+    parser.add_argument("--out", default="chuk_readmission_features.npz", help="output feature table")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.columnar:
+        admissions = load_admissions_columnar(args.columnar)
+    else:
+        admissions = load_admissions(args.data_dir)
+    loaded = time.perf_counter()
+    table = build_feature_table(admissions)
+    computed = time.perf_counter()
+    save_feature_table(table, args.out, admissions["patient_ids"])
+
+    print(f"Loaded {len(table['patient']):,} admissions in {loaded - started:.2f}s, "
+          f"computed features in {computed - loaded:.3f}s -> {args.out}")
+    for window, rate in readmission_rates(table).items():
+        print(f"- {window} readmission rate: {rate['rate']:.2%} of {rate['eligible']:,} eligible discharges")
@@ -0,0 +1,313 @@
+# chuk_replay.py
+# asyncio replay of the time-series entities as one timestamp-ordered event stream.
+#
+# A timeline is built first: for every record of the six time-series entities
+# it keeps the event timestamp, the chunk file and the byte span of the
+# record, all in NumPy arrays sorted by time. Records are never parsed again;
+# the replayer slices their bytes out of memory-mapped chunk files (or the
+# decompressed blocks of compressed ones) and wraps them in a small envelope:
+#
+#   {"entity":"admissions","event_time":"2025-03-01T10:15:00.000000","record":{...}}
+#
+# Events are paced by data time divided by the speed-up factor (or sent as
+# fast as possible). Every batch holds the events that are due, up to a size
+# limit, and the sender awaits drain() after each write, so a slow consumer
+# throttles the replay instead of growing buffers. Targets: stdout, a TCP or
+# Unix socket, or a named pipe.
+#
+#   python chuk_replay.py --speedup 3600 --target tcp://127.0.0.1:9000
+#   python chuk_replay.py --max-speed --target fifo:///tmp/chuk_events | consumer
+import argparse
+import asyncio
+import io
+import mmap
+import os
+import re
+import sys
+import time
+
+import numpy as np
+
+import chuk_batch
+import chuk_index
+import chuk_io
+
+TIMESTAMP_FIELDS = {
+    "appointments": "appointment_date",
+    "admissions": "admission_date",
+    "medical_records": "visit_date",
+    "laboratory_tests": "test_date",
+    "prescriptions": "prescription_date",
+    "billing_records": "billing_date",
+}
+BATCH_EVENTS = 1000
+BATCH_BYTES = 256 * 1024
+STATS_INTERVAL = 5.0  # seconds between stats lines on stderr
+CACHE_MB = 256  # decompressed blocks of compressed chunks kept across all chunk files
+
+# --- Timeline ---
+def _ndjson_spans(path, field):
+    """(offset, length, timestamp) per line, pulling the timestamp out without parsing the record"""
+    pattern = re.compile(rb'"' + field.encode("ascii") + rb'":"([^"]+)"')
+    offsets, lengths, stamps = [], [], []
+    offset = 0
+    with chuk_io.open_file(path, "rb") as f:
+        for line in f:
+            stripped = line.rstrip(b"\r\n")
+            if stripped:
+                offsets.append(offset)
+                lengths.append(len(stripped))
+                stamps.append(pattern.search(stripped).group(1).decode("ascii"))
+            offset += len(line)
+    return offsets, lengths, stamps
+
+def _json_spans(path, field):
+    offsets, lengths, stamps = [], [], []
+    for offset, length, record in chuk_index.iter_record_spans(path):
+        offsets.append(offset)
+        lengths.append(length)
+        stamps.append(record[field])
+    return offsets, lengths, stamps
+
+class Timeline:
+    """Byte spans of time-series records, sorted by event time"""
+
+    def __init__(self, data_dir=".", entities=None, start=None, end=None, cache_mb=CACHE_MB):
+        self.entities = list(entities or chuk_batch.TIMESERIES_ENTITIES)
+        self.files = []
+        # One LRU of decompressed blocks bounds the memory of every compressed chunk reader
+        self.block_cache = chuk_io.BlockCache(max(int(cache_mb * 2 ** 20) // chuk_io.COMPRESS_BLOCK_BYTES, 1))
+        parts = {"entity": [], "chunk": [], "offset": [], "length": [], "time": []}
+        for code, entity in enumerate(self.entities):
+            field = TIMESTAMP_FIELDS[entity]
+            for path in chuk_io.entity_files(entity, data_dir):
+                spans = _ndjson_spans if chuk_io.is_ndjson(path) else _json_spans
+                offsets, lengths, stamps = spans(path, field)
+                parts["entity"].append(np.full(len(offsets), code, dtype=np.int8))
+                parts["chunk"].append(np.full(len(offsets), len(self.files), dtype=np.int32))
+                parts["offset"].append(np.array(offsets, dtype=np.int64))
+                parts["length"].append(np.array(lengths, dtype=np.int32))
+                parts["time"].append(np.array(stamps, dtype="datetime64[us]"))
+                self.files.append(path)
+        arrays = {name: np.concatenate(values) if values else np.zeros(0, dtype)
+                  for (name, values), dtype in zip(parts.items(),
+                                                   [np.int8, np.int32, np.int64, np.int32, "datetime64[us]"])}
+        order = np.argsort(arrays["time"], kind="stable")
+        keep = np.ones(len(order), dtype=bool)
+        if start is not None:
+            keep &= arrays["time"][order] >= np.datetime64(start, "us")
+        if end is not None:
+            keep &= arrays["time"][order] < np.datetime64(end, "us")
+        order = order[keep]
+        for name, values in arrays.items():
+            setattr(self, name, values[order])
+        self._maps = {}
+
+    def __len__(self):
+        return len(self.time)
+
+    def record_bytes(self, row):
+        chunk = int(self.chunk[row])
+        data = self._maps.get(chunk)
+        if data is None:
+            path = self.files[chunk]
+            if chuk_io.compression_of(path):
+                # Reads jump around chunks that are not sorted by time, so there is no readahead
+                data = io.BufferedReader(chuk_io.BlockReader(path, readahead=0, cache=self.block_cache))
+            else:
+                with open(path, "rb") as f:
+                    data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            self._maps[chunk] = data
+        offset = int(self.offset[row])
+        if isinstance(data, mmap.mmap):
+            return data[offset:offset + int(self.length[row])]
+        data.seek(offset)
+        return data.read(int(self.length[row]))
+
+    def close(self):
+        for data in self._maps.values():
+            data.close()
+        self._maps = {}
+        self.block_cache.clear()
+
+    def envelopes(self, start, stop):
+        """Encoded events for rows [start, stop)"""
+        names = [f'{{"entity":"{entity}","event_time":"'.encode("ascii") for entity in self.entities]
+        stamps = np.datetime_as_string(self.time[start:stop], unit="us")
+        entity = self.entity[start:stop].tolist()
+        return [names[entity[k]] + stamps[k].encode("ascii") + b'","record":' + self.record_bytes(row) + b"}\n"
+                for k, row in enumerate(range(start, stop))]
+
+# --- Sinks ---
+class _FileSink:
+    """Blocking writes for regular files, where asyncio pipe transports are not available"""
+
+    def __init__(self, stream):
+        self.stream = stream
+
+    def write(self, data):
+        self.stream.write(data)
+
+    async def drain(self):
+        self.stream.flush()
+
+    def close(self):
+        self.stream.flush()
+
+    async def wait_closed(self):
+        pass
+
+async def _pipe_writer(stream):
+    loop = asyncio.get_running_loop()
+    try:
+        transport, protocol = await loop.connect_write_pipe(
+            lambda: asyncio.StreamReaderProtocol(asyncio.StreamReader()), stream)
+    except ValueError:
+        return _FileSink(stream)
+    return asyncio.StreamWriter(transport, protocol, None, loop)
+
+async def open_sink(target):
+    """stdout, tcp://host:port, unix:///path or fifo:///path as an asyncio writer"""
+    if target == "stdout":
+        return await _pipe_writer(sys.stdout.buffer)
+    scheme, _, location = target.partition("://")
+    if scheme == "tcp":
+        host, _, port = location.rpartition(":")
+        _, writer = await asyncio.open_connection(host or "127.0.0.1", int(port))
+        return writer
+    if scheme == "unix":
+        _, writer = await asyncio.open_unix_connection(location)
+        return writer
+    if scheme == "fifo":
+        if not os.path.exists(location):
+            os.mkfifo(location)
+        # Opening a FIFO for writing blocks until a reader connects
+        stream = await asyncio.to_thread(open, location, "wb", buffering=0)
+        return await _pipe_writer(stream)
+    raise ValueError(f"unknown target {target!r}; use stdout, tcp://host:port, unix:///path or fifo:///path")
+
+# --- Replay ---
+class ReplayStats:
+    """Throughput and lag (actual minus scheduled send time) of a replay"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.events = 0
+        self.bytes = 0
+        self.batches = 0
+        self.lags = []
+
+    def record(self, events, size, lag):
+        self.events += events
+        self.bytes += size
+        self.batches += 1
+        self.lags.append(lag)
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        lags = np.array(self.lags or [0.0]) * 1000
+        return {
+            "events": self.events,
+            "bytes": self.bytes,
+            "batches": self.batches,
+            "seconds": round(elapsed, 3),
+            "events_per_second": round(self.events / elapsed, 1) if elapsed > 0 else 0.0,
+            "mb_per_second": round(self.bytes / 1e6 / elapsed, 2) if elapsed > 0 else 0.0,
+            "lag_ms_p50": round(float(np.percentile(lags, 50)), 2),
+            "lag_ms_p99": round(float(np.percentile(lags, 99)), 2),
+            "lag_ms_max": round(float(lags.max()), 2),
+        }
+
+def _print_stats(stats, prefix="replay"):
+    summary = stats.summary()
+    print(f"{prefix}: {summary['events']:,} events, {summary['events_per_second']:,.0f} events/s, "
+          f"{summary['mb_per_second']:.1f} MB/s, lag p50 {summary['lag_ms_p50']:.1f} ms "
+          f"p99 {summary['lag_ms_p99']:.1f} ms max {summary['lag_ms_max']:.1f} ms", file=sys.stderr)
+
+async def replay(timeline, writer, speedup=None, batch_events=BATCH_EVENTS, batch_bytes=BATCH_BYTES,
+                 limit=None, stats_interval=STATS_INTERVAL):
+    """Send the timeline to writer; speedup=None sends as fast as the consumer accepts.
+
+    With a speed-up factor, an event with data time t is due at
+    start + (t - t0) / speedup. Each batch takes every event already due, up
+    to batch_events or about batch_bytes, so a replay that falls behind
+    catches up in larger writes.
+    """
+    total = len(timeline) if limit is None else min(limit, len(timeline))
+    stats = ReplayStats()
+    if not total:
+        return stats.summary()
+    # Data time in seconds since the first event
+    offsets = (timeline.time[:total] - timeline.time[0]).astype(np.int64) / 1e6
+    mean_length = max(float(timeline.length[:total].mean()), 1.0)
+    events_per_batch = max(1, min(batch_events, int(batch_bytes / mean_length)))
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    last_report = time.perf_counter()
+    row = 0
+    while row < total:
+        stop = min(row + events_per_batch, total)
+        if speedup:
+            due = started + offsets[row] / speedup
+            delay = due - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            # Only events that are already due join the batch
+            now_offset = (loop.time() - started) * speedup
+            stop = max(row + 1, min(stop, int(np.searchsorted(offsets, now_offset, side="right"))))
+            lag = loop.time() - due
+        else:
+            lag = 0.0
+        events = timeline.envelopes(row, stop)
+        data = b"".join(events)
+        writer.write(data)
+        await writer.drain()
+        stats.record(stop - row, len(data), lag)
+        row = stop
+        if time.perf_counter() - last_report >= stats_interval:
+            last_report = time.perf_counter()
+            _print_stats(stats)
+    return stats.summary()
+
+async def run(args):
+    started = time.perf_counter()
+    timeline = Timeline(args.data_dir, args.entities.split(",") if args.entities else None,
+                        args.start, args.end, args.cache_mb)
+    print(f"Timeline of {len(timeline):,} events built in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    writer = await open_sink(args.target)
+    try:
+        summary = await replay(timeline, writer, None if args.max_speed else args.speedup,
+                               args.batch_events, args.batch_bytes, args.limit)
+    finally:
+        writer.close()
+        try:
+            await writer.wait_closed()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        timeline.close()
+    print(f"replay done: {summary}", file=sys.stderr)
+    return summary
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay CHUK time-series entities as a timestamp-ordered stream")
+    parser.add_argument("--data-dir", default=".", help="directory holding the chuk_* chunk files")
+    parser.add_argument("--target", default="stdout",
+                        help="stdout, tcp://host:port, unix:///path or fifo:///path (default: stdout)")
+    parser.add_argument("--speedup", type=float, default=3600.0,
+                        help="data seconds replayed per wall-clock second (default: 3600, one hour per second)")
+    parser.add_argument("--max-speed", action="store_true", help="ignore event times and send as fast as possible")
+    parser.add_argument("--entities", default=None, help="comma-separated entities (default: all six)")
+    parser.add_argument("--start", default=None, help="only replay events at or after this ISO timestamp")
+    parser.add_argument("--end", default=None, help="only replay events before this ISO timestamp")
+    parser.add_argument("--limit", type=int, default=None, help="stop after N events")
+    parser.add_argument("--cache-mb", type=float, default=CACHE_MB,
+                        help=f"decompressed blocks of compressed chunks kept in memory (default: {CACHE_MB} MB); "
+                             "replay slows sharply once the decompressed data no longer fits")
+    parser.add_argument("--batch-events", type=int, default=BATCH_EVENTS, help="maximum events per write")
+    parser.add_argument("--batch-bytes", type=int, default=BATCH_BYTES, help="approximate maximum bytes per write")
+    args = parser.parse_args()
+    try:
+        asyncio.run(run(args))
+    except BrokenPipeError:
+        # The consumer went away (e.g. piped into head)
+        sys.stderr.close()
@@ -0,0 +1,416 @@
+# chuk_rollups.py
+# Precomputed operational rollups over a generated dataset, refreshed incrementally.
+#
+# Each rollup is a dense cube of measures over a day axis and one or two
+# dictionary-encoded categories:
+#   - daily_admissions:     admissions and their cost per department
+#   - revenue_by_insurance: bills and billed/insured/patient amounts per
+#                           patient insurance type (joined through patient_id)
+#   - lab_volume:           laboratory tests and their cost per test name
+#   - appointment_status:   appointments per department and status, from
+#                           which no_show_rates() derives no-show rates
+# Cubes are kept at day grain; rollup() sums them into month or year buckets.
+#
+# Every chunk file is reduced to one segment: the (day, category codes) bucket
+# keys it touches, packed into one int64, and the summed measures per key,
+# computed with np.unique and np.bincount a batch at a time. Segments are
+# stored under chuk_rollups/segments/<entity>/ and the cubes are the sums of
+# all segments. refresh() compares chunk sizes and mtimes with the catalog
+# (like chuk_index), subtracts the segments of chunks that changed or
+# disappeared and adds those of new or changed chunks, so appending a window
+# only touches the day buckets of the new chunks and of the admissions that
+# --append discharged. Category dictionaries only ever grow, so codes stay
+# valid across refreshes. Cubes are saved as compressed .npz files.
+#
+#   python chuk_rollups.py --data-dir out
+#   python chuk_rollups.py --data-dir out --show revenue_by_insurance --grain month
+#   python chuk_rollups.py --data-dir out --show no_show_rate --grain month
+import argparse
+import json
+import os
+import shutil
+import time
+
+import numpy as np
+
+import chuk_ids
+import chuk_io
+
+ROLLUP_DIR = "chuk_rollups"
+CATALOG_FILE = "catalog.json"
+BATCH_RECORDS = 10000
+CODE_BITS = 16  # bits per category code in a packed bucket key
+UNKNOWN = "Unknown"
+GRAINS = {"day": "datetime64[D]", "month": "datetime64[M]", "year": "datetime64[Y]"}
+
+# dims are (dimension, record field); measures are (name, summed field), None counts records
+ROLLUPS = {
+    "daily_admissions": {
+        "entity": "admissions", "time": "admission_date",
+        "dims": [("department", "department_id")],
+        "measures": [("admissions", None), ("total_cost", "total_cost")],
+    },
+    "revenue_by_insurance": {
+        "entity": "billing_records", "time": "billing_date",
+        "dims": [("insurance_type", "patient_id")],
+        "measures": [("bills", None), ("total_amount", "total_amount"),
+                     ("insurance_amount", "insurance_amount"), ("patient_amount", "patient_amount")],
+    },
+    "lab_volume": {
+        "entity": "laboratory_tests", "time": "test_date",
+        "dims": [("test_name", "test_name")],
+        "measures": [("tests", None), ("cost", "cost")],
+    },
+    "appointment_status": {
+        "entity": "appointments", "time": "appointment_date",
+        "dims": [("department", "department_id"), ("status", "status")],
+        "measures": [("appointments", None)],
+    },
+}
+# Dimensions read from the patient record rather than the rolled-up record
+PATIENT_DIMENSIONS = {"insurance_type"}
+NO_SHOW, DUE_STATUSES = "No-Show", ["Completed", "No-Show"]
+
+def rollup_entities():
+    return list(dict.fromkeys(spec["entity"] for spec in ROLLUPS.values()))
+
+def _fingerprint(path):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+def _batches(records, size=BATCH_RECORDS):
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+# --- Dictionaries ---
+class Dictionary:
+    """Append-only label <-> code mapping for one category dimension"""
+
+    def __init__(self, labels=()):
+        self.labels = list(labels)
+        self.codes = {label: code for code, label in enumerate(self.labels)}
+
+    def code(self, label):
+        if label not in self.codes:
+            if len(self.labels) >= 1 << CODE_BITS:
+                raise ValueError(f"more than {1 << CODE_BITS} categories")
+            self.codes[label] = len(self.labels)
+            self.labels.append(label)
+        return self.codes[label]
+
+    def encode(self, values):
+        """int64 codes for an array of labels, with one dictionary lookup per distinct label"""
+        uniques, inverse = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+        codes = np.array([self.code(str(label)) for label in uniques], dtype=np.int64)
+        return codes[inverse.ravel()]
+
+class PatientLookup:
+    """patient_id -> insurance type code, as sorted integer ID codes and a parallel code array"""
+
+    def __init__(self, data_dir, dictionary):
+        self.prefix, self.width = chuk_ids.ID_FORMATS["patients"]
+        ids, types = [], []
+        for patient in chuk_io.iter_entity("patients", data_dir):
+            ids.append(patient["patient_id"])
+            types.append((patient.get("insurance_info") or {}).get("type") or UNKNOWN)
+        keys = chuk_ids.parse_ids(self.prefix, self.width, ids) if ids else np.zeros(0, np.uint64)
+        order = np.argsort(keys, kind="stable")
+        self.keys = keys[order]
+        self.types = dictionary.encode(types)[order]
+        self.unknown = dictionary.code(UNKNOWN)
+
+    def insurance_types(self, patient_ids):
+        width = len(self.prefix) + self.width
+        valid = np.array([bool(value) and len(value) == width for value in patient_ids], dtype=bool)
+        if not len(self.keys) or not valid.any():
+            return np.full(len(patient_ids), self.unknown, dtype=np.int64)
+        codes = chuk_ids.parse_ids(self.prefix, self.width,
+                                   [value if ok else self.prefix + "0" * self.width
+                                    for value, ok in zip(patient_ids, valid)])
+        position = np.minimum(np.searchsorted(self.keys, codes), len(self.keys) - 1)
+        found = valid & (self.keys[position] == codes)
+        return np.where(found, self.types[position], self.unknown)
+
+# --- Segments ---
+def _reduce(spec, records, dictionaries, lookup):
+    """Packed bucket keys and summed measures of one batch of records"""
+    days = np.array([(record.get(spec["time"]) or "NaT")[:10] for record in records], dtype="datetime64[D]")
+    dated = ~np.isnat(days)
+    records = [record for record, ok in zip(records, dated) if ok]
+    keys = days[dated].astype(np.int64)
+    for dimension, field in spec["dims"]:
+        values = [record.get(field) for record in records]
+        if dimension in PATIENT_DIMENSIONS:
+            codes = lookup.insurance_types(values)
+        else:
+            codes = dictionaries[dimension].encode([UNKNOWN if value is None else value for value in values])
+        keys = (keys << CODE_BITS) | codes
+    uniques, inverse = np.unique(keys, return_inverse=True)
+    columns = []
+    for _, field in spec["measures"]:
+        weights = None if field is None else \
+            np.array([record.get(field) or 0.0 for record in records], dtype=np.float64)
+        columns.append(np.bincount(inverse, weights=weights, minlength=len(uniques)).astype(np.float64))
+    return uniques, np.stack(columns, axis=1) if columns else np.zeros((len(uniques), 0))
+
+def _combine(keys, values):
+    """Merge per-batch partials into one row per bucket key"""
+    keys = np.concatenate(keys)
+    values = np.concatenate(values)
+    uniques, inverse = np.unique(keys, return_inverse=True)
+    merged = np.zeros((len(uniques), values.shape[1]))
+    np.add.at(merged, inverse, values)
+    return uniques, merged
+
+def build_segment(entity, path, dictionaries, lookup=None):
+    """{rollup: (keys, values)} partial aggregates of one chunk file, plus its record count"""
+    specs = {name: spec for name, spec in ROLLUPS.items() if spec["entity"] == entity}
+    partials = {name: ([], []) for name in specs}
+    records = 0
+    for batch in _batches(chuk_io.iter_file(path)):
+        records += len(batch)
+        for name, spec in specs.items():
+            keys, values = _reduce(spec, batch, dictionaries, lookup)
+            partials[name][0].append(keys)
+            partials[name][1].append(values)
+    segment = {}
+    for name, (keys, values) in partials.items():
+        if not keys:
+            keys = [np.zeros(0, np.int64)]
+            values = [np.zeros((0, len(specs[name]["measures"])))]
+        segment[name] = _combine(keys, values)
+    return segment, records
+
+# --- Cubes ---
+class Cube:
+    """Dense measures[measure, day, category...] array of one rollup"""
+
+    def __init__(self, name, first_day=0, values=None):
+        self.name = name
+        self.spec = ROLLUPS[name]
+        self.measures = [measure for measure, _ in self.spec["measures"]]
+        self.dimensions = [dimension for dimension, _ in self.spec["dims"]]
+        self.first_day = first_day
+        if values is None:
+            values = np.zeros((len(self.measures), 0) + (0,) * len(self.dimensions))
+        self.values = values
+        self.labels = {}
+
+    @property
+    def days(self):
+        return np.arange(self.first_day, self.first_day + self.values.shape[1]).astype("datetime64[D]")
+
+    def unpack(self, keys):
+        """(days, [codes per dimension]) of packed bucket keys"""
+        codes = []
+        mask = (1 << CODE_BITS) - 1
+        for _ in self.dimensions:
+            codes.insert(0, keys & mask)
+            keys = keys >> CODE_BITS
+        return keys, codes
+
+    def _grow(self, first_day, last_day, sizes):
+        """Widen the day axis to [first_day, last_day] and the category axes to sizes"""
+        old_first, old_days = self.first_day, self.values.shape[1]
+        if old_days:
+            first_day, last_day = min(first_day, old_first), max(last_day, old_first + old_days - 1)
+        shape = (len(self.measures), last_day - first_day + 1) + tuple(
+            max(size, current) for size, current in zip(sizes, self.values.shape[2:]))
+        if shape == self.values.shape:
+            return
+        values = np.zeros(shape)
+        if old_days:
+            offset = old_first - first_day
+            region = (slice(None), slice(offset, offset + old_days)) + \
+                tuple(slice(0, size) for size in self.values.shape[2:])
+            values[region] = self.values
+        self.first_day, self.values = first_day, values
+
+    def apply(self, keys, values, sign=1):
+        """Add (or with sign=-1 subtract) a segment; returns the day buckets it touched"""
+        if not len(keys):
+            return np.zeros(0, np.int64)
+        days, codes = self.unpack(keys)
+        self._grow(int(days.min()), int(days.max()), [int(code.max()) + 1 for code in codes])
+        # Keys are unique within a segment, so plain fancy-index addition is safe
+        self.values[(slice(None), days - self.first_day) + tuple(codes)] += sign * values.T
+        return np.unique(days)
+
+    def rollup(self, grain="day"):
+        """(bucket labels, {measure: array[bucket, category...]}) summed to a time grain"""
+        days = self.days
+        buckets = days.astype(GRAINS[grain])
+        if not len(buckets):
+            return buckets, {measure: self.values[i] for i, measure in enumerate(self.measures)}
+        starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+        summed = np.add.reduceat(self.values, starts, axis=1)
+        return buckets[starts], {measure: summed[i] for i, measure in enumerate(self.measures)}
+
+    def save(self, path, dictionaries):
+        sizes = [len(dictionaries[dimension].labels) for dimension in self.dimensions]
+        if self.values.shape[1]:
+            self._grow(self.first_day, self.first_day + self.values.shape[1] - 1, sizes)
+        labels = {f"labels_{dimension}": np.array(dictionaries[dimension].labels[:size], dtype=str)
+                  for dimension, size in zip(self.dimensions, self.values.shape[2:])}
+        np.savez_compressed(path, first_day=np.int64(self.first_day), values=self.values,
+                            measures=np.array(self.measures), **labels)
+
+    @classmethod
+    def load(cls, name, path):
+        with np.load(path) as data:
+            cube = cls(name, int(data["first_day"]), data["values"])
+            cube.labels = {dimension: list(data[f"labels_{dimension}"]) for dimension in cube.dimensions}
+        return cube
+
+def no_show_rates(cube, grain="month"):
+    """(buckets, departments, rates[bucket, department], overall[bucket]) from appointment_status.
+
+    The rate is no-shows over appointments that were due, i.e. completed or no-show.
+    """
+    buckets, measures = cube.rollup(grain)
+    counts = measures["appointments"]
+    statuses = cube.labels.get("status", [])
+    due = [statuses.index(status) for status in DUE_STATUSES if status in statuses]
+    missed = counts[..., statuses.index(NO_SHOW)] if NO_SHOW in statuses else np.zeros(counts.shape[:2])
+    total = counts[..., due].sum(axis=-1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        rates = np.where(total > 0, missed / total, np.nan)
+        overall = np.where(total.sum(axis=1) > 0, missed.sum(axis=1) / total.sum(axis=1), np.nan)
+    return buckets, cube.labels.get("department", []), rates, overall
+
+# --- Engine ---
+class RollupEngine:
+    """Builds, incrementally refreshes and loads the rollup cubes of a generated dataset"""
+
+    def __init__(self, data_dir=".", rollup_dir=None):
+        self.data_dir = data_dir
+        self.rollup_dir = rollup_dir or os.path.join(data_dir, ROLLUP_DIR)
+
+    def _path(self, *parts):
+        return os.path.join(self.rollup_dir, *parts)
+
+    def load_catalog(self):
+        path = self._path(CATALOG_FILE)
+        if not os.path.exists(path):
+            return {"dictionaries": {}, "chunks": {}, "patients": {}}
+        with open(path) as f:
+            return json.load(f)
+
+    def cube(self, name):
+        path = self._path(f"{name}.npz")
+        return Cube.load(name, path) if os.path.exists(path) else Cube(name)
+
+    def _fingerprints(self, entity):
+        return {os.path.basename(path): _fingerprint(path)
+                for path in chuk_io.entity_files(entity, self.data_dir)}
+
+    def refresh(self, rebuild=False):
+        """Fold new and changed chunks into the cubes and take out chunks that changed or disappeared.
+
+        Returns {entity: {"chunks", "records", "buckets"}}: chunk files (re)aggregated,
+        their records, and the distinct day buckets updated.
+        """
+        if rebuild and os.path.exists(self.rollup_dir):
+            shutil.rmtree(self.rollup_dir)
+        catalog = self.load_catalog()
+        dictionaries = {dimension: Dictionary(catalog["dictionaries"].get(dimension, ()))
+                        for spec in ROLLUPS.values() for dimension, _ in spec["dims"]}
+        cubes = {name: self.cube(name) for name in ROLLUPS}
+        patients = self._fingerprints("patients")
+        patients_changed = patients != catalog["patients"]
+        lookup = None
+        stats, touched = {}, set()
+
+        for entity in rollup_entities():
+            specs = [name for name, spec in ROLLUPS.items() if spec["entity"] == entity]
+            joined = any(dimension in PATIENT_DIMENSIONS
+                         for name in specs for dimension, _ in ROLLUPS[name]["dims"])
+            known = catalog["chunks"].get(entity, {})
+            current = self._fingerprints(entity)
+            stale = {name for name, entry in known.items()
+                     if (joined and patients_changed) or
+                     {"size": entry["size"], "mtime_ns": entry["mtime_ns"]} != current.get(name)}
+            segment_dir = self._path("segments", entity)
+            days = []
+            for name in sorted(stale):
+                with np.load(os.path.join(segment_dir, f"{name}.npz")) as segment:
+                    for rollup in specs:
+                        days.append(cubes[rollup].apply(segment[f"{rollup}_keys"],
+                                                        segment[f"{rollup}_values"], sign=-1))
+                os.remove(os.path.join(segment_dir, f"{name}.npz"))
+                del known[name]
+            records, built = 0, 0
+            for name, fingerprint in current.items():
+                if name in known:
+                    continue
+                if joined and lookup is None:
+                    lookup = PatientLookup(self.data_dir, dictionaries["insurance_type"])
+                segment, count = build_segment(entity, os.path.join(self.data_dir, name), dictionaries, lookup)
+                for rollup, (keys, values) in segment.items():
+                    days.append(cubes[rollup].apply(keys, values))
+                os.makedirs(segment_dir, exist_ok=True)
+                np.savez(os.path.join(segment_dir, f"{name}.npz"),
+                         **{f"{rollup}_{part}": array for rollup, (keys, values) in segment.items()
+                            for part, array in (("keys", keys), ("values", values))})
+                known[name] = {**fingerprint, "records": count}
+                records += count
+                built += 1
+            catalog["chunks"][entity] = known
+            if built or stale:
+                touched.update(specs)
+            stats[entity] = {"chunks": built, "records": records,
+                             "buckets": len(np.unique(np.concatenate(days))) if days else 0}
+
+        os.makedirs(self.rollup_dir, exist_ok=True)
+        for name in touched | {name for name in ROLLUPS if not os.path.exists(self._path(f"{name}.npz"))}:
+            cubes[name].save(self._path(f"{name}.npz"), dictionaries)
+        catalog["dictionaries"] = {dimension: dictionary.labels for dimension, dictionary in dictionaries.items()}
+        catalog["patients"] = patients
+        with open(self._path(CATALOG_FILE), "w") as f:
+            json.dump(catalog, f, indent=2)
+        return stats
+
+# --- Reports ---
+def print_rollup(cube, grain):
+    buckets, measures = cube.rollup(grain)
+    dimensions = cube.dimensions
+    print("\t".join([grain] + dimensions + cube.measures))
+    first = measures[cube.measures[0]]
+    for position in zip(*np.nonzero(first)):
+        bucket, codes = position[0], position[1:]
+        labels = [cube.labels[dimension][code] for dimension, code in zip(dimensions, codes)]
+        values = [f"{measures[measure][position]:,.0f}" for measure in cube.measures]
+        print("\t".join([str(buckets[bucket])] + labels + values))
+
+def print_no_show_rates(cube, grain):
+    buckets, departments, rates, overall = no_show_rates(cube, grain)
+    print("\t".join([grain, "all"] + departments))
+    for bucket, row, total in zip(buckets, rates, overall):
+        print("\t".join([str(bucket), f"{total:.3f}"] + [f"{rate:.3f}" for rate in row]))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build, refresh or query the CHUK rollup cubes")
+    parser.add_argument("--data-dir", default=".", help="directory holding the chuk_* files")
+    parser.add_argument("--rollup-dir", default=None, help=f"cube location (default: <data-dir>/{ROLLUP_DIR})")
+    parser.add_argument("--rebuild", action="store_true", help="drop the cubes and aggregate every chunk again")
+    parser.add_argument("--show", choices=list(ROLLUPS) + ["no_show_rate"], default=None,
+                        help="print a rollup after refreshing")
+    parser.add_argument("--grain", choices=list(GRAINS), default="month", help="time bucket for --show")
+    args = parser.parse_args()
+
+    engine = RollupEngine(args.data_dir, args.rollup_dir)
+    started = time.perf_counter()
+    stats = engine.refresh(rebuild=args.rebuild)
+    print(f"Refreshed rollups in {time.perf_counter() - started:.2f}s: " + ", ".join(
+        f"{entity} {entry['chunks']} chunk(s)/{entry['records']:,} records/{entry['buckets']} day buckets"
+        for entity, entry in stats.items()))
+    if args.show == "no_show_rate":
+        print_no_show_rates(engine.cube("appointment_status"), args.grain)
+    elif args.show:
+        print_rollup(engine.cube(args.show), args.grain)
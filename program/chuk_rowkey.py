@@ -0,0 +1,314 @@
+# chuk_rowkey.py
+# Row-key sorted, HBase-style export of the time-series entities.
+#
+# Every record gets a composite row key
+#
+#   <patient_id>#<timestamp>#<primary key>
+#
+# where the timestamp is the event time in epoch microseconds, zero-padded to
+# 19 digits, or HBase's reversed-timestamp idiom (Long.MAX_VALUE - t) so that
+# a patient's newest events come first. The export writes each entity as
+# part files of NDJSON lines sorted by row key:
+#
+#   {"row_key":"CHUK_PAT_8E5FFE17#0001739630658938557#CHUK_APT_007006C5AC","record":{...}}
+#
+# Sorting is an external merge sort with bounded memory: records are read
+# chunk by chunk without parsing (the key fields are pulled out with regular
+# expressions), buffered up to --memory-mb, sorted and spilled as run files,
+# then the runs are k-way merged with heapq.merge. Because every line starts
+# with the same '{"row_key":"' prefix and keys are unique, comparing whole
+# lines orders them by key. While the merged output is written, a sparse block
+# index records the first row key of every block of about BLOCK_BYTES; a
+# range scan over one patient's history binary-searches it and reads a single
+# contiguous byte range per part file.
+#
+#   python chuk_rowkey.py --data-dir out --order reverse --memory-mb 64
+#   python chuk_rowkey.py --data-dir out --scan CHUK_PAT_8E5FFE17 --entity appointments
+import argparse
+import heapq
+import itertools
+import json
+import os
+import re
+import shutil
+import time
+
+import numpy as np
+
+import chuk_batch
+import chuk_index
+import chuk_io
+from chuk_replay import TIMESTAMP_FIELDS
+
+ROWKEY_DIR = "chuk_rowkey"
+MANIFEST_FILE = "manifest.json"
+ORDERS = ["forward", "reverse"]
+MEMORY_MB = 256
+RECORD_OVERHEAD = 120  # bytes of Python object overhead per buffered record
+BLOCK_BYTES = 64 * 1024
+PART_BYTES = 256 * 1024 * 1024
+MAX_FAN_IN = 64  # run files merged at once
+RUN_BUFFER = 64 * 1024  # read buffer per run file during a merge
+KEY_BATCH = 4096  # records whose keys are extracted together
+TIMESTAMP_WIDTH = 19
+MAX_TIMESTAMP = 2 ** 63 - 1  # Java's Long.MAX_VALUE, as in HBase reversed timestamps
+LINE_PREFIX = b'{"row_key":"'
+
+# Timestamp of the row key per entity; patients sort by registration so that
+# they can be merge-joined with the time-series entities by patient_id
+KEY_TIMESTAMPS = {**TIMESTAMP_FIELDS, "patients": "registration_date"}
+
+# --- Row Keys ---
+def _field_pattern(field):
+    return re.compile(rb'"' + field.encode("ascii") + rb'":"([^"]*)"')
+
+def encode_timestamps(stamps, order="forward"):
+    """19-digit timestamp components of row keys for ISO timestamp strings"""
+    micros = np.array(stamps, dtype="datetime64[us]").astype(np.int64)
+    if order == "reverse":
+        micros = MAX_TIMESTAMP - micros
+    return np.char.zfill(micros.astype(f"U{TIMESTAMP_WIDTH}"), TIMESTAMP_WIDTH)
+
+def key_range(patient_id, start=None, end=None, order="forward"):
+    """[low, high) row keys covering a patient's events in [start, end)"""
+    prefix = f"{patient_id}#"
+    bounds = [prefix, prefix + "~"]  # "~" sorts after every digit
+    micros = [int(np.datetime64(value, "us").astype(np.int64)) for value in (start, end) if value is not None]
+    if order == "forward":
+        if start is not None:
+            bounds[0] = prefix + str(micros[0]).zfill(TIMESTAMP_WIDTH)
+        if end is not None:
+            bounds[1] = prefix + str(micros[-1]).zfill(TIMESTAMP_WIDTH)
+    else:
+        # Reversed timestamps turn [start, end) into (MAX - end, MAX - start]
+        if end is not None:
+            bounds[0] = prefix + str(MAX_TIMESTAMP - micros[-1] + 1).zfill(TIMESTAMP_WIDTH)
+        if start is not None:
+            bounds[1] = prefix + str(MAX_TIMESTAMP - micros[0] + 1).zfill(TIMESTAMP_WIDTH)
+    return bounds[0].encode("ascii"), bounds[1].encode("ascii")
+
+def _iter_record_batches(path, batch_records=KEY_BATCH):
+    """Compact one-line JSON of a chunk file's records, in lists of batch_records"""
+    if chuk_io.is_ndjson(path):
+        with chuk_io.open_file(path, "rb") as f:
+            records = (line.rstrip(b"\r\n") for line in f if line.strip())
+            while batch := list(itertools.islice(records, batch_records)):
+                yield batch
+        return
+    # JSON arrays are pretty-printed; re-encode each record on one line
+    records = (json.dumps(record, separators=(",", ":")).encode("ascii") for record in chuk_io.iter_file(path))
+    while batch := list(itertools.islice(records, batch_records)):
+        yield batch
+
+def iter_keyed_lines(entity, path, order="forward"):
+    """Output lines of one chunk file, row key first, built a batch of records at a time"""
+    patterns = [_field_pattern(field) for field in
+                ("patient_id", chuk_index.PRIMARY_KEYS[entity], KEY_TIMESTAMPS[entity])]
+    for records in _iter_record_batches(path):
+        fields = [[pattern.search(record).group(1) for record in records] for pattern in patterns]
+        stamps = encode_timestamps([stamp.decode("ascii") for stamp in fields[2]], order)
+        for patient, stamp, key, record in zip(fields[0], stamps.tolist(), fields[1], records):
+            yield LINE_PREFIX + patient + b"#" + stamp.encode("ascii") + b"#" + key + b'","record":' + record + b"}\n"
+
+def line_key(line):
+    return line[len(LINE_PREFIX):line.index(b'"', len(LINE_PREFIX))]
+
+# --- External Merge Sort ---
+def _write_run(lines, run_dir, number):
+    lines.sort()
+    path = os.path.join(run_dir, f"run_{number:05d}.ndjson")
+    with open(path, "wb") as f:
+        f.writelines(lines)
+    return path
+
+def sort_runs(entity, data_dir, run_dir, order="forward", memory_bytes=MEMORY_MB * 1024 * 1024):
+    """Spill sorted runs of at most memory_bytes of buffered lines; returns (run paths, records)"""
+    runs, buffer, buffered, records = [], [], 0, 0
+    for path in chuk_io.entity_files(entity, data_dir):
+        for line in iter_keyed_lines(entity, path, order):
+            buffer.append(line)
+            buffered += len(line) + RECORD_OVERHEAD
+            records += 1
+            if buffered >= memory_bytes:
+                runs.append(_write_run(buffer, run_dir, len(runs)))
+                buffer, buffered = [], 0
+    if buffer or not runs:
+        runs.append(_write_run(buffer, run_dir, len(runs)))
+    return runs, records
+
+def _open_runs(paths):
+    # Small read buffers keep a wide merge within the memory budget
+    return [open(path, "rb", buffering=RUN_BUFFER) for path in paths]
+
+def merge_runs(runs, run_dir, fan_in=MAX_FAN_IN):
+    """Merge runs in passes of fan_in files until at most fan_in remain"""
+    generation = 0
+    while len(runs) > fan_in:
+        merged = []
+        for group in range(0, len(runs), fan_in):
+            handles = _open_runs(runs[group:group + fan_in])
+            path = os.path.join(run_dir, f"merge_{generation}_{len(merged):05d}.ndjson")
+            with open(path, "wb", buffering=1024 * 1024) as out:
+                out.writelines(heapq.merge(*handles))
+            for handle in handles:
+                handle.close()
+                os.remove(handle.name)
+            merged.append(path)
+        runs = merged
+        generation += 1
+    return runs
+
+def write_parts(lines, entity_dir, block_bytes=BLOCK_BYTES, part_bytes=PART_BYTES):
+    """Write sorted lines as part files and return the sparse block index"""
+    parts, block_keys, block_parts, block_offsets, block_lengths = [], [], [], [], []
+    out, offset, block_start = None, 0, None
+    for line in lines:
+        if out is None or offset >= part_bytes:
+            if out is not None:
+                block_lengths.append(offset - block_start)
+                out.close()
+            parts.append(f"part_{len(parts):05d}.ndjson")
+            out = open(os.path.join(entity_dir, parts[-1]), "wb", buffering=1024 * 1024)
+            offset, block_start = 0, None
+        if block_start is None or offset - block_start >= block_bytes:
+            if block_start is not None:
+                block_lengths.append(offset - block_start)
+            block_keys.append(line_key(line))
+            block_parts.append(len(parts) - 1)
+            block_offsets.append(offset)
+            block_start = offset
+        out.write(line)
+        offset += len(line)
+    if out is not None:
+        block_lengths.append(offset - block_start)
+        out.close()
+    return parts, {
+        "keys": np.array(block_keys, dtype=bytes),
+        "parts": np.array(block_parts, dtype=np.int32),
+        "offsets": np.array(block_offsets, dtype=np.int64),
+        "lengths": np.array(block_lengths, dtype=np.int64),
+    }
+
+def export_entity(entity, data_dir=".", out_dir=None, order="forward", memory_mb=MEMORY_MB,
+                  block_bytes=BLOCK_BYTES, part_bytes=PART_BYTES):
+    """Sort one entity by row key into out_dir/<entity>/; returns its manifest entry"""
+    out_dir = out_dir or os.path.join(data_dir, ROWKEY_DIR)
+    entity_dir = os.path.join(out_dir, entity)
+    if os.path.isdir(entity_dir):
+        shutil.rmtree(entity_dir)
+    run_dir = os.path.join(entity_dir, "runs")
+    os.makedirs(run_dir)
+    started = time.perf_counter()
+    runs, records = sort_runs(entity, data_dir, run_dir, order, memory_mb * 1024 * 1024)
+    sorted_seconds = time.perf_counter() - started
+    run_count = len(runs)
+    runs = merge_runs(runs, run_dir)
+    handles = _open_runs(runs)
+    try:
+        parts, index = write_parts(heapq.merge(*handles), entity_dir, block_bytes, part_bytes)
+    finally:
+        for handle in handles:
+            handle.close()
+    shutil.rmtree(run_dir)
+    np.savez(os.path.join(entity_dir, "block_index.npz"), **index)
+    return {
+        "records": records,
+        "parts": parts,
+        "blocks": len(index["keys"]),
+        "runs": run_count,
+        "sort_seconds": round(sorted_seconds, 3),
+        "seconds": round(time.perf_counter() - started, 3),
+    }
+
+def export_dataset(data_dir=".", out_dir=None, entities=None, order="forward", memory_mb=MEMORY_MB,
+                   block_bytes=BLOCK_BYTES, part_bytes=PART_BYTES):
+    """Row-key sorted export of the time-series entities; writes and returns the manifest"""
+    out_dir = out_dir or os.path.join(data_dir, ROWKEY_DIR)
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {"order": order, "row_key": "patient_id#timestamp#primary_key",
+                "timestamp_width": TIMESTAMP_WIDTH, "block_bytes": block_bytes,
+                "memory_mb": memory_mb, "entities": {}}
+    for entity in entities or chuk_batch.TIMESERIES_ENTITIES:
+        entry = manifest["entities"][entity] = export_entity(
+            entity, data_dir, out_dir, order, memory_mb, block_bytes, part_bytes)
+        print(f"- {entity}: {entry['records']:,} records, {entry['runs']} runs, {entry['blocks']:,} blocks "
+              f"in {entry['seconds']:.2f}s ({entry['records'] / max(entry['seconds'], 1e-9):,.0f} records/s)")
+    with open(os.path.join(out_dir, MANIFEST_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+# --- Range Scans ---
+class RowKeyStore:
+    """Range scans over a row-key sorted export"""
+
+    def __init__(self, rowkey_dir):
+        self.rowkey_dir = rowkey_dir
+        with open(os.path.join(rowkey_dir, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        self.order = self.manifest["order"]
+        self._indexes = {}
+        self.bytes_read = 0
+
+    def _index(self, entity):
+        if entity not in self._indexes:
+            with np.load(os.path.join(self.rowkey_dir, entity, "block_index.npz")) as index:
+                self._indexes[entity] = dict(index)
+        return self._indexes[entity]
+
+    def scan_range(self, entity, low, high):
+        """(row key, record) for keys in [low, high), reading only the blocks that may hold them"""
+        index = self._index(entity)
+        first = max(int(np.searchsorted(index["keys"], low, side="right")) - 1, 0)
+        last = int(np.searchsorted(index["keys"], high, side="left"))
+        parts = self.manifest["entities"][entity]["parts"]
+        for part in np.unique(index["parts"][first:last]).tolist():
+            blocks = np.arange(first, last)[index["parts"][first:last] == part]
+            offset = int(index["offsets"][blocks[0]])
+            length = int(index["offsets"][blocks[-1]] + index["lengths"][blocks[-1]]) - offset
+            with open(os.path.join(self.rowkey_dir, entity, parts[part]), "rb") as f:
+                f.seek(offset)
+                data = f.read(length)
+            self.bytes_read += length
+            for line in data.splitlines():
+                key = line_key(line)
+                if key >= high:
+                    return
+                if key >= low:
+                    yield key.decode("ascii"), json.loads(line)["record"]
+
+    def scan(self, entity, patient_id, start=None, end=None):
+        """A patient's records of one entity with event time in [start, end), in row-key order"""
+        low, high = key_range(patient_id, start, end, self.order)
+        return self.scan_range(entity, low, high)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Row-key sorted, HBase-style export of CHUK time-series entities")
+    parser.add_argument("--data-dir", default=".", help="directory holding the chuk_* chunk files")
+    parser.add_argument("--out-dir", default=None, help=f"export directory (default: <data-dir>/{ROWKEY_DIR})")
+    parser.add_argument("--entities", default=None, help="comma-separated entities (default: all six)")
+    parser.add_argument("--order", choices=ORDERS, default="forward",
+                        help="timestamp order within a patient; reverse puts the newest events first")
+    parser.add_argument("--memory-mb", type=int, default=MEMORY_MB, help="sort buffer per run (default: 256)")
+    parser.add_argument("--block-bytes", type=int, default=BLOCK_BYTES, help="bytes per sparse index block")
+    parser.add_argument("--scan", default=None, metavar="PATIENT_ID",
+                        help="instead of exporting, print a patient's records from an existing export")
+    parser.add_argument("--entity", default="appointments", help="entity for --scan")
+    parser.add_argument("--start", default=None, help="--scan events at or after this ISO timestamp")
+    parser.add_argument("--end", default=None, help="--scan events before this ISO timestamp")
+    args = parser.parse_args()
+    out_dir = args.out_dir or os.path.join(args.data_dir, ROWKEY_DIR)
+
+    if args.scan:
+        store = RowKeyStore(out_dir)
+        started = time.perf_counter()
+        rows = list(store.scan(args.entity, args.scan, args.start, args.end))
+        elapsed = time.perf_counter() - started
+        for key, record in rows:
+            print(key, json.dumps(record))
+        print(f"{len(rows)} rows, {store.bytes_read:,} bytes read in {elapsed * 1000:.1f} ms")
+    else:
+        started = time.perf_counter()
+        manifest = export_dataset(args.data_dir, out_dir, args.entities.split(",") if args.entities else None,
+                                  args.order, args.memory_mb, args.block_bytes)
+        records = sum(entry["records"] for entry in manifest["entities"].values())
+        print(f"Sorted {records:,} records into {out_dir} in {time.perf_counter() - started:.1f}s")
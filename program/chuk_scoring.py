@@ -0,0 +1,491 @@
+# chuk_scoring.py
+# Low-latency readmission scoring with a cached patient feature store.
+#
+# PatientFeatureStore keeps, per patient, the records admission_features()
+# needs: the patient record, admissions of the last LOOKBACK_DAYS (plus the
+# latest older discharge, which still sets days_since_discharge) and the lab
+# tests and prescriptions of the last HISTORY_DAYS. Patients live in an LRU
+# map bounded by --capacity. A patient that is not cached is loaded with a
+# few range scans of a patient-sorted row-key store (chuk_rowkey, built once
+# next to the data), bounded to events before the arriving one; after that
+# every new admission, lab test or prescription is inserted in time order
+# and older records are pruned, so the history is never rebuilt. An evicted
+# patient is reloaded from the row-key store, so updates only outlive
+# eviction once they are in the data the store was built from.
+#
+# Scoring requests are micro-batched: ScoringService queues them and a
+# batcher task scores everything that arrived within --max-wait-ms (up to
+# --max-batch requests) with one vectorized predict_proba call. Every batch
+# reports its size and the p50/p99 latency of its requests, from submission
+# to result; /stats gives the p50/p99 of the last LATENCY_WINDOW requests
+# and the maximum since start. The service is used in-process (await service.score(admission))
+# or through a small local HTTP front end:
+#
+#   POST /score   an admission record or a list of them -> {"results": [...]}
+#   POST /update  {"entity": "laboratory_tests", "record": {...}} or a list
+#   GET  /stats   store and latency counters, recent batch reports
+#
+#   python chuk_scoring.py --data-dir out --serve --port 8080
+#   python chuk_scoring.py --data-dir out --replay-start 2025-06-01
+import argparse
+import asyncio
+import bisect
+import collections
+import datetime
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+import chuk_index
+import chuk_replay
+import chuk_rowkey
+import chuk_train
+from chuk_readmission import LOOKBACK_DAYS
+
+SCORING_DIR = "chuk_scoring"
+STORE_ENTITIES = chuk_train.JOINED_ENTITIES
+HISTORY_ENTITIES = STORE_ENTITIES[1:]
+CAPACITY = 10000  # patients kept in memory
+STORE_BLOCK_BYTES = 8 * 1024  # small index blocks keep a cold patient load to a few KB per entity
+MAX_BATCH = 256
+MAX_WAIT_MS = 2.0
+BATCH_REPORTS = 1000  # recent batch reports kept for /stats
+LATENCY_WINDOW = 100000  # recent request latencies behind the p50/p99 in /stats
+CONCURRENCY = 512  # outstanding requests during --replay-start
+PRUNE_SLACK_DAYS = 30  # extra history kept for requests arriving slightly out of order
+STATS_INTERVAL = 5.0
+RETENTION_DAYS = {
+    "admissions": LOOKBACK_DAYS,
+    "laboratory_tests": chuk_train.HISTORY_DAYS,
+    "prescriptions": chuk_train.HISTORY_DAYS,
+}
+
+# --- Feature Store ---
+def _time(record, entity):
+    return datetime.datetime.fromisoformat(record[chuk_rowkey.KEY_TIMESTAMPS[entity]])
+
+class _PatientHistory:
+    """One patient's record and time-sorted recent admissions, lab tests and prescriptions"""
+
+    def __init__(self, patient):
+        self.patient = patient
+        self.records = {entity: [] for entity in HISTORY_ENTITIES}
+        self.times = {entity: [] for entity in HISTORY_ENTITIES}
+        self.ids = set()
+        self.latest = None
+
+    def add(self, entity, record):
+        """Insert a record in time order, replacing an older copy; returns False for one already held"""
+        key_field = chuk_index.PRIMARY_KEYS[entity]
+        key = record[key_field]
+        if key in self.ids:
+            held = next(k for k, other in enumerate(self.records[entity]) if other[key_field] == key)
+            if self.records[entity][held] == record:
+                return False
+            # e.g. an admission that arrived open and now arrives discharged
+            del self.records[entity][held], self.times[entity][held]
+        when = _time(record, entity)
+        position = bisect.bisect_right(self.times[entity], when)
+        self.times[entity].insert(position, when)
+        self.records[entity].insert(position, record)
+        self.ids.add(key)
+        if self.latest is None or when > self.latest:
+            self.latest = when
+            self.prune()
+        return True
+
+    def _drop(self, entity, keep):
+        key_field = chuk_index.PRIMARY_KEYS[entity]
+        for record, kept in zip(self.records[entity], keep):
+            if not kept:
+                self.ids.discard(record[key_field])
+        self.records[entity] = [record for record, kept in zip(self.records[entity], keep) if kept]
+        self.times[entity] = [when for when, kept in zip(self.times[entity], keep) if kept]
+
+    def prune(self):
+        """Drop records too old to change the features of an admission arriving now"""
+        for entity, days in RETENTION_DAYS.items():
+            cutoff = self.latest - datetime.timedelta(days=days + PRUNE_SLACK_DAYS)
+            times = self.times[entity]
+            if not times or times[0] >= cutoff:
+                continue
+            old = bisect.bisect_left(times, cutoff)
+            keep = [k >= old for k in range(len(times))]
+            if entity == "admissions":
+                # The latest earlier discharge still sets days_since_discharge
+                discharges = [(record.get("discharge_date") or "", k)
+                              for k, record in enumerate(self.records[entity][:old])]
+                keep[max(discharges)[1]] = True
+            self._drop(entity, keep)
+
+    def features(self, admission_id):
+        """Feature row of a held, discharged admission, or an error message"""
+        admissions = self.records["admissions"]
+        position = next((k for k, record in enumerate(admissions) if record["admission_id"] == admission_id), None)
+        if position is None:
+            return None, "admission not in store"
+        if admissions[position].get("discharge_date") is None:
+            return None, "admission not discharged"
+        rows, _ = chuk_train.admission_features(self.patient, admissions[:position + 1],
+                                                self.records["laboratory_tests"],
+                                                self.records["prescriptions"])
+        return rows[-1], None
+
+class PatientFeatureStore:
+    """LRU-bounded per-patient histories, loaded on a miss and updated incrementally"""
+
+    def __init__(self, source=None, capacity=CAPACITY):
+        self.source = source
+        self.capacity = capacity
+        self.patients = collections.OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+
+    def _load(self, patient_id, as_of):
+        """History of a patient with events before as_of, from the row-key store"""
+        if self.source is None:
+            return None
+        started = time.perf_counter()
+        patient = next((record for _, record in self.source.scan("patients", patient_id)), None)
+        history = None
+        if patient is not None:
+            history = _PatientHistory(patient)
+            for entity in HISTORY_ENTITIES:
+                # Admissions are read in full for the latest earlier discharge
+                start = None
+                if entity != "admissions" and as_of is not None:
+                    start = as_of - datetime.timedelta(days=RETENTION_DAYS[entity] + PRUNE_SLACK_DAYS)
+                for _, record in self.source.scan(entity, patient_id, start, as_of):
+                    history.add(entity, record)
+        self.load_seconds += time.perf_counter() - started
+        return history
+
+    def _put(self, patient_id, history):
+        self.patients[patient_id] = history
+        if len(self.patients) > self.capacity:
+            self.patients.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, patient_id, as_of=None):
+        """A patient's history, or None for a patient the store has never seen"""
+        history = self.patients.get(patient_id)
+        if history is not None:
+            self.hits += 1
+            self.patients.move_to_end(patient_id)
+            return history
+        self.misses += 1
+        history = self._load(patient_id, as_of)
+        if history is not None:
+            self._put(patient_id, history)
+        return history
+
+    def update(self, entity, record):
+        """Apply an arriving record; returns False if its patient is unknown"""
+        if entity == "patients":
+            history = self.patients.get(record["patient_id"])
+            if history is None:
+                self._put(record["patient_id"], _PatientHistory(record))
+            else:
+                history.patient = record
+                self.patients.move_to_end(record["patient_id"])
+            return True
+        history = self.get(record["patient_id"], _time(record, entity))
+        if history is None:
+            return False
+        history.add(entity, record)
+        return True
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {"patients": len(self.patients), "capacity": self.capacity, "hits": self.hits,
+                "misses": self.misses, "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions, "load_seconds": round(self.load_seconds, 3)}
+
+def open_store(data_dir=".", store_dir=None, memory_mb=chuk_train.MEMORY_MB):
+    """RowKeyStore over a patient-sorted copy of the joined entities, exported on first use"""
+    store_dir = store_dir or os.path.join(data_dir, SCORING_DIR, "store")
+    manifest_path = os.path.join(store_dir, chuk_rowkey.MANIFEST_FILE)
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        if manifest["order"] == "forward" and all(entity in manifest["entities"] for entity in STORE_ENTITIES):
+            return chuk_rowkey.RowKeyStore(store_dir)
+    print(f"Building the patient store in {store_dir}")
+    chuk_rowkey.export_dataset(data_dir, store_dir, STORE_ENTITIES, "forward", memory_mb, STORE_BLOCK_BYTES)
+    return chuk_rowkey.RowKeyStore(store_dir)
+
+# --- Scoring ---
+def score_batch(model, store, admissions):
+    """Readmission risk per admission, with one model call for the whole batch"""
+    results, rows, scored = [], [], []
+    for admission in admissions:
+        result = {"admission_id": admission.get("admission_id"), "patient_id": admission.get("patient_id")}
+        history = store.get(admission["patient_id"], _time(admission, "admissions"))
+        if history is None:
+            result["error"] = "unknown patient"
+        else:
+            history.add("admissions", admission)
+            row, error = history.features(admission["admission_id"])
+            if error:
+                result["error"] = error
+            else:
+                rows.append(row)
+                scored.append(result)
+        results.append(result)
+    if rows:
+        risks = model.predict_proba(np.array(rows, dtype=np.float32))
+        for result, risk in zip(scored, risks.tolist()):
+            result["readmission_risk"] = round(risk, 6)
+    return results
+
+class ScoringService:
+    """Micro-batched scoring: requests wait at most max_wait_ms for a batch of up to max_batch"""
+
+    def __init__(self, model, store, max_batch=MAX_BATCH, max_wait_ms=MAX_WAIT_MS, batch_log=None):
+        self.model = model
+        self.store = store
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self.batch_log = batch_log
+        self.batches = collections.deque(maxlen=BATCH_REPORTS)
+        self.batch_count = 0
+        self.latencies = collections.deque(maxlen=LATENCY_WINDOW)
+        self.max_latency = 0.0
+        self.scored = 0
+        self.errors = 0
+        self._queue = []
+        self._wakeup = None
+        self._task = None
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        while self._queue:
+            await asyncio.sleep(self.max_wait)
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    def submit(self, admission):
+        """Queue an admission; returns a future for its result.
+
+        The admission enters the feature store right away, so requests and
+        updates keep their arrival order.
+        """
+        future = asyncio.get_running_loop().create_future()
+        if self.store.update("admissions", admission):
+            self._queue.append((admission, time.perf_counter(), future))
+            self._wakeup.set()
+        else:
+            self.errors += 1
+            future.set_result({"admission_id": admission.get("admission_id"),
+                               "patient_id": admission.get("patient_id"), "error": "unknown patient"})
+        return future
+
+    async def score(self, admission):
+        return await self.submit(admission)
+
+    def update(self, entity, record):
+        return self.store.update(entity, record)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            await self._wakeup.wait()
+            # Collect until the batch is full or its oldest request has waited max_wait
+            deadline = loop.time() + self.max_wait - (time.perf_counter() - self._queue[0][1])
+            while len(self._queue) < self.max_batch and loop.time() < deadline:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), deadline - loop.time())
+                except asyncio.TimeoutError:
+                    break
+            batch, self._queue = self._queue[:self.max_batch], self._queue[self.max_batch:]
+            if not self._queue:
+                self._wakeup.clear()
+            self._score(batch)
+
+    def _score(self, batch):
+        started = time.perf_counter()
+        results = score_batch(self.model, self.store, [admission for admission, _, _ in batch])
+        finished = time.perf_counter()
+        latencies = []
+        for (_, submitted, future), result in zip(batch, results):
+            latencies.append((finished - submitted) * 1000)
+            if "error" in result:
+                self.errors += 1
+            else:
+                self.scored += 1
+            if not future.done():
+                future.set_result(result)
+        self.latencies.extend(latencies)
+        self.max_latency = max(self.max_latency, max(latencies))
+        report = {"batch": self.batch_count, "size": len(batch),
+                  "score_ms": round((finished - started) * 1000, 3),
+                  "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+                  "p99_ms": round(float(np.percentile(latencies, 99)), 3)}
+        self.batches.append(report)
+        self.batch_count += 1
+        if self.batch_log is not None:
+            self.batch_log.write(json.dumps(report) + "\n")
+
+    def stats(self):
+        latencies = np.array(self.latencies or [0.0])
+        sizes = [report["size"] for report in self.batches] or [0]
+        return {"scored": self.scored, "errors": self.errors,
+                "batches": self.batch_count,
+                "mean_batch_size": round(float(np.mean(sizes)), 1),
+                "latency_ms_p50": round(float(np.percentile(latencies, 50)), 3),
+                "latency_ms_p99": round(float(np.percentile(latencies, 99)), 3),
+                "latency_ms_max": round(self.max_latency, 3),
+                "store": self.store.stats()}
+
+# --- HTTP Front End ---
+def _response(writer, status, body, keep_alive):
+    data = json.dumps(body).encode("utf-8")
+    reason = {200: "OK", 400: "Bad Request", 404: "Not Found"}[status]
+    writer.write(f"HTTP/1.1 {status} {reason}\r\nContent-Type: application/json\r\n"
+                 f"Content-Length: {len(data)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+                 .encode("ascii") + data)
+
+async def _handle(service, method, path, body):
+    if method == "GET" and path == "/stats":
+        return 200, {**service.stats(), "recent_batches": list(service.batches)[-20:]}
+    if method == "POST" and path in ("/score", "/update"):
+        try:
+            payload = json.loads(body or b"null")
+        except ValueError as e:
+            return 400, {"error": f"invalid JSON: {e}"}
+        items = payload if isinstance(payload, list) else [payload]
+        if path == "/score":
+            return 200, {"results": await asyncio.gather(*[service.submit(admission) for admission in items])}
+        updated = sum(service.update(item["entity"], item["record"]) for item in items)
+        return 200, {"updated": updated, "unknown_patients": len(items) - updated}
+    return 404, {"error": f"no route for {method} {path}"}
+
+async def _serve_connection(service, reader, writer):
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            method, path, _ = request_line.decode("ascii").split(" ", 2)
+            headers = {}
+            while True:
+                line = (await reader.readline()).decode("latin-1").strip()
+                if not line:
+                    break
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get("content-length", 0)))
+            keep_alive = headers.get("connection", "").lower() != "close"
+            try:
+                status, response = await _handle(service, method, path, body)
+            except (KeyError, TypeError, ValueError) as e:
+                status, response = 400, {"error": f"bad request: {e!r}"}
+            _response(writer, status, response, keep_alive)
+            await writer.drain()
+            if not keep_alive:
+                break
+    except (asyncio.IncompleteReadError, ConnectionResetError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+async def serve(service, host="127.0.0.1", port=8080):
+    server = await asyncio.start_server(lambda reader, writer: _serve_connection(service, reader, writer), host, port)
+    print(f"Scoring on http://{host}:{port} (POST /score, POST /update, GET /stats)", file=sys.stderr)
+    async with server:
+        await server.serve_forever()
+
+# --- Replay ---
+async def replay(service, timeline, concurrency=CONCURRENCY, stats_interval=STATS_INTERVAL):
+    """Feed a timeline through the service: admissions are scored, labs and prescriptions update the store"""
+    pending = set()
+    last_report = time.perf_counter()
+    for row in range(len(timeline)):
+        entity = timeline.entities[timeline.entity[row]]
+        record = json.loads(timeline.record_bytes(row))
+        if entity == "admissions":
+            pending.add(service.submit(record))
+            if len(pending) >= concurrency:
+                _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        else:
+            service.update(entity, record)
+        if row % 64 == 0:
+            # Let the batcher run between bursts of events
+            await asyncio.sleep(0)
+        if time.perf_counter() - last_report >= stats_interval:
+            last_report = time.perf_counter()
+            stats = service.stats()
+            print(f"scoring: {stats['scored']:,} scored, batch {stats['mean_batch_size']:.0f}, "
+                  f"p50 {stats['latency_ms_p50']:.2f} ms p99 {stats['latency_ms_p99']:.2f} ms", file=sys.stderr)
+    if pending:
+        await asyncio.wait(pending)
+
+async def run(args):
+    model = chuk_train.load_model(args.model or os.path.join(args.data_dir, chuk_train.TRAINING_DIR,
+                                                             chuk_train.MODEL_FILE))
+    started = time.perf_counter()
+    store = PatientFeatureStore(open_store(args.data_dir, args.store_dir, args.memory_mb), args.capacity)
+    print(f"Patient store ready in {time.perf_counter() - started:.1f}s", file=sys.stderr)
+    batch_log = open(args.batch_log, "w") if args.batch_log else None
+    service = ScoringService(model, store, args.max_batch, args.max_wait_ms, batch_log)
+    await service.start()
+    try:
+        if args.serve:
+            await serve(service, args.host, args.port)
+        else:
+            timeline = chuk_replay.Timeline(args.data_dir, HISTORY_ENTITIES, args.replay_start, args.replay_end)
+            print(f"Replaying {len(timeline):,} events", file=sys.stderr)
+            started = time.perf_counter()
+            await replay(service, timeline, args.concurrency)
+            await service.stop()
+            seconds = time.perf_counter() - started
+            timeline.close()
+            stats = service.stats()
+            print(f"Scored {stats['scored']:,} admissions ({stats['errors']:,} not scorable) in {seconds:.1f}s "
+                  f"({stats['scored'] / max(seconds, 1e-9):,.0f}/s), {stats['batches']:,} batches of "
+                  f"{stats['mean_batch_size']:.0f}, latency p50 {stats['latency_ms_p50']:.2f} ms "
+                  f"p99 {stats['latency_ms_p99']:.2f} ms")
+            print(json.dumps(stats, indent=2))
+    finally:
+        if batch_log is not None:
+            batch_log.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Micro-batched readmission scoring with a cached patient feature store")
+    parser.add_argument("--data-dir", default=".", help="directory holding the chuk_* chunk files")
+    parser.add_argument("--model", default=None,
+                        help=f"model JSON (default: <data-dir>/{chuk_train.TRAINING_DIR}/{chuk_train.MODEL_FILE})")
+    parser.add_argument("--store-dir", default=None,
+                        help=f"patient-sorted row-key store (default: <data-dir>/{SCORING_DIR}/store)")
+    parser.add_argument("--memory-mb", type=int, default=chuk_train.MEMORY_MB,
+                        help="sort memory when building the store")
+    parser.add_argument("--capacity", type=int, default=CAPACITY, help="patients kept in memory (LRU)")
+    parser.add_argument("--max-batch", type=int, default=MAX_BATCH, help="requests per scoring batch")
+    parser.add_argument("--max-wait-ms", type=float, default=MAX_WAIT_MS,
+                        help="longest a request waits for its batch to fill")
+    parser.add_argument("--batch-log", default=None, help="write one NDJSON latency report per batch to this file")
+    parser.add_argument("--serve", action="store_true", help="serve HTTP instead of replaying the dataset")
+    parser.add_argument("--host", default="127.0.0.1", help="HTTP bind address")
+    parser.add_argument("--port", type=int, default=8080, help="HTTP port")
+    parser.add_argument("--replay-start", default=None,
+                        help="replay admissions, labs and prescriptions from this ISO timestamp (default: all)")
+    parser.add_argument("--replay-end", default=None, help="replay events before this ISO timestamp")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY,
+                        help="outstanding scoring requests during a replay")
+    args = parser.parse_args()
+    try:
+        asyncio.run(run(args))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,121 @@
+# chuk_shards.py
+# Multiprocess sharded generation of the time-series entities.
+#
+# Each entity is split into contiguous shards. A shard is generated in a
+# worker process with its own NumPy stream seeded from (global seed, entity,
+# shard index), so the output only depends on the seed and the shard count,
+# never on how many workers ran or in which order they finished. Workers
+# receive the shared reference arrays once, through the pool initializer, and
+# write their own NDJSON chunks which are renamed into one chunk sequence per
+# entity afterwards.
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+import chuk_batch
+import chuk_ids
+import chuk_io
+
+_worker_state = {}
+
+def shard_seed_sequence(seed, entity, shard):
+    return np.random.SeedSequence([seed, chuk_batch.TIMESERIES_ENTITIES.index(entity), shard])
+
+def shard_rng(seed, entity, shard):
+    """Independent legacy-API NumPy generator for one shard of one entity"""
+    return np.random.RandomState(np.random.MT19937(shard_seed_sequence(seed, entity, shard)))
+
+def shard_sizes(n, shards):
+    """Split n rows into `shards` contiguous parts that differ by at most one row"""
+    return [n // shards + (1 if i < n % shards else 0) for i in range(shards)]
+
+def _shard_stem(entity, shard):
+    return f".chuk_{entity}.shard{shard:04d}"
+
+def _init_worker(refs, start_date, end_date, seed, id_seed, out_dir, max_records, max_bytes, compress):
+    _worker_state.update(refs=refs, start_date=start_date, end_date=end_date, seed=seed, id_seed=id_seed,
+                         out_dir=out_dir, max_records=max_records, max_bytes=max_bytes, compress=compress)
+
+def _generate_shard(task):
+    entity, shard, first_key, rows = task
+    state = _worker_state
+    rng = shard_rng(state["seed"], entity, shard)
+    # Shards own contiguous key ranges, so IDs match a sequential run row for row
+    ids = chuk_ids.IdSequence(entity, state["id_seed"], start=first_key)
+    records = chuk_batch.iter_entity(rng, entity, rows, state["refs"],
+                                     state["start_date"], state["end_date"], ids)
+    with chuk_io.NDJSONChunkWriter(entity, out_dir=state["out_dir"], max_records=state["max_records"],
+                                   max_bytes=state["max_bytes"], stem=_shard_stem(entity, shard),
+                                   compress=state["compress"]) as writer:
+        writer.write_all(records)
+    return entity, shard, writer.files, writer.records_written, writer.bytes_written
+
+def _pool_context():
+    # Forked workers inherit the imported modules instead of re-importing the
+    # generator script; spawn is only used where fork is unavailable.
+    if "fork" in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context("fork")
+    return multiprocessing.get_context()
+
+def generate_sharded(refs, counts, start_date, end_date, seed, workers, shards=None, out_dir=".",
+                     max_records=chuk_io.CHUNK_RECORDS, max_bytes=chuk_io.CHUNK_BYTES, progress=None,
+                     id_seed=None, first_keys=None, first_chunks=None, compress=None):
+    """Generate the time-series entities in counts across a process pool.
+
+    Returns {entity: {"records": n, "bytes": n, "files": [paths],
+    "seconds": s, "records_per_second": r}} with each entity's shard chunks
+    renamed to chuk_<entity>_<i>.ndjson in shard order. seconds runs from the
+    pool start to the entity's last finished shard. progress, if given, is
+    called with a one-line message as each shard completes.
+
+    IDs are keyed by id_seed (default: seed) and start at first_keys[entity];
+    chunk numbering starts at first_chunks[entity]. Both default to 0 and are
+    set when appending a window to an existing dataset. compress names the
+    chuk_io.COMPRESSION codec of the chunk files, if any.
+    """
+    id_seed = seed if id_seed is None else id_seed
+    first_keys = first_keys or {}
+    first_chunks = first_chunks or {}
+    shards = shards or workers
+    tasks = []
+    entities = [entity for entity in chuk_batch.TIMESERIES_ENTITIES if entity in counts]
+    for entity in entities:
+        first_key = first_keys.get(entity, 0)
+        for shard, rows in enumerate(shard_sizes(counts[entity], shards)):
+            if rows > 0:
+                tasks.append((entity, shard, first_key, rows))
+            first_key += rows
+    results = {}
+    finished = {}
+    started = time.perf_counter()
+    with _pool_context().Pool(workers, initializer=_init_worker,
+                              initargs=(refs, start_date, end_date, seed, id_seed, out_dir,
+                                        max_records, max_bytes, compress)) as pool:
+        for entity, shard, files, records, written in pool.imap_unordered(_generate_shard, tasks):
+            results[entity, shard] = (files, records, written)
+            elapsed = time.perf_counter() - started
+            finished[entity] = elapsed
+            if progress:
+                progress(f"  {entity} shard {shard}: {records:,} records "
+                         f"({len(results)}/{len(tasks)} shards done, {elapsed:.1f}s)")
+
+    summary = {}
+    for entity in entities:
+        entity_summary = {"records": 0, "bytes": 0, "files": []}
+        for shard in range(shards):
+            if (entity, shard) not in results:
+                continue
+            files, records, written = results[entity, shard]
+            for path in files:
+                number = first_chunks.get(entity, 0) + len(entity_summary["files"])
+                target = chuk_io.compressed_name(os.path.join(out_dir, f"chuk_{entity}_{number}.ndjson"), compress)
+                chuk_io.replace_file(path, target)
+                entity_summary["files"].append(target)
+            entity_summary["records"] += records
+            entity_summary["bytes"] += written
+        entity_summary["seconds"] = finished.get(entity, 0.0)
+        entity_summary["records_per_second"] = entity_summary["records"] / max(entity_summary["seconds"], 1e-9)
+        summary[entity] = entity_summary
+    return summary
@@ -0,0 +1,265 @@
+# chuk_slots.py
+# Conflict-free appointment booking on per-doctor, per-day slot bitmaps.
+#
+# The generators give every appointment a random doctor and HH:00/HH:30 time,
+# so doctors are double-booked, work outside their shift_pattern and
+# estimated_duration is ignored. book() replays the appointments in requested
+# time order against a 48-bit bitmap per doctor per day (one bit per 30-minute
+# slot) and books each one into ceil(estimated_duration / 30) consecutive free
+# slots inside the doctor's shift, trying in turn:
+#   - the requested doctor, from the requested time onwards, then earlier
+#   - another doctor of the same department on that day
+#   - the following days, again the requested doctor first
+# Finding a run of k free slots is k shifts and ANDs of Python ints, so a
+# booking costs a few microseconds. Shifts are "Day" 08:00-18:00, "Night"
+# 00:00-08:00 plus 20:00-24:00 of each calendar day, and "Rotating"
+# alternates Day and Night weekly.
+#
+# Appointments chunks are rewritten with the booked doctor_id, appointment_date
+# (the slot start) and appointment_time. chuk_slots/ receives the bitmaps
+# (bitmaps.npz: booked and shift masks as uint64[doctor, day]), slot
+# utilisation per doctor and department (utilisation.json) and summary.json.
+# dataset-CHUK.py does not book --journeys datasets, whose medical records
+# follow the appointment times.
+#
+#   python chuk_slots.py --data-dir out
+#   python chuk_slots.py --data-dir out --dry-run
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+import chuk_io
+
+SLOTS_DIR = "chuk_slots"
+BITMAPS_FILE = "bitmaps.npz"
+UTILISATION_FILE = "utilisation.json"
+SUMMARY_FILE = "summary.json"
+SLOT_MINUTES = 30
+SLOTS_PER_DAY = 24 * 60 // SLOT_MINUTES
+DAY_US = 86400 * 10 ** 6
+SLOT_US = SLOT_MINUTES * 60 * 10 ** 6
+MAX_SLOTS = 8  # longer appointments are booked as four hours
+
+def _hours(*spans):
+    mask = 0
+    for first, last in spans:
+        for slot in range(first * 60 // SLOT_MINUTES, last * 60 // SLOT_MINUTES):
+            mask |= 1 << slot
+    return mask
+
+SHIFTS = {"Day": _hours((8, 18)), "Night": _hours((0, 8), (20, 24))}
+ROTATION = ["Day", "Night"]  # "Rotating" doctors change shift every week
+
+def shift_mask(pattern, day):
+    """Slot bitmask of a doctor's shift on a day (days since 1970-01-01)"""
+    if pattern == "Rotating":
+        pattern = ROTATION[(day // 7) % len(ROTATION)]
+    return SHIFTS.get(pattern, SHIFTS["Day"])
+
+def slot_count(duration):
+    return min(max(1, -(-int(duration or SLOT_MINUTES) // SLOT_MINUTES)), MAX_SLOTS)
+
+def first_run(free, slots, start=0):
+    """Lowest slot >= start that begins a run of `slots` set bits in free, or -1"""
+    runs = free
+    for shift in range(1, slots):
+        runs &= free >> shift
+    runs >>= start
+    if not runs:
+        return -1
+    return start + (runs & -runs).bit_length() - 1
+
+# --- Calendar ---
+class SlotCalendar:
+    """Booked-slot bitmaps of every doctor, one Python int per doctor per day"""
+
+    def __init__(self, doctors):
+        self.doctor_ids = [doctor["doctor_id"] for doctor in doctors]
+        self.patterns = [doctor.get("shift_pattern") for doctor in doctors]
+        self.departments = [doctor.get("department_id") for doctor in doctors]
+        self.colleagues = {}
+        for index, department in enumerate(self.departments):
+            self.colleagues.setdefault(department, []).append(index)
+        self.booked = [{} for _ in doctors]
+
+    def free(self, doctor, day):
+        return shift_mask(self.patterns[doctor], day) & ~self.booked[doctor].get(day, 0)
+
+    def _try(self, doctor, day, slots, preferred):
+        free = self.free(doctor, day)
+        slot = first_run(free, slots, preferred)
+        if slot < 0 and preferred:
+            slot = first_run(free, slots)
+        return slot
+
+    def book(self, doctor, day, preferred, slots):
+        """(doctor, day, first slot) of the booking; tries colleagues, then later days"""
+        first_day = day
+        while True:
+            slot = self._try(doctor, day, slots, preferred if day == first_day else 0)
+            chosen = doctor
+            if slot < 0:
+                for colleague in self.colleagues[self.departments[doctor]]:
+                    if colleague != doctor:
+                        slot = self._try(colleague, day, slots, preferred if day == first_day else 0)
+                        if slot >= 0:
+                            chosen = colleague
+                            break
+            if slot >= 0:
+                self.booked[chosen][day] = self.booked[chosen].get(day, 0) | (((1 << slots) - 1) << slot)
+                return chosen, day, slot
+            day += 1
+
+    def bitmaps(self, first_day, last_day):
+        """booked and shift masks as uint64[doctor, day] arrays over [first_day, last_day]"""
+        days = range(first_day, last_day + 1)
+        booked = np.array([[calendar.get(day, 0) for day in days] for calendar in self.booked],
+                          dtype=np.uint64).reshape(len(self.booked), len(days))
+        shifts = np.array([[shift_mask(pattern, day) for day in days] for pattern in self.patterns],
+                          dtype=np.uint64).reshape(len(self.patterns), len(days))
+        return booked, shifts
+
+def popcount(masks):
+    """Set bits per element of a uint64 array"""
+    bits = np.unpackbits(np.ascontiguousarray(masks).view(np.uint8).reshape(masks.shape + (8,)), axis=-1)
+    return bits.sum(axis=-1, dtype=np.int64)
+
+# --- Booking ---
+def load_appointments(data_dir, doctor_index):
+    """Requested doctor, day, slot and length of every appointment, in file order"""
+    doctor, requested, times, durations, counts = [], [], [], [], []
+    for path in chuk_io.entity_files("appointments", data_dir):
+        count = 0
+        for record in chuk_io.iter_file(path):
+            doctor.append(doctor_index.get(record.get("doctor_id"), 0))
+            requested.append(record["appointment_date"])
+            times.append(record.get("appointment_time") or "00:00")
+            durations.append(record.get("estimated_duration"))
+            count += 1
+        counts.append((path, count))
+    day = np.array(requested, dtype="datetime64[us]").astype("datetime64[D]").astype(np.int64)
+    minutes = np.array([int(value[:2]) * 60 + int(value[3:5]) for value in times], dtype=np.int64)
+    return {
+        "doctor": np.array(doctor, dtype=np.int64),
+        "day": day,
+        "slot": minutes // SLOT_MINUTES,
+        "slots": np.array([slot_count(duration) for duration in durations], dtype=np.int64),
+    }, counts
+
+def book(calendar, columns):
+    """Book every appointment in requested (day, slot) order; returns doctor, day and slot arrays"""
+    n = len(columns["day"])
+    order = np.lexsort((np.arange(n), columns["slot"], columns["day"]))
+    doctor, day, slot = np.empty(n, np.int64), np.empty(n, np.int64), np.empty(n, np.int64)
+    for row, requested_doctor, requested_day, preferred, slots in zip(
+            order.tolist(), columns["doctor"][order].tolist(), columns["day"][order].tolist(),
+            columns["slot"][order].tolist(), columns["slots"][order].tolist()):
+        doctor[row], day[row], slot[row] = calendar.book(requested_doctor, requested_day, preferred, slots)
+    return doctor, day, slot
+
+def utilisation(calendar, booked, shifts):
+    """Booked and shift slots per doctor and per department over the calendar"""
+    booked_slots = popcount(booked).sum(axis=1)
+    shift_slots = popcount(shifts).sum(axis=1)
+    doctors = [{"doctor_id": doctor_id, "department_id": department, "shift_pattern": pattern,
+                "booked_slots": int(used), "shift_slots": int(available),
+                "utilisation": round(float(used) / available, 4) if available else 0.0}
+               for doctor_id, department, pattern, used, available in
+               zip(calendar.doctor_ids, calendar.departments, calendar.patterns, booked_slots, shift_slots)]
+    departments = []
+    for department, members in sorted(calendar.colleagues.items()):
+        used, available = int(booked_slots[members].sum()), int(shift_slots[members].sum())
+        departments.append({"department_id": department, "doctors": len(members),
+                            "booked_slots": used, "shift_slots": available,
+                            "utilisation": round(used / available, 4) if available else 0.0})
+    return {"doctors": doctors, "departments": departments}
+
+# --- Dataset ---
+def book_dataset(data_dir=".", out_dir=None, rewrite=True):
+    """Book every appointment of a dataset, rewrite its appointments and write chuk_slots/"""
+    out_dir = out_dir or os.path.join(data_dir, SLOTS_DIR)
+    doctors = list(chuk_io.iter_entity("doctors", data_dir))
+    calendar = SlotCalendar(doctors)
+    timings = {}
+
+    started = time.perf_counter()
+    columns, files = load_appointments(data_dir, {doctor_id: i for i, doctor_id in enumerate(calendar.doctor_ids)})
+    timings["load_s"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    doctor, day, slot = book(calendar, columns)
+    timings["booking_s"] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    n = len(day)
+    first_day = int(day.min()) if n else 0
+    last_day = int(day.max()) if n else 0
+    booked, shifts = calendar.bitmaps(first_day, last_day)
+    report = utilisation(calendar, booked, shifts)
+    os.makedirs(out_dir, exist_ok=True)
+    np.savez_compressed(os.path.join(out_dir, BITMAPS_FILE),
+                        days=np.arange(first_day, last_day + 1).astype("datetime64[D]"),
+                        doctor_ids=np.array(calendar.doctor_ids), booked=booked, shifts=shifts)
+    with open(os.path.join(out_dir, UTILISATION_FILE), "w") as f:
+        json.dump(report, f, indent=2)
+    timings["report_s"] = time.perf_counter() - started
+
+    rewritten = 0
+    if rewrite:
+        started = time.perf_counter()
+        starts = (day * DAY_US + slot * SLOT_US).astype("datetime64[us]")
+        dates = np.datetime_as_string(starts, unit="us").tolist()
+        times = np.datetime_as_string(starts, unit="m").tolist()
+        doctor_ids = np.array(calendar.doctor_ids, dtype=object)[doctor].tolist()
+        row = 0
+        for path, count in files:
+            records = list(chuk_io.iter_file(path))
+            changed = False
+            for record in records:
+                booking = (doctor_ids[row], dates[row], times[row][11:])
+                if (record.get("doctor_id"), record.get("appointment_date"), record.get("appointment_time")) != booking:
+                    record["doctor_id"], record["appointment_date"], record["appointment_time"] = booking
+                    changed = True
+                row += 1
+            if changed:
+                chuk_io.rewrite_file(path, records)
+                rewritten += 1
+        timings["rewrite_s"] = time.perf_counter() - started
+
+    deferred = day - columns["day"]
+    summary = {
+        "appointments": n,
+        "doctors": len(calendar.doctor_ids),
+        "days": last_day - first_day + 1 if n else 0,
+        "as_requested": int(((doctor == columns["doctor"]) & (deferred == 0) & (slot == columns["slot"])).sum()),
+        "moved_time": int(((doctor == columns["doctor"]) & (deferred == 0) & (slot != columns["slot"])).sum()),
+        "moved_doctor": int(((doctor != columns["doctor"]) & (deferred == 0)).sum()),
+        "moved_day": int((deferred > 0).sum()),
+        "max_deferral_days": int(deferred.max()) if n else 0,
+        "booked_slots": int(columns["slots"].sum()),
+        "utilisation": round(sum(entry["booked_slots"] for entry in report["departments"]) /
+                             max(sum(entry["shift_slots"] for entry in report["departments"]), 1), 4),
+        "files_rewritten": rewritten,
+        "timings": timings,
+    }
+    with open(os.path.join(out_dir, SUMMARY_FILE), "w") as f:
+        json.dump(summary, f, indent=2)
+    return summary
+
+def print_summary(summary):
+    timings = ", ".join(f"{name[:-2]} {seconds:.2f}s" for name, seconds in summary["timings"].items())
+    print(f"Booked {summary['appointments']:,} appointments ({summary['booked_slots']:,} slots) with "
+          f"{summary['doctors']:,} doctors over {summary['days']:,} days: {summary['as_requested']:,} as requested, "
+          f"{summary['moved_time']:,} at another time, {summary['moved_doctor']:,} with a colleague, "
+          f"{summary['moved_day']:,} on a later day; utilisation {summary['utilisation']:.1%} [{timings}]")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Book the appointments of a CHUK dataset into free doctor slots")
+    parser.add_argument("--data-dir", default=".", help="directory holding the chuk_* files")
+    parser.add_argument("--out-dir", default=None, help=f"bitmap and report location (default: <data-dir>/{SLOTS_DIR})")
+    parser.add_argument("--dry-run", action="store_true", help="write the reports without rewriting appointments")
+    args = parser.parse_args()
+    print_summary(book_dataset(args.data_dir, args.out_dir, rewrite=not args.dry_run))
@@ -0,0 +1,403 @@
+# chuk_sqlite.py
+# SQLite export of all eleven CHUK entities.
+#
+# Each entity becomes one table whose columns flatten its embedded dicts
+# (contact_info.phone -> contact_phone, test_results.* -> result columns).
+# Lists and the vital_signs dict go to child tables keyed by the parent ID:
+#   prescription_medications, billing_services, vital_signs,
+#   medical_record_medications, admission_secondary_diagnoses,
+#   patient_medical_history, patient_allergies
+# The load runs with WAL journaling and synchronous writes off, stages the raw
+# JSON text of each chunk with executemany batches inside one transaction per
+# entity and flattens it with SQLite's JSON functions (INSERT ... SELECT,
+# json_each for the child tables), so records are never parsed in Python.
+# The primary-key, patient_id, date and foreign-key indexes are created only
+# after all rows are in, which is much cheaper than maintaining them row by row.
+import argparse
+import json
+import os
+import sqlite3
+import time
+
+import chuk_io
+
+BATCH_ROWS = 50000
+
+# Table name -> (source entity, [(column, SQL type, dotted record path)])
+# The first column is the primary key. The trailing cross-reference columns
+# (record_id, appointment_id, ...) are only filled for --journeys datasets.
+TABLES = {
+    "departments": ("departments", [
+        ("department_id", "TEXT", "department_id"),
+        ("name", "TEXT", "name"),
+        ("head_doctor", "TEXT", "head_doctor"),
+        ("location", "TEXT", "location"),
+        ("bed_capacity", "INTEGER", "bed_capacity"),
+        ("equipment_count", "INTEGER", "equipment_count"),
+        ("operational_hours", "TEXT", "operational_hours"),
+    ]),
+    "doctors": ("doctors", [
+        ("doctor_id", "TEXT", "doctor_id"),
+        ("first_name", "TEXT", "first_name"),
+        ("last_name", "TEXT", "last_name"),
+        ("gender", "TEXT", "gender"),
+        ("specialty", "TEXT", "specialty"),
+        ("department_id", "TEXT", "department_id"),
+        ("license_number", "TEXT", "license_number"),
+        ("years_experience", "INTEGER", "years_experience"),
+        ("education", "TEXT", "education"),
+        ("hire_date", "TEXT", "hire_date"),
+        ("contact_phone", "TEXT", "contact_info.phone"),
+        ("contact_email", "TEXT", "contact_info.email"),
+        ("shift_pattern", "TEXT", "shift_pattern"),
+        ("consultation_fee", "REAL", "consultation_fee"),
+    ]),
+    "nurses": ("nurses", [
+        ("nurse_id", "TEXT", "nurse_id"),
+        ("first_name", "TEXT", "first_name"),
+        ("last_name", "TEXT", "last_name"),
+        ("gender", "TEXT", "gender"),
+        ("department_id", "TEXT", "department_id"),
+        ("license_number", "TEXT", "license_number"),
+        ("education", "TEXT", "education"),
+        ("years_experience", "INTEGER", "years_experience"),
+        ("hire_date", "TEXT", "hire_date"),
+        ("shift_pattern", "TEXT", "shift_pattern"),
+        ("specialization", "TEXT", "specialization"),
+    ]),
+    "patients": ("patients", [
+        ("patient_id", "TEXT", "patient_id"),
+        ("first_name", "TEXT", "first_name"),
+        ("last_name", "TEXT", "last_name"),
+        ("date_of_birth", "TEXT", "date_of_birth"),
+        ("age", "INTEGER", "age"),
+        ("gender", "TEXT", "gender"),
+        ("blood_type", "TEXT", "blood_type"),
+        ("contact_phone", "TEXT", "contact_info.phone"),
+        ("contact_email", "TEXT", "contact_info.email"),
+        ("address_district", "TEXT", "contact_info.address.district"),
+        ("address_sector", "TEXT", "contact_info.address.sector"),
+        ("address_cell", "TEXT", "contact_info.address.cell"),
+        ("address_village", "TEXT", "contact_info.address.village"),
+        ("insurance_type", "TEXT", "insurance_info.type"),
+        ("insurance_policy_number", "TEXT", "insurance_info.policy_number"),
+        ("insurance_coverage_percentage", "INTEGER", "insurance_info.coverage_percentage"),
+        ("emergency_contact_name", "TEXT", "emergency_contact.name"),
+        ("emergency_contact_relationship", "TEXT", "emergency_contact.relationship"),
+        ("emergency_contact_phone", "TEXT", "emergency_contact.phone"),
+        ("registration_date", "TEXT", "registration_date"),
+    ]),
+    "medical_equipment": ("medical_equipment", [
+        ("equipment_id", "TEXT", "equipment_id"),
+        ("name", "TEXT", "name"),
+        ("manufacturer", "TEXT", "manufacturer"),
+        ("model", "TEXT", "model"),
+        ("serial_number", "TEXT", "serial_number"),
+        ("department_id", "TEXT", "department_id"),
+        ("purchase_date", "TEXT", "purchase_date"),
+        ("warranty_expiry", "TEXT", "warranty_expiry"),
+        ("status", "TEXT", "status"),
+        ("last_maintenance", "TEXT", "last_maintenance"),
+        ("usage_hours", "INTEGER", "usage_hours"),
+        ("cost", "REAL", "cost"),
+    ]),
+    "appointments": ("appointments", [
+        ("appointment_id", "TEXT", "appointment_id"),
+        ("patient_id", "TEXT", "patient_id"),
+        ("doctor_id", "TEXT", "doctor_id"),
+        ("department_id", "TEXT", "department_id"),
+        ("appointment_date", "TEXT", "appointment_date"),
+        ("appointment_time", "TEXT", "appointment_time"),
+        ("type", "TEXT", "type"),
+        ("status", "TEXT", "status"),
+        ("chief_complaint", "TEXT", "chief_complaint"),
+        ("priority", "TEXT", "priority"),
+        ("estimated_duration", "INTEGER", "estimated_duration"),
+        ("notes", "TEXT", "notes"),
+    ]),
+    "admissions": ("admissions", [
+        ("admission_id", "TEXT", "admission_id"),
+        ("patient_id", "TEXT", "patient_id"),
+        ("admitting_doctor_id", "TEXT", "admitting_doctor_id"),
+        ("department_id", "TEXT", "department_id"),
+        ("admission_date", "TEXT", "admission_date"),
+        ("discharge_date", "TEXT", "discharge_date"),
+        ("admission_type", "TEXT", "admission_type"),
+        ("room_number", "TEXT", "room_number"),
+        ("bed_number", "INTEGER", "bed_number"),
+        ("primary_diagnosis", "TEXT", "primary_diagnosis"),
+        ("admission_reason", "TEXT", "admission_reason"),
+        ("discharge_reason", "TEXT", "discharge_reason"),
+        ("total_cost", "REAL", "total_cost"),
+        ("record_id", "TEXT", "record_id"),
+        ("readmission_of", "TEXT", "readmission_of"),
+        ("transferred_from_department_id", "TEXT", "transferred_from_department_id"),
+    ]),
+    "medical_records": ("medical_records", [
+        ("record_id", "TEXT", "record_id"),
+        ("patient_id", "TEXT", "patient_id"),
+        ("doctor_id", "TEXT", "doctor_id"),
+        ("visit_date", "TEXT", "visit_date"),
+        ("visit_type", "TEXT", "visit_type"),
+        ("chief_complaint", "TEXT", "chief_complaint"),
+        ("history_of_present_illness", "TEXT", "history_of_present_illness"),
+        ("physical_examination", "TEXT", "physical_examination"),
+        ("diagnosis", "TEXT", "diagnosis"),
+        ("treatment_plan", "TEXT", "treatment_plan"),
+        ("follow_up_required", "INTEGER", "follow_up_required"),
+        ("follow_up_date", "TEXT", "follow_up_date"),
+        ("appointment_id", "TEXT", "appointment_id"),
+    ]),
+    "laboratory_tests": ("laboratory_tests", [
+        ("test_id", "TEXT", "test_id"),
+        ("patient_id", "TEXT", "patient_id"),
+        ("test_name", "TEXT", "test_name"),
+        ("test_date", "TEXT", "test_date"),
+        ("ordered_by", "TEXT", "ordered_by"),
+        ("sample_collected_date", "TEXT", "sample_collected_date"),
+        ("result_date", "TEXT", "result_date"),
+        ("hemoglobin", "TEXT", "test_results.hemoglobin"),
+        ("white_blood_cells", "TEXT", "test_results.white_blood_cells"),
+        ("platelets", "TEXT", "test_results.platelets"),
+        ("glucose_level", "TEXT", "test_results.glucose_level"),
+        ("result", "TEXT", "test_results.result"),
+        ("reference_range", "TEXT", "reference_range"),
+        ("status", "TEXT", "status"),
+        ("cost", "REAL", "cost"),
+        ("lab_technician", "TEXT", "lab_technician"),
+        ("record_id", "TEXT", "record_id"),
+    ]),
+    "prescriptions": ("prescriptions", [
+        ("prescription_id", "TEXT", "prescription_id"),
+        ("patient_id", "TEXT", "patient_id"),
+        ("doctor_id", "TEXT", "doctor_id"),
+        ("prescription_date", "TEXT", "prescription_date"),
+        ("total_cost", "REAL", "total_cost"),
+        ("status", "TEXT", "status"),
+        ("pharmacy_notes", "TEXT", "pharmacy_notes"),
+        ("refills_remaining", "INTEGER", "refills_remaining"),
+        ("record_id", "TEXT", "record_id"),
+    ]),
+    "billing_records": ("billing_records", [
+        ("billing_id", "TEXT", "billing_id"),
+        ("patient_id", "TEXT", "patient_id"),
+        ("billing_date", "TEXT", "billing_date"),
+        ("subtotal", "REAL", "subtotal"),
+        ("insurance_coverage_percent", "INTEGER", "insurance_coverage_percent"),
+        ("insurance_amount", "REAL", "insurance_amount"),
+        ("patient_amount", "REAL", "patient_amount"),
+        ("total_amount", "REAL", "total_amount"),
+        ("payment_status", "TEXT", "payment_status"),
+        ("payment_method", "TEXT", "payment_method"),
+        ("invoice_number", "TEXT", "invoice_number"),
+        ("due_date", "TEXT", "due_date"),
+        ("record_id", "TEXT", "record_id"),
+        ("admission_id", "TEXT", "admission_id"),
+    ]),
+}
+
+# Child table -> (parent table, record path, [(column, SQL type, item path)]).
+# A list path gets one row per item with its position; a dict path (vital
+# signs) gets one row per parent. An item path of None is the item itself.
+CHILD_TABLES = {
+    "patient_medical_history": ("patients", "medical_history", [("condition", "TEXT", None)]),
+    "patient_allergies": ("patients", "allergies", [("allergy", "TEXT", None)]),
+    "admission_secondary_diagnoses": ("admissions", "secondary_diagnoses", [("diagnosis", "TEXT", None)]),
+    "vital_signs": ("medical_records", "vital_signs", [
+        ("blood_pressure", "TEXT", "blood_pressure"),
+        ("heart_rate", "INTEGER", "heart_rate"),
+        ("temperature", "REAL", "temperature"),
+        ("respiratory_rate", "INTEGER", "respiratory_rate"),
+        ("oxygen_saturation", "INTEGER", "oxygen_saturation"),
+        ("weight", "REAL", "weight"),
+        ("height", "INTEGER", "height"),
+    ]),
+    "medical_record_medications": ("medical_records", "medications_prescribed", [("medication_name", "TEXT", None)]),
+    "prescription_medications": ("prescriptions", "medications", [
+        ("medication_name", "TEXT", "medication_name"),
+        ("dosage", "TEXT", "dosage"),
+        ("frequency", "TEXT", "frequency"),
+        ("duration", "TEXT", "duration"),
+        ("quantity", "INTEGER", "quantity"),
+        ("unit_cost", "REAL", "unit_cost"),
+        ("total_cost", "REAL", "total_cost"),
+    ]),
+    "billing_services": ("billing_records", "services", [
+        ("service_type", "TEXT", "service_type"),
+        ("description", "TEXT", "description"),
+        ("cost", "REAL", "cost"),
+        ("date", "TEXT", "date"),
+    ]),
+}
+
+# Foreign-key columns to index besides patient_id and the dates
+FOREIGN_KEYS = ["department_id", "doctor_id", "admitting_doctor_id", "ordered_by", "head_doctor",
+                "appointment_id", "record_id", "admission_id", "readmission_of",
+                "transferred_from_department_id"]
+
+PATIENT_TABLES = ["appointments", "admissions", "medical_records", "laboratory_tests",
+                  "prescriptions", "billing_records"]
+
+# --- Row Building ---
+def _extract(path, source="doc"):
+    """SQL expression reading a dotted record path out of a JSON document"""
+    return source if path is None else f"json_extract({source}, '$.{path}')"
+
+def _child_table(parent):
+    return [(name, spec) for name, spec in CHILD_TABLES.items() if spec[0] == parent]
+
+def _parent_key(table):
+    return TABLES[table][1][0][0]
+
+# --- Schema ---
+def create_tables(conn, tables):
+    for table in tables:
+        _, columns = TABLES[table]
+        conn.execute(f"DROP TABLE IF EXISTS {table}")
+        conn.execute(f"CREATE TABLE {table} ({', '.join(f'{name} {kind}' for name, kind, _ in columns)})")
+        for child, (_, path, child_columns) in _child_table(table):
+            key = _parent_key(table)
+            position = "" if path == "vital_signs" else "position INTEGER, "
+            conn.execute(f"DROP TABLE IF EXISTS {child}")
+            conn.execute(f"CREATE TABLE {child} ({key} TEXT, {position}"
+                         f"{', '.join(f'{name} {kind}' for name, kind, _ in child_columns)})")
+
+def index_statements(tables):
+    """CREATE INDEX statements for primary keys, patient_id, dates and foreign keys"""
+    statements = []
+    for table in tables:
+        _, columns = TABLES[table]
+        names = [name for name, _, _ in columns]
+        statements.append(f"CREATE UNIQUE INDEX IF NOT EXISTS {table}_pk ON {table} ({names[0]})")
+        for name in names[1:]:
+            if name == "patient_id" or name in FOREIGN_KEYS or name.endswith("_date"):
+                statements.append(f"CREATE INDEX IF NOT EXISTS {table}_{name} ON {table} ({name})")
+        for child, _ in _child_table(table):
+            key = _parent_key(table)
+            statements.append(f"CREATE INDEX IF NOT EXISTS {child}_{key} ON {child} ({key})")
+    return statements
+
+# --- Load ---
+def _insert_statements(table):
+    """INSERT ... SELECT statements moving the staged JSON documents into a table and its children"""
+    _, columns = TABLES[table]
+    statements = [f"INSERT INTO {table} SELECT {', '.join(_extract(path) for _, _, path in columns)} FROM staging"]
+    key = _extract(_parent_key(table))
+    for child, (_, path, child_columns) in _child_table(table):
+        if path == "vital_signs":
+            values = ", ".join(_extract(f"{path}.{item}") for _, _, item in child_columns)
+            statements.append(f"INSERT INTO {child} SELECT {key}, {values} FROM staging "
+                              f"WHERE json_type(doc, '$.{path}') = 'object'")
+        else:
+            values = ", ".join(_extract(item, "item.value") for _, _, item in child_columns)
+            statements.append(f"INSERT INTO {child} SELECT {key}, item.key, {values} "
+                              f"FROM staging, json_each(doc, '$.{path}') AS item")
+    return statements
+
+def _stage_file(conn, path, batch_rows):
+    """Copy the raw JSON text of one chunk file's records into the staging table.
+
+    NDJSON lines are inserted as they are; JSON array files are split into
+    records by SQLite itself.
+    """
+    with chuk_io.open_file(path, encoding="utf-8") as f:
+        if not chuk_io.is_ndjson(path):
+            conn.execute("INSERT INTO staging SELECT value FROM json_each(?)", (f.read(),))
+            return
+        batch = []
+        for line in f:
+            if line.strip():
+                batch.append((line,))
+            if len(batch) >= batch_rows:
+                conn.executemany("INSERT INTO staging VALUES (?)", batch)
+                batch = []
+        conn.executemany("INSERT INTO staging VALUES (?)", batch)
+
+def load_table(conn, table, data_dir=".", batch_rows=BATCH_ROWS):
+    """Insert one entity and its child rows, one chunk file at a time; returns {table: rows inserted}.
+
+    Records are staged as raw JSON text with executemany, then SQLite's JSON
+    functions flatten them into the table and its child tables, so no record
+    is parsed in Python.
+    """
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS staging (doc TEXT)")
+    statements = _insert_statements(table)
+    targets = [table] + [child for child, _ in _child_table(table)]
+    counts = dict.fromkeys(targets, 0)
+    for path in chuk_io.entity_files(TABLES[table][0], data_dir):
+        _stage_file(conn, path, batch_rows)
+        for target, statement in zip(targets, statements):
+            counts[target] += conn.execute(statement).rowcount
+        conn.execute("DELETE FROM staging")
+    return counts
+
+def export_dataset(data_dir=".", path="chuk.sqlite", tables=None, batch_rows=BATCH_ROWS):
+    """Load the generated JSON/NDJSON files into a SQLite database; returns per-table row counts"""
+    tables = tables or list(TABLES)
+    conn = sqlite3.connect(path, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-262144")  # 256 MB page cache
+    counts = {}
+    try:
+        create_tables(conn, tables)
+        for table in tables:
+            started = time.perf_counter()
+            conn.execute("BEGIN")
+            loaded = load_table(conn, table, data_dir, batch_rows)
+            conn.execute("COMMIT")
+            elapsed = time.perf_counter() - started
+            rows = sum(loaded.values())
+            print(f"- {table}: {rows:,} rows in {elapsed:.2f}s ({rows / max(elapsed, 1e-9):,.0f} rows/s)")
+            counts.update(loaded)
+        started = time.perf_counter()
+        conn.execute("BEGIN")
+        for statement in index_statements(tables):
+            conn.execute(statement)
+        conn.execute("COMMIT")
+        conn.execute("ANALYZE")
+        print(f"- indexes: {time.perf_counter() - started:.2f}s")
+        conn.execute("PRAGMA synchronous=NORMAL")
+    finally:
+        conn.close()
+    return counts
+
+# --- Queries ---
+def patient_journey(conn, patient_id):
+    """The patient row plus their rows from every time-series table and its child tables"""
+    conn.row_factory = sqlite3.Row
+    journey = {"patients": [dict(row) for row in conn.execute(
+        "SELECT * FROM patients WHERE patient_id = ?", (patient_id,))]}
+    for table in PATIENT_TABLES:
+        rows = [dict(row) for row in conn.execute(f"SELECT * FROM {table} WHERE patient_id = ?", (patient_id,))]
+        key = _parent_key(table)
+        for child, _ in _child_table(table):
+            for row in rows:
+                row[child] = [dict(item) for item in conn.execute(
+                    f"SELECT * FROM {child} WHERE {key} = ?", (row[key],))]
+        journey[table] = rows
+    return journey
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a generated CHUK dataset to SQLite")
+    parser.add_argument("--data-dir", default=".", help="directory holding the chuk_*.json/ndjson files")
+    parser.add_argument("--out", default="chuk.sqlite", help="database file (tables are replaced)")
+    parser.add_argument("--tables", default=None, help="comma-separated tables (default: all eleven entities)")
+    parser.add_argument("--batch-rows", type=int, default=BATCH_ROWS, help="records per executemany batch")
+    parser.add_argument("--patient", default=None, help="afterwards, print the journey of this patient_id")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    counts = export_dataset(args.data_dir, args.out, args.tables.split(",") if args.tables else None,
+                            args.batch_rows)
+    elapsed = time.perf_counter() - started
+    print(f"Loaded {sum(counts.values()):,} rows into {args.out} in {elapsed:.1f}s "
+          f"({sum(counts.values()) / elapsed:,.0f} rows/s, {os.path.getsize(args.out) / 1e6:.1f} MB)")
+    if args.patient:
+        with sqlite3.connect(args.out) as conn:
+            started = time.perf_counter()
+            journey = patient_journey(conn, args.patient)
+            print(json.dumps(journey, indent=2))
+            print(f"Journey of {sum(len(rows) for rows in journey.values())} rows "
+                  f"in {(time.perf_counter() - started) * 1000:.1f} ms")
@@ -0,0 +1,406 @@
+# chuk_tables.py
+# Compact in-memory tables for the reference entities.
+#
+# A Table holds one entity as a NumPy structured array with one field per
+# (dotted) record path, following SCHEMAS:
+#   - "category" strings are interned into a per-field vocabulary and stored
+#     as int32 codes (-1 for None)
+#   - "S<n>" fields (IDs, phone and policy numbers) are fixed-width bytes,
+#     with b"" for None; a field widens when longer values arrive, e.g.
+#     CHUK_EQ_10000 once a dataset has 10,000 pieces of equipment
+#   - "date" and "datetime" fields are datetime64[D] / datetime64[us]
+#   - numeric fields keep their NumPy dtype
+# A one-element list marks a list of categories, stored as int32 codes plus an
+# offsets array. A patient takes about 150 bytes this way instead of the
+# ~2.5 KB of its nested dicts.
+#
+# Rows are handed out as Row views (__slots__, no dict) that read a field on
+# access, so code written for record dicts (random.choice(patients),
+# patient["insurance_info"]["coverage_percentage"]) works unchanged.
+# Hot loops read whole fields once with column() and index them by row, and
+# groups() is a precomputed index, e.g. department -> doctors. records()
+# converts the table back to the existing JSON schema, field order included.
+#
+#   python chuk_tables.py --data-dir out
+import argparse
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+
+import chuk_io
+
+BLOCK_ROWS = 65536
+
+SCHEMAS = {
+    "departments": {
+        "department_id": "S8",
+        "name": "category",
+        "head_doctor": "S15",
+        "location": "category",
+        "bed_capacity": "int16",
+        "equipment_count": "int16",
+        "operational_hours": "category",
+    },
+    "doctors": {
+        "doctor_id": "S15",
+        "first_name": "category",
+        "last_name": "category",
+        "gender": "category",
+        "specialty": "category",
+        "department_id": "category",
+        "license_number": "S12",
+        "years_experience": "int8",
+        "education": "category",
+        "hire_date": "datetime",
+        "contact_info.phone": "S13",
+        "contact_info.email": "category",
+        "shift_pattern": "category",
+        "consultation_fee": "float64",
+    },
+    "nurses": {
+        "nurse_id": "S15",
+        "first_name": "category",
+        "last_name": "category",
+        "gender": "category",
+        "department_id": "category",
+        "license_number": "S12",
+        "education": "category",
+        "years_experience": "int8",
+        "hire_date": "datetime",
+        "shift_pattern": "category",
+        "specialization": "category",
+    },
+    "patients": {
+        "patient_id": "S17",
+        "first_name": "category",
+        "last_name": "category",
+        "date_of_birth": "date",
+        "age": "int16",
+        "gender": "category",
+        "blood_type": "category",
+        "contact_info.phone": "S13",
+        "contact_info.email": "category",
+        "contact_info.address.district": "category",
+        "contact_info.address.sector": "category",
+        "contact_info.address.cell": "category",
+        "contact_info.address.village": "category",
+        "insurance_info.type": "category",
+        "insurance_info.policy_number": "S10",
+        "insurance_info.coverage_percentage": "int16",
+        "emergency_contact.name": "category",
+        "emergency_contact.relationship": "category",
+        "emergency_contact.phone": "S13",
+        "registration_date": "datetime",
+        "medical_history": ["category"],
+        "allergies": ["category"],
+    },
+    "medical_equipment": {
+        "equipment_id": "S12",
+        "name": "category",
+        "manufacturer": "category",
+        "model": "category",
+        "serial_number": "S11",
+        "department_id": "category",
+        "purchase_date": "datetime",
+        "warranty_expiry": "datetime",
+        "status": "category",
+        "last_maintenance": "datetime",
+        "usage_hours": "int32",
+        "cost": "float64",
+    },
+}
+
+def _get(record, path):
+    for key in path:
+        if record is None:
+            return None
+        record = record.get(key)
+    return record
+
+def _isoformat(value, kind):
+    """datetime.isoformat() text of a datetime64 value (seconds only when there are no microseconds)"""
+    if np.isnat(value):
+        return None
+    if kind == "date":
+        return str(value)
+    text = str(value)
+    return text[:-7] if text.endswith(".000000") else text
+
+# --- Interning ---
+class Vocabulary:
+    """Interned strings of one category field"""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def code(self, value):
+        if value is None:
+            return -1
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(sys.intern(value))
+        return code
+
+    def __getitem__(self, code):
+        return None if code < 0 else self.values[code]
+
+# --- Rows ---
+class Row:
+    """Read-only view of one table row (or of a nested dict inside it)"""
+    __slots__ = ("_table", "_index", "_prefix")
+
+    def __init__(self, table, index, prefix=""):
+        self._table = table
+        self._index = index
+        self._prefix = prefix
+
+    def __getitem__(self, key):
+        path = self._prefix + key
+        table = self._table
+        if path in table.kinds:
+            return table.value(path, self._index)
+        if path + "." in table.prefixes:
+            return Row(table, self._index, path + ".")
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self):
+        record = self._table.record(self._index)
+        for key in self._prefix.split(".")[:-1]:
+            record = record[key]
+        return record
+
+    def __repr__(self):
+        return f"Row({self.to_dict()!r})"
+
+# --- Tables ---
+class Table:
+    """One reference entity as a structured array of typed and interned columns"""
+
+    def __init__(self, entity, schema=None, block_rows=BLOCK_ROWS):
+        self.entity = entity
+        self.schema = schema or SCHEMAS[entity]
+        self.kinds = {path: kind for path, kind in self.schema.items() if not isinstance(kind, list)}
+        self.lists = [path for path, kind in self.schema.items() if isinstance(kind, list)]
+        self.prefixes = {path[:i + 1] for path in self.schema for i, char in enumerate(path) if char == "."}
+        self.paths = {path: tuple(path.split(".")) for path in self.schema}
+        self.vocabularies = {path: Vocabulary() for path, kind in self.schema.items()
+                             if kind == "category" or kind == ["category"]}
+        self.dtype = np.dtype([(path, self._dtype(kind)) for path, kind in self.kinds.items()])
+        self.block_rows = block_rows
+        self.rows = np.zeros(0, self.dtype)
+        self.list_offsets = {path: np.zeros(1, np.int64) for path in self.lists}
+        self.list_values = {path: np.zeros(0, np.int32) for path in self.lists}
+        self._blocks, self._pending = [], []
+        self._indexes = {}
+
+    @staticmethod
+    def _dtype(kind):
+        if kind == "category":
+            return np.int32
+        if kind == "date":
+            return "datetime64[D]"
+        if kind == "datetime":
+            return "datetime64[us]"
+        return kind
+
+    @classmethod
+    def from_records(cls, entity, records, schema=None):
+        table = cls(entity, schema)
+        for record in records:
+            table.append(record)
+        table.freeze()
+        return table
+
+    # --- Building ---
+    def append(self, record):
+        self._pending.append(record)
+        if len(self._pending) >= self.block_rows:
+            self._flush()
+
+    def _encode(self, path, kind, values):
+        if kind == "category":
+            vocabulary = self.vocabularies[path]
+            return [vocabulary.code(value) for value in values]
+        if kind[0] == "S":
+            encoded = [b"" if value is None else value.encode("ascii") for value in values]
+            width = max(map(len, encoded), default=0)
+            if width > int(kind[1:]):
+                self._widen(path, f"S{width}")
+            return encoded
+        if kind in ("date", "datetime"):
+            return ["NaT" if value is None else value for value in values]
+        return values
+
+    def _widen(self, path, kind):
+        """Give a fixed-width field a wider kind, converting the rows held so far"""
+        self.kinds[path] = kind
+        self.dtype = np.dtype([(name, self._dtype(kind)) for name, kind in self.kinds.items()])
+        self.rows = self.rows.astype(self.dtype)
+        self._blocks = [(block.astype(self.dtype), lists) for block, lists in self._blocks]
+
+    def _flush(self):
+        records, self._pending = self._pending, []
+        if not records:
+            return
+        columns = {path: self._encode(path, kind, [_get(record, self.paths[path]) for record in records])
+                   for path, kind in list(self.kinds.items())}
+        block = np.zeros(len(records), self.dtype)
+        for path, values in columns.items():
+            block[path] = values
+        lists = {}
+        for path in self.lists:
+            vocabulary = self.vocabularies[path]
+            items = [_get(record, self.paths[path]) or [] for record in records]
+            lengths = np.array([len(item) for item in items], dtype=np.int64)
+            codes = np.array([vocabulary.code(value) for item in items for value in item], dtype=np.int32)
+            lists[path] = (lengths, codes)
+        self._blocks.append((block, lists))
+        self._indexes = {}
+
+    def freeze(self):
+        """Merge buffered rows into the column arrays"""
+        self._flush()
+        if not self._blocks:
+            return self
+        self.rows = np.concatenate([self.rows] + [block for block, _ in self._blocks])
+        for path in self.lists:
+            lengths = np.concatenate([lists[path][0] for _, lists in self._blocks])
+            offsets = self.list_offsets[path]
+            self.list_offsets[path] = np.concatenate([offsets, offsets[-1] + np.cumsum(lengths)])
+            self.list_values[path] = np.concatenate([self.list_values[path]] +
+                                                    [lists[path][1] for _, lists in self._blocks])
+        self._blocks = []
+        return self
+
+    # --- Access ---
+    def __len__(self):
+        return len(self.rows) + sum(len(block) for block, _ in self._blocks) + len(self._pending)
+
+    def __getitem__(self, index):
+        if self._pending or self._blocks:
+            self.freeze()
+        if index < 0:
+            index += len(self.rows)
+        if not 0 <= index < len(self.rows):
+            raise IndexError(index)
+        return Row(self, index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def value(self, path, index):
+        """One field of one row, decoded to its JSON value"""
+        if path in self.vocabularies:
+            vocabulary = self.vocabularies[path]
+            if path in self.kinds:
+                return vocabulary[int(self.rows[path][index])]
+            offsets = self.list_offsets[path]
+            return [vocabulary.values[code] for code in self.list_values[path][offsets[index]:offsets[index + 1]]]
+        kind = self.kinds[path]
+        value = self.rows[path][index]
+        if kind[0] == "S":
+            return value.decode("ascii") or None
+        if kind in ("date", "datetime"):
+            return _isoformat(value, kind)
+        return value.item()
+
+    def column(self, path):
+        """Decoded values of one field for every row: a NumPy array, or a list for lists"""
+        self.freeze()
+        if path in self.lists:
+            return [self.value(path, index) for index in range(len(self.rows))]
+        kind = self.kinds[path]
+        if kind == "category":
+            values = np.array(self.vocabularies[path].values + [None], dtype=object)
+            return values[self.rows[path]]
+        if kind[0] == "S":
+            return np.char.decode(self.rows[path], "ascii")
+        return self.rows[path]
+
+    def record(self, index):
+        """The row as a record dict in the JSON schema"""
+        record = {}
+        for path, key in self.paths.items():
+            target = record
+            for part in key[:-1]:
+                target = target.setdefault(part, {})
+            target[key[-1]] = self.value(path, index)
+        return record
+
+    def records(self):
+        """Every row as a record dict, in table order"""
+        self.freeze()
+        for index in range(len(self.rows)):
+            yield self.record(index)
+
+    # --- Indexes ---
+    def groups(self, path):
+        """{value: int64 array of row indexes in table order}, computed once per field"""
+        self.freeze()
+        key = ("groups", path)
+        if key not in self._indexes:
+            if path in self.vocabularies:
+                codes = self.rows[path]
+                labels = self.vocabularies[path]
+            else:
+                labels, codes = np.unique(self.rows[path], return_inverse=True)
+            order = np.argsort(codes, kind="stable")
+            bounds = np.flatnonzero(np.diff(codes[order])) + 1
+            groups = {}
+            for rows in np.split(order, bounds):
+                if len(rows):
+                    label = labels[int(codes[rows[0]])]
+                    groups[label.decode("ascii") if isinstance(label, bytes) else label] = rows
+            self._indexes[key] = groups
+        return self._indexes[key]
+
+    def memory_bytes(self):
+        """Bytes held by the arrays and the interned vocabularies"""
+        self.freeze()
+        total = self.rows.nbytes
+        total += sum(array.nbytes for array in self.list_offsets.values())
+        total += sum(array.nbytes for array in self.list_values.values())
+        for vocabulary in self.vocabularies.values():
+            total += sys.getsizeof(vocabulary.values) + sys.getsizeof(vocabulary.codes)
+            total += sum(sys.getsizeof(value) for value in vocabulary.values)
+        return total
+
+def load_table(entity, data_dir="."):
+    """Stream an entity's files into a Table"""
+    return Table.from_records(entity, chuk_io.iter_entity(entity, data_dir))
+
+# --- Report ---
+def _traced(load):
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = load()
+    elapsed = time.perf_counter() - started
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size, elapsed
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare record dicts with compact tables for the reference entities")
+    parser.add_argument("--data-dir", default=".", help="directory holding the chuk_* files")
+    parser.add_argument("--entities", default=None, help=f"comma-separated entities (default: {','.join(SCHEMAS)})")
+    args = parser.parse_args()
+
+    for entity in args.entities.split(",") if args.entities else SCHEMAS:
+        records, dict_bytes, dict_seconds = _traced(lambda: list(chuk_io.iter_entity(entity, args.data_dir)))
+        table, table_bytes, table_seconds = _traced(lambda: load_table(entity, args.data_dir))
+        exact = all(a == b for a, b in zip(records, table.records())) and len(records) == len(table)
+        print(f"{entity}: {len(table):,} rows, dicts {dict_bytes / 1e6:,.1f} MB, table {table_bytes / 1e6:,.1f} MB "
+              f"({dict_bytes / max(table_bytes, 1):.1f}x smaller), loaded in {table_seconds:.2f}s "
+              f"vs {dict_seconds:.2f}s, round trip {'exact' if exact else 'MISMATCH'}")
+        del records, table
@@ -0,0 +1,439 @@
+# chuk_train.py
+# Out-of-core training of a 30-day readmission-risk model.
+#
+# The pipeline never holds more than one patient's history, one feature
+# chunk and one mini-batch in memory:
+#   1. patients, admissions, laboratory_tests and prescriptions are sorted by
+#      patient_id with chuk_rowkey's bounded-memory external merge sort;
+#   2. the four sorted streams are merge-joined one patient at a time and
+#      every discharged admission becomes a feature row (age, insurance,
+#      medical history, stay, prior admissions, labs and prescriptions of the
+#      preceding 90 days) labelled with readmission within the window; rows
+#      are written as fixed-size .npy chunks, with a per-patient holdout split
+#      and running sums for standardization;
+#   3. a logistic regression is fitted with mini-batch Adam over the chunks
+#      for several epochs, reporting rows per second, loss and holdout AUC
+#      (from fixed score histograms, so evaluation memory is constant too).
+#
+# The fitted weights, the standardization and the feature names are saved to
+# readmission_model.json; admission_features() turns one patient's records
+# into the same rows, so the model can score admissions outside this script.
+#
+#   python chuk_train.py --data-dir out --epochs 5 --batch-size 1024
+import argparse
+import bisect
+import datetime
+import json
+import math
+import os
+import shutil
+import time
+import zlib
+
+import numpy as np
+
+import chuk_append
+import chuk_rowkey
+from chuk_readmission import LOOKBACK_DAYS
+from chuk_vocab import ADMISSION_TYPES, get_medical_conditions
+
+TRAINING_DIR = "chuk_training"
+MODEL_FILE = "readmission_model.json"
+FEATURES_FILE = "features.json"
+JOINED_ENTITIES = ["patients", "admissions", "laboratory_tests", "prescriptions"]
+READMISSION_DAYS = 30
+HISTORY_DAYS = 90  # labs and prescriptions counted before an admission
+CHUNK_ROWS = 65536  # feature rows per .npy chunk
+BATCH_SIZE = 1024
+EPOCHS = 5
+LEARNING_RATE = 0.01
+L2 = 1e-4
+HOLDOUT = 0.2  # share of patients held out for evaluation
+AUC_BINS = 1000
+MEMORY_MB = 64
+INSURANCE_TYPES = ["Mutuelle de Sante", "RAMA", "MMI", "Private", "None"]
+ABNORMAL_RESULTS = {"Abnormal", "Positive"}
+
+FEATURE_NAMES = (
+    ["age", "male", "insurance_coverage", "medical_history_count", "allergy_count",
+     "length_of_stay_days", "log_total_cost", "prior_admissions", "days_since_discharge",
+     "no_prior_discharge", "lab_tests", "abnormal_lab_tests", "prescriptions", "medications",
+     "log_prescription_cost"]
+    + [f"insurance={name}" for name in INSURANCE_TYPES]
+    + [f"admission_type={name}" for name in ADMISSION_TYPES]
+    + [f"history={name}" for name in get_medical_conditions()]
+    + [f"diagnosis={name}" for name in get_medical_conditions()]
+)
+
+# --- Features ---
+def _time(value):
+    return datetime.datetime.fromisoformat(value)
+
+def _is_abnormal(test):
+    results = test.get("test_results") or {}
+    if results.get("result") in ABNORMAL_RESULTS:
+        return True
+    glucose = results.get("glucose_level")
+    return glucose is not None and float(glucose.split()[0]) > 140
+
+def admission_features(patient, admissions, tests, prescriptions, observation_end=None,
+                       window_days=READMISSION_DAYS):
+    """(feature rows, labels) for a patient's discharged admissions.
+
+    admissions, tests and prescriptions are the patient's records sorted by
+    time. Admissions whose readmission window extends past observation_end
+    are skipped, since their label is not known yet.
+    """
+    conditions = get_medical_conditions()
+    history = [0.0] * len(conditions)
+    for condition in patient.get("medical_history") or []:
+        if condition in conditions:
+            history[conditions.index(condition)] = 1.0
+    insurance = patient.get("insurance_info") or {}
+    insurance_flags = [1.0 if insurance.get("type") == name else 0.0 for name in INSURANCE_TYPES]
+    birth = datetime.datetime.fromisoformat(patient["date_of_birth"])
+    test_times = [_time(test["test_date"]) for test in tests]
+    prescription_times = [_time(prescription["prescription_date"]) for prescription in prescriptions]
+    admitted = [_time(admission["admission_date"]) for admission in admissions]
+    window = datetime.timedelta(days=window_days)
+    rows, labels = [], []
+    last_discharge = None
+    for i, admission in enumerate(admissions):
+        start = admitted[i]
+        discharge = admission.get("discharge_date")
+        if discharge is not None:
+            discharge = _time(discharge)
+        if discharge is not None and (observation_end is None or discharge + window <= observation_end):
+            lookback = start - datetime.timedelta(days=LOOKBACK_DAYS)
+            prior = [j for j in range(i) if admitted[j] >= lookback]
+            since = (start - last_discharge).total_seconds() / 86400 if last_discharge else LOOKBACK_DAYS
+            history_start = start - datetime.timedelta(days=HISTORY_DAYS)
+            lo, hi = bisect.bisect_left(test_times, history_start), bisect.bisect_left(test_times, start)
+            recent_tests = tests[lo:hi]
+            lo, hi = (bisect.bisect_left(prescription_times, history_start),
+                      bisect.bisect_left(prescription_times, start))
+            recent_prescriptions = prescriptions[lo:hi]
+            diagnosis = [0.0] * len(conditions)
+            if admission.get("primary_diagnosis") in conditions:
+                diagnosis[conditions.index(admission["primary_diagnosis"])] = 1.0
+            row = [
+                (start - birth).days / 365.25,
+                1.0 if patient.get("gender") == "Male" else 0.0,
+                (insurance.get("coverage_percentage") or 0) / 100,
+                len(patient.get("medical_history") or []),
+                len(patient.get("allergies") or []),
+                (discharge - start).total_seconds() / 86400,
+                math.log1p(admission.get("total_cost") or 0.0),
+                len(prior),
+                min(max(since, 0.0), LOOKBACK_DAYS),
+                0.0 if last_discharge else 1.0,
+                len(recent_tests),
+                sum(_is_abnormal(test) for test in recent_tests),
+                len(recent_prescriptions),
+                sum(len(prescription.get("medications") or []) for prescription in recent_prescriptions),
+                math.log1p(sum(prescription.get("total_cost") or 0.0 for prescription in recent_prescriptions)),
+            ]
+            row += insurance_flags
+            row += [1.0 if admission.get("admission_type") == name else 0.0 for name in ADMISSION_TYPES]
+            row += history + diagnosis
+            # Readmitted: a later admission starts within the window after discharge
+            readmitted = any(discharge <= admitted[j] < discharge + window for j in range(i + 1, len(admissions)))
+            rows.append(row)
+            labels.append(1 if readmitted else 0)
+        if discharge is not None and (last_discharge is None or discharge > last_discharge):
+            last_discharge = discharge
+    return rows, labels
+
+# --- Sorted Join ---
+def sort_inputs(data_dir, sorted_dir, memory_mb=MEMORY_MB):
+    """Sort the joined entities by patient_id#timestamp with bounded memory"""
+    return {entity: chuk_rowkey.export_entity(entity, data_dir, sorted_dir, "forward", memory_mb)
+            for entity in JOINED_ENTITIES}
+
+def _iter_groups(entity_dir, parts):
+    """(patient_id, records) per patient from a row-key sorted entity"""
+    patient, records = None, []
+    for part in parts:
+        with open(os.path.join(entity_dir, part), "rb") as f:
+            for line in f:
+                key = chuk_rowkey.line_key(line)
+                current = key[:key.index(b"#")]
+                if current != patient:
+                    if records:
+                        yield patient, records
+                    patient, records = current, []
+                records.append(json.loads(line)["record"])
+    if records:
+        yield patient, records
+
+class _GroupCursor:
+    """Walks one sorted entity forward to the group of a requested patient"""
+
+    def __init__(self, groups):
+        self.groups = groups
+        self.current = next(groups, None)
+
+    def take(self, patient):
+        while self.current is not None and self.current[0] < patient:
+            self.current = next(self.groups, None)
+        if self.current is not None and self.current[0] == patient:
+            records = self.current[1]
+            self.current = next(self.groups, None)
+            return records
+        return []
+
+def iter_patient_histories(sorted_dir, manifest):
+    """(patient, admissions, tests, prescriptions) per patient, merge-joined by patient_id"""
+    cursors = {entity: _GroupCursor(_iter_groups(os.path.join(sorted_dir, entity), manifest[entity]["parts"]))
+               for entity in JOINED_ENTITIES[1:]}
+    for patient_id, records in _iter_groups(os.path.join(sorted_dir, "patients"), manifest["patients"]["parts"]):
+        yield (records[0], cursors["admissions"].take(patient_id), cursors["laboratory_tests"].take(patient_id),
+               cursors["prescriptions"].take(patient_id))
+
+# --- Feature Chunks ---
+def is_holdout(patient_id, holdout=HOLDOUT):
+    """Stable per-patient split, so no patient is on both sides"""
+    return zlib.crc32(patient_id.encode("ascii")) % 10000 < holdout * 10000
+
+class FeatureChunkWriter:
+    """Buffers feature rows and writes them as fixed-size features/labels/holdout .npy chunks"""
+
+    def __init__(self, out_dir, chunk_rows=CHUNK_ROWS):
+        self.out_dir = out_dir
+        self.chunk_rows = chunk_rows
+        self.chunks = []
+        self.rows = 0
+        self.positives = 0
+        self.holdout_rows = 0
+        self.sums = np.zeros(len(FEATURE_NAMES))
+        self.squares = np.zeros(len(FEATURE_NAMES))
+        self._rows, self._labels, self._holdout = [], [], []
+
+    def add(self, rows, labels, holdout):
+        self._rows.extend(rows)
+        self._labels.extend(labels)
+        self._holdout.extend([holdout] * len(rows))
+        if len(self._rows) >= self.chunk_rows:
+            self.flush()
+
+    def flush(self):
+        if not self._rows:
+            return
+        features = np.array(self._rows, dtype=np.float32)
+        labels = np.array(self._labels, dtype=np.int8)
+        holdout = np.array(self._holdout, dtype=bool)
+        # Standardization uses the training rows only
+        train = features[~holdout].astype(np.float64)
+        self.sums += train.sum(axis=0)
+        self.squares += (train ** 2).sum(axis=0)
+        name = f"chunk_{len(self.chunks):05d}"
+        np.save(os.path.join(self.out_dir, f"{name}_features.npy"), features)
+        np.save(os.path.join(self.out_dir, f"{name}_labels.npy"), labels)
+        np.save(os.path.join(self.out_dir, f"{name}_holdout.npy"), holdout)
+        self.chunks.append(name)
+        self.rows += len(labels)
+        self.positives += int(labels.sum())
+        self.holdout_rows += int(holdout.sum())
+        self._rows, self._labels, self._holdout = [], [], []
+
+    def manifest(self):
+        train_rows = max(self.rows - self.holdout_rows, 1)
+        mean = self.sums / train_rows
+        std = np.sqrt(np.maximum(self.squares / train_rows - mean ** 2, 0))
+        return {"feature_names": FEATURE_NAMES, "chunks": self.chunks, "rows": self.rows,
+                "positives": self.positives, "holdout_rows": self.holdout_rows,
+                "mean": mean.tolist(), "std": np.where(std > 0, std, 1.0).tolist()}
+
+def build_features(data_dir=".", work_dir=None, memory_mb=MEMORY_MB, chunk_rows=CHUNK_ROWS,
+                   holdout=HOLDOUT, window_days=READMISSION_DAYS):
+    """Sort, join and featurize a dataset into work_dir; returns the feature manifest"""
+    work_dir = work_dir or os.path.join(data_dir, TRAINING_DIR)
+    sorted_dir = os.path.join(work_dir, "sorted")
+    feature_dir = os.path.join(work_dir, "features")
+    for path in (sorted_dir, feature_dir):
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        os.makedirs(path)
+    _, observation_end = chuk_append.data_window(chuk_append.load_summary(data_dir))
+
+    started = time.perf_counter()
+    sorted_manifest = sort_inputs(data_dir, sorted_dir, memory_mb)
+    sorted_seconds = time.perf_counter() - started
+    print(f"Sorted {sum(entry['records'] for entry in sorted_manifest.values()):,} records by patient "
+          f"in {sorted_seconds:.1f}s")
+
+    started = time.perf_counter()
+    writer = FeatureChunkWriter(feature_dir, chunk_rows)
+    patients = 0
+    for patient, admissions, tests, prescriptions in iter_patient_histories(sorted_dir, sorted_manifest):
+        rows, labels = admission_features(patient, admissions, tests, prescriptions, observation_end, window_days)
+        writer.add(rows, labels, is_holdout(patient["patient_id"], holdout))
+        patients += 1
+    writer.flush()
+    shutil.rmtree(sorted_dir)
+    manifest = writer.manifest()
+    manifest.update(patients=patients, window_days=window_days, observation_end=observation_end.isoformat(),
+                    feature_seconds=round(time.perf_counter() - started, 3), sort_seconds=round(sorted_seconds, 3))
+    with open(os.path.join(work_dir, FEATURES_FILE), "w") as f:
+        json.dump(manifest, f, indent=2)
+    print(f"Built {manifest['rows']:,} feature rows ({manifest['positives']:,} readmitted) from {patients:,} "
+          f"patients in {manifest['feature_seconds']:.1f}s")
+    return manifest
+
+def load_chunk(feature_dir, name):
+    return (np.load(os.path.join(feature_dir, f"{name}_features.npy")),
+            np.load(os.path.join(feature_dir, f"{name}_labels.npy")),
+            np.load(os.path.join(feature_dir, f"{name}_holdout.npy")))
+
+def iter_batches(feature_dir, chunks, batch_size=BATCH_SIZE, holdout=False, rng=None):
+    """Mini-batches (features, labels) of the training or holdout rows, one chunk in memory at a time.
+
+    With rng, chunks and the rows inside each chunk are shuffled. Rows left
+    over at the end of a chunk are carried into the next, so every batch but
+    the last has batch_size rows.
+    """
+    order = list(chunks)
+    if rng is not None:
+        order = [order[i] for i in rng.permutation(len(order))]
+    carry_x, carry_y = None, None
+    for name in order:
+        features, labels, split = load_chunk(feature_dir, name)
+        rows = np.flatnonzero(split == holdout)
+        if rng is not None:
+            rng.shuffle(rows)
+        x, y = features[rows], labels[rows]
+        if carry_x is not None:
+            x, y = np.concatenate([carry_x, x]), np.concatenate([carry_y, y])
+        full = len(y) - len(y) % batch_size
+        for start in range(0, full, batch_size):
+            yield x[start:start + batch_size], y[start:start + batch_size]
+        carry_x, carry_y = x[full:], y[full:]
+    if carry_y is not None and len(carry_y):
+        yield carry_x, carry_y
+
+# --- Model ---
+class LogisticRegression:
+    """Logistic regression on standardized features, fitted with mini-batch Adam"""
+
+    def __init__(self, mean, std, learning_rate=LEARNING_RATE, l2=L2, feature_names=FEATURE_NAMES):
+        self.mean = np.asarray(mean, dtype=np.float32)
+        self.std = np.asarray(std, dtype=np.float32)
+        self.feature_names = list(feature_names)
+        self.weights = np.zeros(len(self.mean))
+        self.bias = 0.0
+        self.learning_rate = learning_rate
+        self.l2 = l2
+        self._moments = [np.zeros(len(self.mean) + 1), np.zeros(len(self.mean) + 1)]
+        self._steps = 0
+
+    def _standardize(self, features):
+        return (features - self.mean) / self.std
+
+    def predict_proba(self, features):
+        logits = self._standardize(features) @ self.weights + self.bias
+        return 1 / (1 + np.exp(-np.clip(logits, -30, 30)))
+
+    def step(self, features, labels):
+        """One Adam update on a mini-batch; returns its summed log loss"""
+        x = self._standardize(features)
+        p = 1 / (1 + np.exp(-np.clip(x @ self.weights + self.bias, -30, 30)))
+        error = p - labels
+        gradient = np.append(x.T @ error / len(labels) + self.l2 * self.weights, error.mean())
+        self._steps += 1
+        first, second = self._moments
+        first *= 0.9
+        first += 0.1 * gradient
+        second *= 0.999
+        second += 0.001 * gradient ** 2
+        update = (self.learning_rate * (first / (1 - 0.9 ** self._steps))
+                  / (np.sqrt(second / (1 - 0.999 ** self._steps)) + 1e-8))
+        self.weights -= update[:-1]
+        self.bias -= update[-1]
+        return log_loss(p, labels) * len(labels)
+
+    def to_dict(self):
+        return {"model": "logistic_regression", "feature_names": self.feature_names,
+                "weights": self.weights.tolist(), "bias": self.bias,
+                "mean": self.mean.tolist(), "std": self.std.tolist()}
+
+    @classmethod
+    def from_dict(cls, data):
+        model = cls(data["mean"], data["std"], feature_names=data["feature_names"])
+        model.weights = np.array(data["weights"])
+        model.bias = data["bias"]
+        return model
+
+def load_model(path):
+    with open(path) as f:
+        return LogisticRegression.from_dict(json.load(f))
+
+def log_loss(p, labels):
+    p = np.clip(p, 1e-7, 1 - 1e-7)
+    return float(-np.mean(labels * np.log(p) + (1 - labels) * np.log(1 - p)))
+
+def evaluate(model, batches, bins=AUC_BINS):
+    """Log loss and AUC from per-class score histograms, in constant memory"""
+    positives, negatives = np.zeros(bins), np.zeros(bins)
+    loss, rows = 0.0, 0
+    for features, labels in batches:
+        p = model.predict_proba(features)
+        loss += log_loss(p, labels) * len(labels)
+        rows += len(labels)
+        bucket = np.minimum((p * bins).astype(np.int64), bins - 1)
+        positives += np.bincount(bucket[labels == 1], minlength=bins)
+        negatives += np.bincount(bucket[labels == 0], minlength=bins)
+    pairs = positives.sum() * negatives.sum()
+    # Positives outrank the negatives in lower buckets; ties within a bucket count half
+    below = np.concatenate([[0], np.cumsum(negatives)[:-1]])
+    auc = float((positives * (below + negatives / 2)).sum() / pairs) if pairs else float("nan")
+    return {"rows": rows, "log_loss": round(loss / rows, 5) if rows else float("nan"), "auc": round(auc, 4)}
+
+def train(work_dir, epochs=EPOCHS, batch_size=BATCH_SIZE, learning_rate=LEARNING_RATE, l2=L2, seed=42):
+    """Fit the model over the feature chunks; returns (model, per-epoch reports)"""
+    with open(os.path.join(work_dir, FEATURES_FILE)) as f:
+        manifest = json.load(f)
+    feature_dir = os.path.join(work_dir, "features")
+    model = LogisticRegression(manifest["mean"], manifest["std"], learning_rate, l2)
+    rng = np.random.RandomState(seed)
+    reports = []
+    for epoch in range(1, epochs + 1):
+        started = time.perf_counter()
+        loss, rows = 0.0, 0
+        for features, labels in iter_batches(feature_dir, manifest["chunks"], batch_size, rng=rng):
+            loss += model.step(features, labels)
+            rows += len(labels)
+        elapsed = time.perf_counter() - started
+        holdout = evaluate(model, iter_batches(feature_dir, manifest["chunks"], batch_size, holdout=True))
+        report = {"epoch": epoch, "rows": rows, "seconds": round(elapsed, 3),
+                  "rows_per_second": round(rows / elapsed, 1) if elapsed > 0 else 0.0,
+                  "train_log_loss": round(loss / rows, 5) if rows else float("nan"),
+                  "holdout_log_loss": holdout["log_loss"], "holdout_auc": holdout["auc"]}
+        reports.append(report)
+        print(f"epoch {epoch}: {rows:,} rows in {elapsed:.2f}s ({report['rows_per_second']:,.0f} rows/s), "
+              f"train loss {report['train_log_loss']:.4f}, holdout loss {holdout['log_loss']:.4f}, "
+              f"AUC {holdout['auc']:.3f}")
+    return model, reports
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train a readmission-risk model out of core on a CHUK dataset")
+    parser.add_argument("--data-dir", default=".", help="directory holding the generated dataset")
+    parser.add_argument("--work-dir", default=None, help=f"features and model (default: <data-dir>/{TRAINING_DIR})")
+    parser.add_argument("--epochs", type=int, default=EPOCHS)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--learning-rate", type=float, default=LEARNING_RATE)
+    parser.add_argument("--l2", type=float, default=L2, help="L2 penalty on the weights")
+    parser.add_argument("--window-days", type=int, default=READMISSION_DAYS, help="readmission window (default: 30)")
+    parser.add_argument("--holdout", type=float, default=HOLDOUT, help="share of patients held out (default: 0.2)")
+    parser.add_argument("--memory-mb", type=int, default=MEMORY_MB, help="external sort buffer (default: 64)")
+    parser.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS, help="feature rows per chunk file")
+    parser.add_argument("--reuse-features", action="store_true", help="train on the features of an earlier run")
+    parser.add_argument("--seed", type=int, default=42, help="shuffling seed")
+    args = parser.parse_args()
+    work_dir = args.work_dir or os.path.join(args.data_dir, TRAINING_DIR)
+
+    if not (args.reuse_features and os.path.exists(os.path.join(work_dir, FEATURES_FILE))):
+        build_features(args.data_dir, work_dir, args.memory_mb, args.chunk_rows, args.holdout, args.window_days)
+    model, reports = train(work_dir, args.epochs, args.batch_size, args.learning_rate, args.l2, args.seed)
+    with open(os.path.join(work_dir, MODEL_FILE), "w") as f:
+        json.dump({**model.to_dict(), "epochs": reports}, f, indent=2)
+    print(f"Model written to {os.path.join(work_dir, MODEL_FILE)}")
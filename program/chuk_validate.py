@@ -0,0 +1,418 @@
+# chuk_validate.py
+# Single-pass streaming referential-integrity validator for a generated dataset.
+#
+# Every entity is streamed once, in dependency order, in batches of
+# BATCH_RECORDS records, and checked with vectorized passes:
+#   - key_format:  keys match their CHUK_XXX_<hex> (or DEPT_000) format
+#   - primary_key: primary keys (and equipment serial numbers) are unique
+#                  across all chunk files
+#   - foreign_key: patient_id, doctor_id, ordered_by, department_id,
+#                  head_doctor and the journey cross-references point at
+#                  existing records; head_doctor must not be null
+#   - date_order:  e.g. discharge after admission, sample collection after
+#                  ordering and result after sample collection
+#   - date_window: time-series events fall inside the summary's
+#                  [start_date, watermark] window
+#
+# Keys are stored as integers: the fixed-width hex digits of an ID, or the
+# zero-padded decimal counter of a department or equipment ID (which grows
+# past its padding in large datasets), are its code, so no seed is needed and a code turns back into the ID for
+# the report. KeySet is an open-addressing hash set over a flat int64 array,
+# inserted into and probed a whole batch at a time, at about 16 bytes per
+# key. A foreign key whose target entity has not been streamed yet (a
+# department's head_doctor, a readmission's earlier admission) is kept as
+# int64 codes and checked once the target set is complete.
+#
+# The report, with violation counts, examples and per-check timings, is
+# written to chuk_validation.json; the exit status is 1 if anything failed.
+#
+#   python chuk_validate.py --data-dir out
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+import chuk_append
+import chuk_bench
+import chuk_ids
+import chuk_io
+from chuk_index import PRIMARY_KEYS
+from chuk_replay import TIMESTAMP_FIELDS
+
+REPORT_FILE = "chuk_validation.json"
+BATCH_RECORDS = 10000
+EXAMPLES = 5
+EMPTY = -1  # free KeySet slot; codes are never negative
+
+# Entities in the order they are streamed, so most references resolve at once
+ENTITIES = ["departments", "doctors", "nurses", "patients", "medical_equipment", "appointments",
+            "medical_records", "admissions", "laboratory_tests", "prescriptions", "billing_records"]
+
+# Key format -> (prefix, digits); the digits, read as hex, are the key's code
+# Decimal key format -> (prefix, minimum digits), e.g. DEPT_007, CHUK_EQ_10004
+DECIMAL_FORMATS = {
+    "departments": ("DEPT_", 3),
+    "medical_equipment": ("CHUK_EQ_", 4),
+}
+MAX_DECIMAL_DIGITS = 18  # codes stay within int64
+KEY_FORMATS = {**chuk_ids.ID_FORMATS, **DECIMAL_FORMATS}
+
+# (field, key format) pairs that must be unique within an entity
+UNIQUE_KEYS = {entity: [(field, entity)] for entity, field in PRIMARY_KEYS.items()}
+UNIQUE_KEYS["medical_equipment"].append(("serial_number", "equipment_serials"))
+
+# entity -> [(field, target entity, nullable)]
+FOREIGN_KEYS = {
+    "departments": [("head_doctor", "doctors", False)],
+    "doctors": [("department_id", "departments", False)],
+    "nurses": [("department_id", "departments", False)],
+    "medical_equipment": [("department_id", "departments", False)],
+    "appointments": [("patient_id", "patients", False), ("doctor_id", "doctors", False),
+                     ("department_id", "departments", False)],
+    "medical_records": [("patient_id", "patients", False), ("doctor_id", "doctors", False),
+                        ("appointment_id", "appointments", True)],
+    "admissions": [("patient_id", "patients", False), ("admitting_doctor_id", "doctors", False),
+                   ("department_id", "departments", False), ("record_id", "medical_records", True),
+                   ("readmission_of", "admissions", True),
+                   ("transferred_from_department_id", "departments", True)],
+    "laboratory_tests": [("patient_id", "patients", False), ("ordered_by", "doctors", False),
+                         ("record_id", "medical_records", True)],
+    "prescriptions": [("patient_id", "patients", False), ("doctor_id", "doctors", False),
+                      ("record_id", "medical_records", True)],
+    "billing_records": [("patient_id", "patients", False), ("record_id", "medical_records", True),
+                        ("admission_id", "admissions", True)],
+}
+
+# entity -> [(earlier field, later field)]; a null later field is not a violation
+DATE_ORDER = {
+    "patients": [("date_of_birth", "registration_date")],
+    "medical_equipment": [("purchase_date", "warranty_expiry"), ("purchase_date", "last_maintenance")],
+    "admissions": [("admission_date", "discharge_date")],
+    "laboratory_tests": [("test_date", "sample_collected_date"), ("sample_collected_date", "result_date")],
+    "billing_records": [("billing_date", "due_date")],
+}
+
+# --- Key Sets ---
+class KeySet:
+    """Open-addressing (linear probing) hash set of non-negative int64 codes.
+
+    add() and contains() work on whole arrays: every pending key probes one
+    slot per round, so a batch costs a few NumPy passes instead of a Python
+    call per key. The table stays at most half full.
+    """
+
+    def __init__(self, capacity=1024):
+        self._allocate(capacity)
+
+    def _allocate(self, capacity):
+        self.bits = max(10, int(2 * capacity - 1).bit_length())
+        self.table = np.full(1 << self.bits, EMPTY, dtype=np.int64)
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    @property
+    def nbytes(self):
+        return self.table.nbytes
+
+    def _slots(self, keys):
+        # Fibonacci hashing: the top bits of key * 2**64 / golden ratio
+        mixed = keys.astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+        return (mixed >> np.uint64(64 - self.bits)).astype(np.int64)
+
+    def _insert(self, keys):
+        """Insert distinct keys; returns which of them were already present"""
+        present = np.zeros(len(keys), dtype=bool)
+        pending = np.arange(len(keys))
+        slots = self._slots(keys)
+        mask = len(self.table) - 1
+        while len(pending):
+            current = self.table[slots]
+            found = current == keys[pending]
+            present[pending[found]] = True
+            empty = current == EMPTY
+            # Keys racing for one free slot: the last write wins, the rest probe on
+            self.table[slots[empty]] = keys[pending[empty]]
+            won = empty & (self.table[slots] == keys[pending])
+            self.count += int(won.sum())
+            unresolved = ~(found | won)
+            pending = pending[unresolved]
+            slots = (slots[unresolved] + 1) & mask
+        return present
+
+    def add(self, keys):
+        """Insert codes; returns a mask of those already in the set or earlier in the batch"""
+        keys = np.asarray(keys, dtype=np.int64)
+        unique, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        if 2 * (self.count + len(unique)) > len(self.table):
+            old = self.table[self.table != EMPTY]
+            self._allocate(max(2 * self.count, self.count + len(unique)))
+            self._insert(old)
+        duplicate = np.ones(len(keys), dtype=bool)
+        duplicate[first] = False
+        return duplicate | self._insert(unique)[inverse]
+
+    def contains(self, keys):
+        keys = np.asarray(keys, dtype=np.int64)
+        result = np.zeros(len(keys), dtype=bool)
+        pending = np.arange(len(keys))
+        slots = self._slots(keys)
+        mask = len(self.table) - 1
+        while len(pending):
+            current = self.table[slots]
+            found = current == keys[pending]
+            result[pending[found]] = True
+            unresolved = ~found & (current != EMPTY)
+            pending = pending[unresolved]
+            slots = (slots[unresolved] + 1) & mask
+        return result
+
+# --- Encoding ---
+def encode_keys(key_format, values):
+    """(codes, malformed) of non-null string keys; malformed keys get code -1"""
+    if key_format in DECIMAL_FORMATS:
+        return _encode_decimal(key_format, values)
+    prefix, width = KEY_FORMATS[key_format]
+    size = len(prefix) + width
+    strings = np.array([value if isinstance(value, str) else "" for value in values], dtype=f"U{size + 1}")
+    ok = (np.char.str_len(strings) == size) & np.char.startswith(strings, prefix)
+    points = strings.astype(f"U{size}").view(np.uint32).reshape(len(strings), size)[:, len(prefix):]
+    is_digit = (points >= ord("0")) & (points <= ord("9"))
+    is_hex = (points >= ord("A")) & (points <= ord("F"))
+    ok &= (is_digit | is_hex).all(axis=1)
+    nibbles = np.where(is_hex, points - (ord("A") - 10), points - ord("0")).astype(np.int64)
+    shifts = np.arange(width - 1, -1, -1, dtype=np.int64) * 4
+    codes = np.bitwise_or.reduce(np.where(ok[:, None], nibbles, 0) << shifts, axis=1)
+    return np.where(ok, codes, -1), ~ok
+
+def _encode_decimal(key_format, values):
+    """encode_keys for zero-padded decimal keys of any length from the minimum width up"""
+    prefix, width = DECIMAL_FORMATS[key_format]
+    strings = np.array([value if isinstance(value, str) else "" for value in values], dtype=str)
+    size = max(strings.dtype.itemsize // 4, len(prefix) + width)
+    digits = np.char.str_len(strings) - len(prefix)
+    ok = (digits >= width) & (digits <= MAX_DECIMAL_DIGITS) & np.char.startswith(strings, prefix)
+    points = strings.astype(f"U{size}").view(np.uint32).reshape(len(strings), size)[:, len(prefix):]
+    positions = np.arange(size - len(prefix))
+    in_key = positions < digits[:, None]
+    ok &= (((points >= ord("0")) & (points <= ord("9"))) | ~in_key).all(axis=1)
+    ok &= (digits == width) | (points[:, 0] != ord("0"))  # one spelling per code
+    exponents = np.clip(digits[:, None] - 1 - positions, 0, None)
+    terms = np.where(in_key & ok[:, None], points.astype(np.int64) - ord("0"), 0) * 10 ** exponents
+    codes = terms.sum(axis=1)
+    return np.where(ok, codes, -1), ~ok
+
+def decode_keys(key_format, codes):
+    if key_format in DECIMAL_FORMATS:
+        prefix, width = DECIMAL_FORMATS[key_format]
+        return [f"{prefix}{int(code):0{width}d}" for code in codes]
+    prefix, width = KEY_FORMATS[key_format]
+    return chuk_ids.format_ids(prefix, width, np.asarray(codes, dtype=np.uint64)).tolist()
+
+def _datetimes(values):
+    """(datetime64[us] array, unparseable mask); nulls become NaT"""
+    try:
+        return np.array(values, dtype="datetime64[us]"), np.zeros(len(values), dtype=bool)
+    except ValueError:
+        parsed, bad = [], []
+        for value in values:
+            try:
+                parsed.append(np.datetime64(value, "us"))
+                bad.append(False)
+            except ValueError:
+                parsed.append(np.datetime64("NaT"))
+                bad.append(True)
+        return np.array(parsed, dtype="datetime64[us]"), np.array(bad, dtype=bool)
+
+# --- Validation ---
+class _LazyExamples:
+    """Examples built only for the rows that are reported"""
+
+    def __init__(self, function):
+        self.function = function
+
+    def __getitem__(self, row):
+        return self.function(row)
+
+class Validator:
+    """Streams a dataset once and collects violations and per-check timings"""
+
+    def __init__(self, data_dir=".", batch_records=BATCH_RECORDS, examples=EXAMPLES):
+        self.data_dir = data_dir
+        self.batch_records = batch_records
+        self.examples = examples
+        self.keys = {}  # key format -> KeySet
+        self.done = set()
+        self.deferred = []  # (entity, field, target, codes, codes of the referencing records)
+        self.results = {}
+        self.timings = dict.fromkeys(["read", "key_format", "primary_key", "foreign_key",
+                                      "date_order", "date_window"], 0.0)
+        self.records = {}
+        self.window = None
+        try:
+            start, watermark = chuk_append.data_window(chuk_append.load_summary(data_dir))
+            self.window = (np.datetime64(start, "us"), np.datetime64(watermark, "us"))
+        except FileNotFoundError:
+            pass
+
+    def _result(self, check, entity, field):
+        key = (check, entity, field)
+        if key not in self.results:
+            self.results[key] = {"check": check, "entity": entity, "field": field,
+                                 "checked": 0, "violations": 0, "examples": []}
+        return self.results[key]
+
+    def _report(self, check, entity, field, checked, bad, examples):
+        """Count checked values and violations, keeping the first examples (indexed by row)"""
+        result = self._result(check, entity, field)
+        result["checked"] += checked
+        count = int(np.count_nonzero(bad))
+        result["violations"] += count
+        room = self.examples - len(result["examples"])
+        if count and room > 0:
+            rows = np.flatnonzero(bad)[:room]
+            result["examples"] += [examples[int(row)] for row in rows]
+
+    def _batches(self, entity):
+        records = chuk_io.iter_entity(entity, self.data_dir)
+        while True:
+            started = time.perf_counter()
+            batch = list(itertools.islice(records, self.batch_records))
+            self.timings["read"] += time.perf_counter() - started
+            if not batch:
+                return
+            yield batch
+
+    def _check_batch(self, entity, batch):
+        ids = [record.get(PRIMARY_KEYS[entity]) for record in batch]
+        started = time.perf_counter()
+        for field, key_format in UNIQUE_KEYS[entity]:
+            values = [record.get(field) for record in batch]
+            codes, malformed = encode_keys(key_format, values)
+            if field == PRIMARY_KEYS[entity]:
+                id_codes = codes
+            self._report("key_format", entity, field, len(values), malformed, values)
+            self.timings["key_format"] += time.perf_counter() - started
+            started = time.perf_counter()
+            keys = self.keys.setdefault(key_format, KeySet(len(values)))
+            duplicate = np.zeros(len(values), dtype=bool)
+            duplicate[~malformed] = keys.add(codes[~malformed])
+            self._report("primary_key", entity, field, len(values), duplicate, values)
+            self.timings["primary_key"] += time.perf_counter() - started
+            started = time.perf_counter()
+
+        for field, target, nullable in FOREIGN_KEYS.get(entity, []):
+            values = [record.get(field) for record in batch]
+            present = np.array([value is not None for value in values], dtype=bool)
+            # Journey cross-references only exist in --journeys datasets
+            if nullable and not present.any():
+                continue
+            codes, malformed = encode_keys(target, values)
+            malformed &= present
+            self._report("key_format", entity, field, int(present.sum()), malformed, values)
+            self.timings["key_format"] += time.perf_counter() - started
+            started = time.perf_counter()
+            if not nullable:
+                self._report("foreign_key", entity, field, int((~present).sum()), ~present,
+                             [f"{key}: null" for key in ids])
+            valid = present & ~malformed
+            if target in self.done:
+                missing = np.zeros(len(values), dtype=bool)
+                missing[valid] = ~self.keys[target].contains(codes[valid])
+                self._report("foreign_key", entity, field, int(valid.sum()), missing,
+                             [f"{key} -> {value}" for key, value in zip(ids, values)])
+            else:
+                self.deferred.append((entity, field, target, codes[valid], id_codes[valid]))
+            self.timings["foreign_key"] += time.perf_counter() - started
+            started = time.perf_counter()
+
+        for earlier, later in DATE_ORDER.get(entity, []):
+            first, bad_first = _datetimes([record.get(earlier) for record in batch])
+            second, bad_second = _datetimes([record.get(later) for record in batch])
+            backwards = ~np.isnat(first) & ~np.isnat(second) & (second < first)
+            self._report("date_order", entity, f"{earlier}<={later}", len(batch), backwards | bad_first | bad_second,
+                         [f"{key}: {record.get(earlier)} > {record.get(later)}" for key, record in zip(ids, batch)])
+        self.timings["date_order"] += time.perf_counter() - started
+
+        started = time.perf_counter()
+        if self.window is not None and entity in TIMESTAMP_FIELDS:
+            field = TIMESTAMP_FIELDS[entity]
+            stamps, unparseable = _datetimes([record.get(field) for record in batch])
+            outside = unparseable | np.isnat(stamps) | (stamps < self.window[0]) | (stamps > self.window[1])
+            self._report("date_window", entity, field, len(batch), outside,
+                         [f"{key}: {record.get(field)}" for key, record in zip(ids, batch)])
+        self.timings["date_window"] += time.perf_counter() - started
+
+    def _check_deferred(self):
+        started = time.perf_counter()
+        for entity, field, target, codes, sources in self.deferred:
+            missing = ~self.keys[target].contains(codes)
+            self._report("foreign_key", entity, field, len(codes), missing, _LazyExamples(
+                lambda row, entity=entity, target=target, codes=codes, sources=sources:
+                f"{decode_keys(entity, sources[row:row + 1])[0]} -> {decode_keys(target, codes[row:row + 1])[0]}"))
+        self.deferred = []
+        self.timings["foreign_key"] += time.perf_counter() - started
+
+    def run(self, progress=None):
+        started = time.perf_counter()
+        for entity in ENTITIES:
+            entity_started = time.perf_counter()
+            count = 0
+            for batch in self._batches(entity):
+                self._check_batch(entity, batch)
+                count += len(batch)
+            self.records[entity] = count
+            self.done.add(entity)
+            if progress:
+                elapsed = time.perf_counter() - entity_started
+                progress(f"- {entity}: {count:,} records in {elapsed:.2f}s "
+                         f"({count / max(elapsed, 1e-9):,.0f} records/s)")
+        self._check_deferred()
+        checks = sorted(self.results.values(), key=lambda result: (result["check"], ENTITIES.index(result["entity"])))
+        return {
+            "data_dir": os.path.abspath(self.data_dir),
+            "records": self.records,
+            "seconds": round(time.perf_counter() - started, 3),
+            "violations": sum(result["violations"] for result in checks),
+            "timings": {name: round(seconds, 3) for name, seconds in self.timings.items()},
+            "key_set_mb": round(sum(keys.nbytes for keys in self.keys.values()) / 1e6, 2),
+            "peak_rss_mb": chuk_bench.peak_rss_mb(),
+            "checks": checks,
+        }
+
+def validate(data_dir=".", batch_records=BATCH_RECORDS, examples=EXAMPLES, progress=None):
+    """Validate a dataset; returns the report"""
+    return Validator(data_dir, batch_records, examples).run(progress)
+
+def print_report(report):
+    failed = [result for result in report["checks"] if result["violations"]]
+    print(f"{sum(report['records'].values()):,} records checked in {report['seconds']:.1f}s "
+          f"(key sets {report['key_set_mb']:.1f} MB, peak RSS {report['peak_rss_mb']:.0f} MB)")
+    print("Timings: " + ", ".join(f"{name} {seconds:.2f}s" for name, seconds in report["timings"].items()))
+    for result in report["checks"]:
+        status = "FAIL" if result["violations"] else "ok"
+        print(f"  {status:4} {result['check']:12} {result['entity']}.{result['field']}: "
+              f"{result['violations']:,} of {result['checked']:,}")
+        for example in result["examples"]:
+            print(f"         e.g. {example}")
+    print(f"{report['violations']:,} violations in {len(failed)} check(s)" if failed else "No violations")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check keys, references and date ordering of a CHUK dataset")
+    parser.add_argument("--data-dir", default=".", help="directory holding the chuk_* chunk files")
+    parser.add_argument("--report", default=None, help=f"report path (default: <data-dir>/{REPORT_FILE})")
+    parser.add_argument("--batch-records", type=int, default=BATCH_RECORDS, help="records checked per batch")
+    parser.add_argument("--examples", type=int, default=EXAMPLES, help="example violations kept per check")
+    args = parser.parse_args()
+    report = validate(args.data_dir, args.batch_records, args.examples, progress=print)
+    print_report(report)
+    path = args.report or os.path.join(args.data_dir, REPORT_FILE)
+    with open(path, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Report written to {path}")
+    sys.exit(1 if report["violations"] else 0)
@@ -0,0 +1,53 @@
+# chuk_vocab.py
+# Shared vocabularies for the CHUK dataset generator. Both the per-record
+# loops in dataset-CHUK.py and the vectorized batch generator draw from these
+# lists, so the two modes produce the same value domains.
+
+def get_medical_specialties():
+    return ['Cardiology', 'Neurology', 'Oncology', 'Pediatrics', 'Obstetrics', 'Orthopedics',
+            'Dermatology', 'Emergency Medicine', 'Internal Medicine', 'Surgery', 'Radiology',
+            'Psychiatry', 'Anesthesiology', 'Pathology', 'Family Medicine', 'Infectious Disease',
+            'Gastroenterology', 'Endocrinology', 'Nephrology', 'Pulmonology']
+
+def get_medical_conditions():
+    return ['Hypertension', 'Diabetes Type 2', 'Malaria', 'Tuberculosis', 'HIV/AIDS',
+            'Pneumonia', 'Gastritis', 'Anemia', 'Arthritis', 'Asthma', 'Hepatitis B',
+            'Typhoid', 'Urinary Tract Infection', 'Respiratory Infection', 'Skin Disease',
+            'Heart Disease', 'Stroke', 'Cancer', 'Kidney Disease', 'Mental Health Disorder']
+
+def get_lab_tests():
+    return ['Complete Blood Count', 'Blood Glucose', 'Liver Function Test', 'Kidney Function Test',
+            'Lipid Profile', 'Thyroid Function', 'HIV Test', 'Hepatitis Panel', 'Malaria Test',
+            'Tuberculosis Test', 'Urinalysis', 'Stool Analysis', 'Chest X-Ray', 'ECG',
+            'Ultrasound', 'CT Scan', 'MRI', 'Blood Culture', 'Pregnancy Test', 'PSA Test']
+
+def get_medications():
+    return ['Paracetamol', 'Amoxicillin', 'Ciprofloxacin', 'Metformin', 'Amlodipine',
+            'Atenolol', 'Omeprazole', 'Ibuprofen', 'Aspirin', 'Cotrimoxazole',
+            'Artemether-Lumefantrine', 'Efavirenz', 'Tenofovir', 'Iron Tablets', 'Insulin',
+            'Salbutamol', 'Prednisolone', 'Fluconazole', 'Metronidazole', 'Doxycycline']
+
+# --- Time-Series Enumerations ---
+APPOINTMENT_TYPES = ["Consultation", "Follow-up", "Emergency", "Surgery", "Routine Check"]
+APPOINTMENT_STATUSES = ["Scheduled", "Completed", "Cancelled", "No-Show"]
+APPOINTMENT_COMPLAINTS = ["Chest pain", "Headache", "Fever", "Cough", "Abdominal pain",
+                          "Back pain", "Fatigue", "Shortness of breath"]
+APPOINTMENT_PRIORITIES = ["Low", "Medium", "High", "Critical"]
+
+ADMISSION_TYPES = ["Emergency", "Elective", "Transfer", "Observation"]
+DISCHARGE_REASONS = ["Improved", "Transferred", "Against Medical Advice", "Deceased"]
+
+VISIT_TYPES = ["Consultation", "Follow-up", "Emergency", "Routine"]
+VISIT_COMPLAINTS = ["Fever", "Pain", "Cough", "Fatigue", "Nausea"]
+
+HIV_RESULTS = ["Negative", "Positive", "Indeterminate"]
+GENERIC_RESULTS = ["Normal", "Abnormal", "Borderline"]
+LAB_STATUSES = ["Completed", "Pending", "In Progress"]
+
+DOSAGES = ["250mg", "500mg", "1g", "2.5mg", "5mg", "10mg"]
+FREQUENCIES = ["Once daily", "Twice daily", "Three times daily", "Four times daily", "As needed"]
+PRESCRIPTION_STATUSES = ["Active", "Completed", "Discontinued"]
+
+SERVICE_TYPES = ["Consultation", "Laboratory Test", "Medication", "Procedure", "Admission", "Surgery"]
+PAYMENT_STATUSES = ["Paid", "Pending", "Partial", "Overdue"]
+PAYMENT_METHODS = ["Cash", "Mobile Money", "Bank Transfer", "Insurance", "Credit"]
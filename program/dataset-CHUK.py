@@ -1,15 +1,35 @@
 # chuk_healthcare_dataset_generator.py
 import json
+import os
 import random
 import datetime
-import uuid
-import threading
+import time
+import argparse
+import itertools
 import numpy as np
-from faker import Faker
 
-fake = Faker('en_US')  # English locale only
+import chuk_append
+import chuk_batch
+import chuk_bench
+import chuk_ids
+import chuk_io
+import chuk_pools
+import chuk_tables
+from chuk_pools import random_datetime
+# The optional stages (chuk_beds, chuk_columnar, chuk_journeys, chuk_rollups,
+# chuk_rowkey, chuk_shards, chuk_slots, chuk_sqlite) are imported where they
+# run, and Faker only when a value pool is built, so small runs start quickly.
+from chuk_vocab import (
+    get_medical_specialties, get_medical_conditions, get_lab_tests, get_medications,
+    APPOINTMENT_TYPES, APPOINTMENT_STATUSES, APPOINTMENT_COMPLAINTS, APPOINTMENT_PRIORITIES,
+    ADMISSION_TYPES, DISCHARGE_REASONS, VISIT_TYPES, VISIT_COMPLAINTS,
+    HIV_RESULTS, GENERIC_RESULTS, LAB_STATUSES, DOSAGES, FREQUENCIES, PRESCRIPTION_STATUSES,
+    SERVICE_TYPES, PAYMENT_STATUSES, PAYMENT_METHODS,
+)
 
 # --- Configuration ---
+# Sizes at scale factor 1; --scale-factor multiplies them and per-entity
+# options override them.
 NUM_PATIENTS = 15000
 NUM_DOCTORS = 200
 NUM_NURSES = 500
@@ -24,40 +44,111 @@ NUM_PRESCRIPTIONS = 90000
 NUM_BILLING_RECORDS = 85000
 TIMESPAN_DAYS = 240  # January 2025 to August 2025
 MAX_ITERATIONS = (NUM_APPOINTMENTS + NUM_ADMISSIONS + NUM_MEDICAL_RECORDS) * 2
+GENERATION_MODE = "batch"  # "batch" (vectorized NumPy columns) or "records" (one dict at a time)
+CHUNK_SIZE = 50000  # records per output chunk
+CHUNK_BYTES = 64 * 1024 * 1024  # bytes per time-series chunk
+SEED = 42
+DEFAULT_START_DATE = datetime.datetime(2025, 1, 1)
+PROGRESS_INTERVAL = 5.0  # seconds between progress lines
+# Outputs of the derived stages (chuk_beds.BEDS_DIR/SUMMARY_FILE, ...) that
+# reruns refresh when a dataset already has them
+STAGE_MARKERS = {
+    "beds": ("chuk_beds", "summary.json"),
+    "slots": ("chuk_slots", "summary.json"),
+    "rollups": ("chuk_rollups", "catalog.json"),
+}
 
-# --- Initialization ---
-np.random.seed(42)
-random.seed(42)
-Faker.seed(42)
+ENTITY_SIZES = {
+    "departments": NUM_DEPARTMENTS,
+    "doctors": NUM_DOCTORS,
+    "nurses": NUM_NURSES,
+    "patients": NUM_PATIENTS,
+    "medical_equipment": NUM_MEDICAL_EQUIPMENT,
+    "appointments": NUM_APPOINTMENTS,
+    "admissions": NUM_ADMISSIONS,
+    "medical_records": NUM_MEDICAL_RECORDS,
+    "laboratory_tests": NUM_LABORATORY_TESTS,
+    "prescriptions": NUM_PRESCRIPTIONS,
+    "billing_records": NUM_BILLING_RECORDS
+}
+# Departments follow the fixed list of specialties and are not scaled
+FIXED_SIZE_ENTITIES = ["departments"]
 
-print("Initializing CHUK Healthcare Dataset Generation...")
+# Entities read while generating each entity; --entities loads the ones it
+# does not regenerate from --out-dir. Departments need the doctors for their
+# head doctors, and doctors need the departments they are assigned to.
+ENTITY_DEPENDENCIES = {
+    "departments": ["doctors"],
+    "doctors": ["departments"],
+    "nurses": ["departments"],
+    "patients": [],
+    "medical_equipment": ["departments"],
+    **{name: ["patients", "doctors"] for name in chuk_batch.TIMESERIES_ENTITIES}
+}
+# chuk_pools value pools each entity draws from
+ENTITY_POOLS = {
+    "patients": ["names", "cities", "street_names"],
+    "laboratory_tests": ["names"],
+    "billing_records": ["sentences"],
+}
+# Every entity (and the head doctor assignment) draws from its own random
+# streams, seeded from (seed, stream index), so any subset regenerates
+# exactly as in a full run. Fixed order; append new streams at the end.
+RANDOM_STREAMS = ["departments", "doctors", "nurses", "patients", "medical_equipment", "appointments",
+                  "admissions", "medical_records", "laboratory_tests", "prescriptions", "billing_records",
+                  "head_doctors"]
 
 # --- ID Generators ---
+# Seeded counter-based IDs (see chuk_ids.py); main() creates the sequences
+# from SEED, so IDs are reproducible and never collide.
+ID_SEQUENCES = {}
+
 def generate_patient_id():
-    return f"CHUK_PAT_{uuid.uuid4().hex[:8].upper()}"
+    return ID_SEQUENCES["patients"]()
 
 def generate_doctor_id():
-    return f"CHUK_DOC_{uuid.uuid4().hex[:6].upper()}"
+    return ID_SEQUENCES["doctors"]()
+
+def generate_nurse_id():
+    return ID_SEQUENCES["nurses"]()
+
+def generate_serial_number():
+    return ID_SEQUENCES["equipment_serials"]()
 
 def generate_appointment_id():
-    return f"CHUK_APT_{uuid.uuid4().hex[:10].upper()}"
+    return ID_SEQUENCES["appointments"]()
 
 def generate_admission_id():
-    return f"CHUK_ADM_{uuid.uuid4().hex[:8].upper()}"
+    return ID_SEQUENCES["admissions"]()
 
 def generate_record_id():
-    return f"CHUK_REC_{uuid.uuid4().hex[:10].upper()}"
+    return ID_SEQUENCES["medical_records"]()
 
 def generate_test_id():
-    return f"CHUK_LAB_{uuid.uuid4().hex[:8].upper()}"
+    return ID_SEQUENCES["laboratory_tests"]()
 
 def generate_prescription_id():
-    return f"CHUK_PRX_{uuid.uuid4().hex[:8].upper()}"
+    return ID_SEQUENCES["prescriptions"]()
 
 def generate_bill_id():
-    return f"CHUK_BIL_{uuid.uuid4().hex[:8].upper()}"
+    return ID_SEQUENCES["billing_records"]()
+
+# Seeded Faker value pools (see chuk_pools.py), filled by main()
+POOLS = {}
 
 # --- Helper Functions ---
+def seed_streams(seed, stream):
+    """Reseed the global random and NumPy streams for one RANDOM_STREAMS entry"""
+    stream_seed = int(np.random.SeedSequence([seed, RANDOM_STREAMS.index(stream)]).generate_state(1)[0])
+    np.random.seed(stream_seed)
+    random.seed(stream_seed)
+
+def pool_names(entities, journeys=False):
+    """chuk_pools pools the given entities draw from; journeys generate every time-series entity"""
+    if journeys:
+        entities = list(entities) + chuk_batch.TIMESERIES_ENTITIES
+    return sorted({pool for name in entities for pool in ENTITY_POOLS.get(name, [])})
+
 def get_rwandan_names():
     """Generate realistic Rwandan names"""
     first_names_male = ['Jean', 'Emmanuel', 'Patrick', 'Samuel', 'David', 'Christian', 'Joseph', 'Eric', 
@@ -89,428 +180,383 @@ def get_rwandan_names():
     
     return first_name, last_name, gender
 
-def get_medical_specialties():
-    return ['Cardiology', 'Neurology', 'Oncology', 'Pediatrics', 'Obstetrics', 'Orthopedics', 
-            'Dermatology', 'Emergency Medicine', 'Internal Medicine', 'Surgery', 'Radiology',
-            'Psychiatry', 'Anesthesiology', 'Pathology', 'Family Medicine', 'Infectious Disease',
-            'Gastroenterology', 'Endocrinology', 'Nephrology', 'Pulmonology']
-
-def get_medical_conditions():
-    return ['Hypertension', 'Diabetes Type 2', 'Malaria', 'Tuberculosis', 'HIV/AIDS', 
-            'Pneumonia', 'Gastritis', 'Anemia', 'Arthritis', 'Asthma', 'Hepatitis B',
-            'Typhoid', 'Urinary Tract Infection', 'Respiratory Infection', 'Skin Disease',
-            'Heart Disease', 'Stroke', 'Cancer', 'Kidney Disease', 'Mental Health Disorder']
-
-def get_lab_tests():
-    return ['Complete Blood Count', 'Blood Glucose', 'Liver Function Test', 'Kidney Function Test',
-            'Lipid Profile', 'Thyroid Function', 'HIV Test', 'Hepatitis Panel', 'Malaria Test',
-            'Tuberculosis Test', 'Urinalysis', 'Stool Analysis', 'Chest X-Ray', 'ECG',
-            'Ultrasound', 'CT Scan', 'MRI', 'Blood Culture', 'Pregnancy Test', 'PSA Test']
-
-def get_medications():
-    return ['Paracetamol', 'Amoxicillin', 'Ciprofloxacin', 'Metformin', 'Amlodipine', 
-            'Atenolol', 'Omeprazole', 'Ibuprofen', 'Aspirin', 'Cotrimoxazole',
-            'Artemether-Lumefantrine', 'Efavirenz', 'Tenofovir', 'Iron Tablets', 'Insulin',
-            'Salbutamol', 'Prednisolone', 'Fluconazole', 'Metronidazole', 'Doxycycline']
-
 # --- Department Generation ---
-departments = []
-specialties = get_medical_specialties()
-for dept_id in range(NUM_DEPARTMENTS):
-    department = {
-        "department_id": f"DEPT_{dept_id:03d}",
-        "name": specialties[dept_id] if dept_id < len(specialties) else f"Department {dept_id}",
-        "head_doctor": None,  # Will be assigned later
-        "location": f"Building {random.choice(['A', 'B', 'C', 'D'])}, Floor {random.randint(1, 5)}",
-        "bed_capacity": random.randint(20, 100) if 'Emergency' not in specialties[dept_id] else 50,
-        "equipment_count": random.randint(5, 25),
-        "operational_hours": "24/7" if specialties[dept_id] in ['Emergency Medicine', 'Surgery'] else "08:00-17:00"
-    }
-    departments.append(department)
+def generate_departments(num_departments):
+    departments = []
+    specialties = get_medical_specialties()
+    for dept_id in range(num_departments):
+        name = specialties[dept_id] if dept_id < len(specialties) else f"Department {dept_id}"
+        department = {
+            "department_id": f"DEPT_{dept_id:03d}",
+            "name": name,
+            "head_doctor": None,  # Will be assigned later
+            "location": f"Building {random.choice(['A', 'B', 'C', 'D'])}, Floor {random.randint(1, 5)}",
+            "bed_capacity": random.randint(20, 100) if 'Emergency' not in name else 50,
+            "equipment_count": random.randint(5, 25),
+            "operational_hours": "24/7" if name in ['Emergency Medicine', 'Surgery'] else "08:00-17:00"
+        }
+        departments.append(department)
 
-print(f"Generated {len(departments)} departments")
+    return departments
 
 # --- Medical Staff Generation ---
-doctors = []
-nurses = []
-specialties_list = get_medical_specialties()
-
-# Generate Doctors
-for doc_id in range(NUM_DOCTORS):
-    first_name, last_name, gender = get_rwandan_names()
-    specialty = random.choice(specialties_list)
-    department = random.choice([d for d in departments if d["name"] == specialty or random.random() < 0.3])
+def generate_doctors(num_doctors, departments):
+    """Generate doctors as a chuk_tables.Table"""
+    doctors = []
+    specialties_list = get_medical_specialties()
+    for doc_id in range(num_doctors):
+        first_name, last_name, gender = get_rwandan_names()
+        specialty = random.choice(specialties_list)
+        department = random.choice([d for d in departments if d["name"] == specialty or random.random() < 0.3])
     
-    hire_date = fake.date_time_between(
-        start_date=datetime.datetime(2020, 1, 1),
-        end_date=datetime.datetime(2024, 12, 31)
-    )
+        hire_date = random_datetime(datetime.datetime(2020, 1, 1), datetime.datetime(2024, 12, 31))
     
-    doctor = {
-        "doctor_id": generate_doctor_id(),
-        "first_name": first_name,
-        "last_name": last_name,
-        "gender": gender,
-        "specialty": specialty,
-        "department_id": department["department_id"],
-        "license_number": f"RW_MD_{random.randint(100000, 999999)}",
-        "years_experience": random.randint(2, 30),
-        "education": random.choice(["MD", "MD, PhD", "MD, MSc"]),
-        "hire_date": hire_date.isoformat(),
-        "contact_info": {
-            "phone": f"+250{random.randint(700000000, 799999999)}",
-            "email": f"{first_name.lower()}.{last_name.lower()}@chuk.rw"
-        },
-        "shift_pattern": random.choice(["Day", "Night", "Rotating"]),
-        "consultation_fee": round(random.uniform(15000, 50000), 0)  # RWF
-    }
-    doctors.append(doctor)
-
-# Assign head doctors to departments
-for dept in departments:
-    dept_doctors = [d for d in doctors if d["department_id"] == dept["department_id"]]
-    if dept_doctors:
-        dept["head_doctor"] = random.choice(dept_doctors)["doctor_id"]
-
-# Generate Nurses
-for nurse_id in range(NUM_NURSES):
-    first_name, last_name, gender = get_rwandan_names()
-    department = random.choice(departments)
+        doctor = {
+            "doctor_id": generate_doctor_id(),
+            "first_name": first_name,
+            "last_name": last_name,
+            "gender": gender,
+            "specialty": specialty,
+            "department_id": department["department_id"],
+            "license_number": f"RW_MD_{random.randint(100000, 999999)}",
+            "years_experience": random.randint(2, 30),
+            "education": random.choice(["MD", "MD, PhD", "MD, MSc"]),
+            "hire_date": hire_date.isoformat(),
+            "contact_info": {
+                "phone": f"+250{random.randint(700000000, 799999999)}",
+                "email": f"{first_name.lower()}.{last_name.lower()}@chuk.rw"
+            },
+            "shift_pattern": random.choice(["Day", "Night", "Rotating"]),
+            "consultation_fee": round(random.uniform(15000, 50000), 0)  # RWF
+        }
+        doctors.append(doctor)
+
+    return chuk_tables.Table.from_records("doctors", doctors)
+
+def assign_head_doctors(departments, doctors):
+    """Assign each department a head doctor from the department -> doctors index"""
+    by_department = doctors.groups("department_id")
+    for dept in departments:
+        dept_doctors = by_department.get(dept["department_id"])
+        if dept_doctors is not None:
+            dept["head_doctor"] = doctors[random.choice(dept_doctors.tolist())]["doctor_id"]
+
+def generate_nurses(num_nurses, departments):
+    nurses = []
+    for nurse_id in range(num_nurses):
+        first_name, last_name, gender = get_rwandan_names()
+        department = random.choice(departments)
     
-    hire_date = fake.date_time_between(
-        start_date=datetime.datetime(2018, 1, 1),
-        end_date=datetime.datetime(2024, 12, 31)
-    )
+        hire_date = random_datetime(datetime.datetime(2018, 1, 1), datetime.datetime(2024, 12, 31))
     
-    nurse = {
-        "nurse_id": f"CHUK_NUR_{uuid.uuid4().hex[:6].upper()}",
-        "first_name": first_name,
-        "last_name": last_name,
-        "gender": gender,
-        "department_id": department["department_id"],
-        "license_number": f"RW_RN_{random.randint(100000, 999999)}",
-        "education": random.choice(["Diploma in Nursing", "Bachelor in Nursing", "Advanced Diploma"]),
-        "years_experience": random.randint(1, 25),
-        "hire_date": hire_date.isoformat(),
-        "shift_pattern": random.choice(["Day", "Night", "Rotating"]),
-        "specialization": random.choice(["General", "ICU", "Pediatric", "Surgical", "Emergency"])
-    }
-    nurses.append(nurse)
+        nurse = {
+            "nurse_id": generate_nurse_id(),
+            "first_name": first_name,
+            "last_name": last_name,
+            "gender": gender,
+            "department_id": department["department_id"],
+            "license_number": f"RW_RN_{random.randint(100000, 999999)}",
+            "education": random.choice(["Diploma in Nursing", "Bachelor in Nursing", "Advanced Diploma"]),
+            "years_experience": random.randint(1, 25),
+            "hire_date": hire_date.isoformat(),
+            "shift_pattern": random.choice(["Day", "Night", "Rotating"]),
+            "specialization": random.choice(["General", "ICU", "Pediatric", "Surgical", "Emergency"])
+        }
+        nurses.append(nurse)
 
-print(f"Generated {len(doctors)} doctors and {len(nurses)} nurses")
+    return nurses
 
 # --- Patient Generation ---
-patients = []
-for patient_id in range(NUM_PATIENTS):
-    first_name, last_name, gender = get_rwandan_names()
-    birth_date = fake.date_time_between(
-        start_date=datetime.datetime(1940, 1, 1),
-        end_date=datetime.datetime(2020, 12, 31)
-    )
+def iter_patients(num_patients):
+    for patient_id in range(num_patients):
+        first_name, last_name, gender = get_rwandan_names()
+        birth_date = random_datetime(datetime.datetime(1940, 1, 1), datetime.datetime(2020, 12, 31))
     
-    registration_date = fake.date_time_between(
-        start_date=datetime.datetime(2024, 1, 1),
-        end_date=datetime.datetime(2025, 1, 31)
-    )
+        registration_date = random_datetime(datetime.datetime(2024, 1, 1), datetime.datetime(2025, 1, 31))
     
-    # Calculate age
-    today = datetime.datetime.now()
-    age = today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
+        # Calculate age
+        today = datetime.datetime.now()
+        age = today.year - birth_date.year - ((today.month, today.day) < (birth_date.month, birth_date.day))
     
-    patient = {
-        "patient_id": generate_patient_id(),
-        "first_name": first_name,
-        "last_name": last_name,
-        "date_of_birth": birth_date.date().isoformat(),
-        "age": age,
-        "gender": random.choice(["Male", "Female"]),
-        "blood_type": random.choice(["A+", "A-", "B+", "B-", "AB+", "AB-", "O+", "O-"]),
-        "contact_info": {
-            "phone": f"+250{random.randint(700000000, 799999999)}",
-            "email": f"{first_name.lower()}.{last_name.lower()}@gmail.com" if random.random() < 0.6 else None,
-            "address": {
-                "district": random.choice(["Nyarugenge", "Gasabo", "Kicukiro"]),
-                "sector": fake.city(),
-                "cell": fake.street_name(),
-                "village": fake.street_name()
-            }
-        },
-        "insurance_info": {
-            "type": random.choice(["Mutuelle de Sante", "RAMA", "MMI", "Private", "None"]),
-            "policy_number": f"INS_{random.randint(100000, 999999)}" if random.random() < 0.85 else None,
-            "coverage_percentage": random.choice([0, 80, 90, 100]) if random.random() < 0.85 else 0
-        },
-        "emergency_contact": {
-            "name": fake.name(),
-            "relationship": random.choice(["Spouse", "Parent", "Sibling", "Child", "Friend"]),
-            "phone": f"+250{random.randint(700000000, 799999999)}"
-        },
-        "registration_date": registration_date.isoformat(),
-        "medical_history": random.sample(get_medical_conditions(), k=random.randint(0, 3)),
-        "allergies": random.sample(["Penicillin", "Aspirin", "Latex", "Nuts", "Shellfish"], k=random.randint(0, 2))
-    }
-    patients.append(patient)
-
-print(f"Generated {len(patients)} patients")
+        patient = {
+            "patient_id": generate_patient_id(),
+            "first_name": first_name,
+            "last_name": last_name,
+            "date_of_birth": birth_date.date().isoformat(),
+            "age": age,
+            "gender": random.choice(["Male", "Female"]),
+            "blood_type": random.choice(["A+", "A-", "B+", "B-", "AB+", "AB-", "O+", "O-"]),
+            "contact_info": {
+                "phone": f"+250{random.randint(700000000, 799999999)}",
+                "email": f"{first_name.lower()}.{last_name.lower()}@gmail.com" if random.random() < 0.6 else None,
+                "address": {
+                    "district": random.choice(["Nyarugenge", "Gasabo", "Kicukiro"]),
+                    "sector": random.choice(POOLS["cities"]),
+                    "cell": random.choice(POOLS["street_names"]),
+                    "village": random.choice(POOLS["street_names"])
+                }
+            },
+            "insurance_info": {
+                "type": random.choice(["Mutuelle de Sante", "RAMA", "MMI", "Private", "None"]),
+                "policy_number": f"INS_{random.randint(100000, 999999)}" if random.random() < 0.85 else None,
+                "coverage_percentage": random.choice([0, 80, 90, 100]) if random.random() < 0.85 else 0
+            },
+            "emergency_contact": {
+                "name": random.choice(POOLS["names"]),
+                "relationship": random.choice(["Spouse", "Parent", "Sibling", "Child", "Friend"]),
+                "phone": f"+250{random.randint(700000000, 799999999)}"
+            },
+            "registration_date": registration_date.isoformat(),
+            "medical_history": random.sample(get_medical_conditions(), k=random.randint(0, 3)),
+            "allergies": random.sample(["Penicillin", "Aspirin", "Latex", "Nuts", "Shellfish"], k=random.randint(0, 2))
+        }
+        yield patient
 
 # --- Medical Equipment Generation ---
 equipment_types = ["X-Ray Machine", "CT Scanner", "MRI Machine", "Ultrasound", "ECG Machine", 
                   "Ventilator", "Defibrillator", "Patient Monitor", "Surgical Robot", "Dialysis Machine",
                   "Anesthesia Machine", "Blood Analyzer", "Microscope", "Centrifuge", "Autoclave"]
 
-medical_equipment = []
-for eq_id in range(NUM_MEDICAL_EQUIPMENT):
-    purchase_date = fake.date_time_between(
-        start_date=datetime.datetime(2015, 1, 1),
-        end_date=datetime.datetime(2024, 12, 31)
-    )
+def generate_medical_equipment(num_equipment, departments):
+    medical_equipment = []
+    for eq_id in range(num_equipment):
+        purchase_date = random_datetime(datetime.datetime(2015, 1, 1), datetime.datetime(2024, 12, 31))
     
-    equipment = {
-        "equipment_id": f"CHUK_EQ_{eq_id:04d}",
-        "name": random.choice(equipment_types),
-        "manufacturer": random.choice(["Siemens", "GE Healthcare", "Philips", "Canon", "Mindray"]),
-        "model": f"Model_{random.randint(1000, 9999)}",
-        "serial_number": f"SN_{uuid.uuid4().hex[:8].upper()}",
-        "department_id": random.choice(departments)["department_id"],
-        "purchase_date": purchase_date.isoformat(),
-        "warranty_expiry": (purchase_date + datetime.timedelta(days=random.randint(365, 1825))).isoformat(),
-        "status": random.choice(["Operational", "Under Maintenance", "Out of Service"]),
-        "last_maintenance": fake.date_time_between(
-            start_date=purchase_date,
-            end_date=datetime.datetime.now()
-        ).isoformat(),
-        "usage_hours": random.randint(1000, 50000),
-        "cost": round(random.uniform(50000, 5000000), 0)  # RWF
-    }
-    medical_equipment.append(equipment)
+        equipment = {
+            "equipment_id": f"CHUK_EQ_{eq_id:04d}",
+            "name": random.choice(equipment_types),
+            "manufacturer": random.choice(["Siemens", "GE Healthcare", "Philips", "Canon", "Mindray"]),
+            "model": f"Model_{random.randint(1000, 9999)}",
+            "serial_number": generate_serial_number(),
+            "department_id": random.choice(departments)["department_id"],
+            "purchase_date": purchase_date.isoformat(),
+            "warranty_expiry": (purchase_date + datetime.timedelta(days=random.randint(365, 1825))).isoformat(),
+            "status": random.choice(["Operational", "Under Maintenance", "Out of Service"]),
+            "last_maintenance": random_datetime(purchase_date, datetime.datetime.now()).isoformat(),
+            "usage_hours": random.randint(1000, 50000),
+            "cost": round(random.uniform(50000, 5000000), 0)  # RWF
+        }
+        medical_equipment.append(equipment)
 
-print(f"Generated {len(medical_equipment)} medical equipment items")
+    return medical_equipment
 
 # --- Generate Time-Series Data ---
-appointments = []
-admissions = []
-medical_records = []
-laboratory_tests = []
-prescriptions = []
-billing_records = []
-
-print("Generating time-series medical data...")
-
-start_date = datetime.datetime(2025, 1, 1)
-end_date = datetime.datetime.now()
-
 # Generate Appointments
-for apt_id in range(NUM_APPOINTMENTS):
-    patient = random.choice(patients)
-    doctor = random.choice(doctors)
-    appointment_date = fake.date_time_between(start_date=start_date, end_date=end_date)
+def iter_appointments(n, patients, doctors, start_date, end_date):
+    for apt_id in range(n):
+        patient = random.choice(patients)
+        doctor = random.choice(doctors)
+        appointment_date = random_datetime(start_date, end_date)
     
-    appointment = {
-        "appointment_id": generate_appointment_id(),
-        "patient_id": patient["patient_id"],
-        "doctor_id": doctor["doctor_id"],
-        "department_id": doctor["department_id"],
-        "appointment_date": appointment_date.isoformat(),
-        "appointment_time": f"{random.randint(8, 17):02d}:{random.choice(['00', '30'])}",
-        "type": random.choice(["Consultation", "Follow-up", "Emergency", "Surgery", "Routine Check"]),
-        "status": random.choice(["Scheduled", "Completed", "Cancelled", "No-Show"]),
-        "chief_complaint": random.choice(["Chest pain", "Headache", "Fever", "Cough", "Abdominal pain", 
-                                        "Back pain", "Fatigue", "Shortness of breath"]),
-        "priority": random.choice(["Low", "Medium", "High", "Critical"]),
-        "estimated_duration": random.randint(15, 120),  # minutes
-        "notes": "Patient appointment for " + random.choice(get_medical_conditions()).lower()
-    }
-    appointments.append(appointment)
+        appointment = {
+            "appointment_id": generate_appointment_id(),
+            "patient_id": patient["patient_id"],
+            "doctor_id": doctor["doctor_id"],
+            "department_id": doctor["department_id"],
+            "appointment_date": appointment_date.isoformat(),
+            "appointment_time": f"{random.randint(8, 17):02d}:{random.choice(['00', '30'])}",
+            "type": random.choice(APPOINTMENT_TYPES),
+            "status": random.choice(APPOINTMENT_STATUSES),
+            "chief_complaint": random.choice(APPOINTMENT_COMPLAINTS),
+            "priority": random.choice(APPOINTMENT_PRIORITIES),
+            "estimated_duration": random.randint(15, 120),  # minutes
+            "notes": "Patient appointment for " + random.choice(get_medical_conditions()).lower()
+        }
+        yield appointment
 
 # Generate Admissions
-for adm_id in range(NUM_ADMISSIONS):
-    patient = random.choice(patients)
-    doctor = random.choice(doctors)
-    admission_date = fake.date_time_between(start_date=start_date, end_date=end_date)
+def iter_admissions(n, patients, doctors, start_date, end_date):
+    for adm_id in range(n):
+        patient = random.choice(patients)
+        doctor = random.choice(doctors)
+        admission_date = random_datetime(start_date, end_date)
     
-    # Calculate discharge date (some still admitted)
-    discharge_date = None
-    if random.random() < 0.7:  # 70% discharged
-        discharge_date = admission_date + datetime.timedelta(days=random.randint(1, 30))
-        if discharge_date > datetime.datetime.now():
-            discharge_date = None
+        # Calculate discharge date (some still admitted)
+        discharge_date = None
+        if random.random() < 0.7:  # 70% discharged
+            discharge_date = admission_date + datetime.timedelta(days=random.randint(1, 30))
+            if discharge_date > end_date:
+                discharge_date = None
     
-    admission = {
-        "admission_id": generate_admission_id(),
-        "patient_id": patient["patient_id"],
-        "admitting_doctor_id": doctor["doctor_id"],
-        "department_id": doctor["department_id"],
-        "admission_date": admission_date.isoformat(),
-        "discharge_date": discharge_date.isoformat() if discharge_date else None,
-        "admission_type": random.choice(["Emergency", "Elective", "Transfer", "Observation"]),
-        "room_number": f"{random.randint(1, 5)}{random.randint(10, 99)}",
-        "bed_number": random.randint(1, 4),
-        "primary_diagnosis": random.choice(get_medical_conditions()),
-        "secondary_diagnoses": random.sample(get_medical_conditions(), k=random.randint(0, 2)),
-        "admission_reason": "Admitted for treatment of " + random.choice(get_medical_conditions()).lower(),
-        "discharge_reason": random.choice(["Improved", "Transferred", "Against Medical Advice", "Deceased"]) if discharge_date else None,
-        "total_cost": round(random.uniform(50000, 2000000), 0) if discharge_date else None  # RWF
-    }
-    admissions.append(admission)
+        admission = {
+            "admission_id": generate_admission_id(),
+            "patient_id": patient["patient_id"],
+            "admitting_doctor_id": doctor["doctor_id"],
+            "department_id": doctor["department_id"],
+            "admission_date": admission_date.isoformat(),
+            "discharge_date": discharge_date.isoformat() if discharge_date else None,
+            "admission_type": random.choice(ADMISSION_TYPES),
+            "room_number": f"{random.randint(1, 5)}{random.randint(10, 99)}",
+            "bed_number": random.randint(1, 4),
+            "primary_diagnosis": random.choice(get_medical_conditions()),
+            "secondary_diagnoses": random.sample(get_medical_conditions(), k=random.randint(0, 2)),
+            "admission_reason": "Admitted for treatment of " + random.choice(get_medical_conditions()).lower(),
+            "discharge_reason": random.choice(DISCHARGE_REASONS) if discharge_date else None,
+            "total_cost": round(random.uniform(50000, 2000000), 0) if discharge_date else None  # RWF
+        }
+        yield admission
 
 # Generate Medical Records
-for rec_id in range(NUM_MEDICAL_RECORDS):
-    patient = random.choice(patients)
-    doctor = random.choice(doctors)
-    record_date = fake.date_time_between(start_date=start_date, end_date=end_date)
+def iter_medical_records(n, patients, doctors, start_date, end_date):
+    for rec_id in range(n):
+        patient = random.choice(patients)
+        doctor = random.choice(doctors)
+        record_date = random_datetime(start_date, end_date)
     
-    # Vital signs
-    vital_signs = {
-        "blood_pressure": f"{random.randint(90, 180)}/{random.randint(60, 120)}",
-        "heart_rate": random.randint(60, 120),
-        "temperature": round(random.uniform(36.0, 39.5), 1),
-        "respiratory_rate": random.randint(12, 25),
-        "oxygen_saturation": random.randint(85, 100),
-        "weight": round(random.uniform(40, 120), 1),
-        "height": random.randint(140, 200)
-    }
+        # Vital signs
+        vital_signs = {
+            "blood_pressure": f"{random.randint(90, 180)}/{random.randint(60, 120)}",
+            "heart_rate": random.randint(60, 120),
+            "temperature": round(random.uniform(36.0, 39.5), 1),
+            "respiratory_rate": random.randint(12, 25),
+            "oxygen_saturation": random.randint(85, 100),
+            "weight": round(random.uniform(40, 120), 1),
+            "height": random.randint(140, 200)
+        }
     
-    medical_record = {
-        "record_id": generate_record_id(),
-        "patient_id": patient["patient_id"],
-        "doctor_id": doctor["doctor_id"],
-        "visit_date": record_date.isoformat(),
-        "visit_type": random.choice(["Consultation", "Follow-up", "Emergency", "Routine"]),
-        "chief_complaint": random.choice(["Fever", "Pain", "Cough", "Fatigue", "Nausea"]),
-        "history_of_present_illness": "Patient presents with symptoms of " + random.choice(get_medical_conditions()).lower(),
-        "physical_examination": "Physical exam reveals findings consistent with primary complaint",
-        "vital_signs": vital_signs,
-        "diagnosis": random.choice(get_medical_conditions()),
-        "treatment_plan": "Treatment plan developed based on diagnosis and patient condition",
-        "medications_prescribed": random.sample(get_medications(), k=random.randint(1, 4)),
-        "follow_up_required": random.choice([True, False]),
-        "follow_up_date": (record_date + datetime.timedelta(days=random.randint(7, 30))).isoformat() if random.choice([True, False]) else None
-    }
-    medical_records.append(medical_record)
+        medical_record = {
+            "record_id": generate_record_id(),
+            "patient_id": patient["patient_id"],
+            "doctor_id": doctor["doctor_id"],
+            "visit_date": record_date.isoformat(),
+            "visit_type": random.choice(VISIT_TYPES),
+            "chief_complaint": random.choice(VISIT_COMPLAINTS),
+            "history_of_present_illness": "Patient presents with symptoms of " + random.choice(get_medical_conditions()).lower(),
+            "physical_examination": "Physical exam reveals findings consistent with primary complaint",
+            "vital_signs": vital_signs,
+            "diagnosis": random.choice(get_medical_conditions()),
+            "treatment_plan": "Treatment plan developed based on diagnosis and patient condition",
+            "medications_prescribed": random.sample(get_medications(), k=random.randint(1, 4)),
+            "follow_up_required": random.choice([True, False]),
+            "follow_up_date": (record_date + datetime.timedelta(days=random.randint(7, 30))).isoformat() if random.choice([True, False]) else None
+        }
+        yield medical_record
 
 # Generate Laboratory Tests
-lab_tests_list = get_lab_tests()
-for test_id in range(NUM_LABORATORY_TESTS):
-    patient = random.choice(patients)
-    test_date = fake.date_time_between(start_date=start_date, end_date=end_date)
-    test_name = random.choice(lab_tests_list)
+def iter_laboratory_tests(n, patients, doctors, start_date, end_date):
+    lab_tests_list = get_lab_tests()
+    for test_id in range(n):
+        patient = random.choice(patients)
+        test_date = random_datetime(start_date, end_date)
+        test_name = random.choice(lab_tests_list)
     
-    # Generate realistic test results based on test type
-    test_results = {}
-    if "Blood Count" in test_name:
-        test_results = {
-            "hemoglobin": f"{round(random.uniform(10, 18), 1)} g/dL",
-            "white_blood_cells": f"{random.randint(4000, 12000)} cells/µL",
-            "platelets": f"{random.randint(150000, 400000)} cells/µL"
-        }
-    elif "Glucose" in test_name:
-        test_results = {"glucose_level": f"{round(random.uniform(70, 200), 1)} mg/dL"}
-    elif "HIV" in test_name:
-        test_results = {"result": random.choice(["Negative", "Positive", "Indeterminate"])}
-    else:
-        test_results = {"result": random.choice(["Normal", "Abnormal", "Borderline"])}
+        # Generate realistic test results based on test type
+        test_results = {}
+        if "Blood Count" in test_name:
+            test_results = {
+                "hemoglobin": f"{round(random.uniform(10, 18), 1)} g/dL",
+                "white_blood_cells": f"{random.randint(4000, 12000)} cells/µL",
+                "platelets": f"{random.randint(150000, 400000)} cells/µL"
+            }
+        elif "Glucose" in test_name:
+            test_results = {"glucose_level": f"{round(random.uniform(70, 200), 1)} mg/dL"}
+        elif "HIV" in test_name:
+            test_results = {"result": random.choice(HIV_RESULTS)}
+        else:
+            test_results = {"result": random.choice(GENERIC_RESULTS)}
     
-    laboratory_test = {
-        "test_id": generate_test_id(),
-        "patient_id": patient["patient_id"],
-        "test_name": test_name,
-        "test_date": test_date.isoformat(),
-        "ordered_by": random.choice(doctors)["doctor_id"],
-        "sample_collected_date": test_date.isoformat(),
-        "result_date": (test_date + datetime.timedelta(hours=random.randint(2, 72))).isoformat(),
-        "test_results": test_results,
-        "reference_range": "Within normal limits" if test_results.get("result") == "Normal" else "See detailed report",
-        "status": random.choice(["Completed", "Pending", "In Progress"]),
-        "cost": round(random.uniform(5000, 50000), 0),  # RWF
-        "lab_technician": fake.name()
-    }
-    laboratory_tests.append(laboratory_test)
+        laboratory_test = {
+            "test_id": generate_test_id(),
+            "patient_id": patient["patient_id"],
+            "test_name": test_name,
+            "test_date": test_date.isoformat(),
+            "ordered_by": random.choice(doctors)["doctor_id"],
+            "sample_collected_date": test_date.isoformat(),
+            "result_date": (test_date + datetime.timedelta(hours=random.randint(2, 72))).isoformat(),
+            "test_results": test_results,
+            "reference_range": "Within normal limits" if test_results.get("result") == "Normal" else "See detailed report",
+            "status": random.choice(LAB_STATUSES),
+            "cost": round(random.uniform(5000, 50000), 0),  # RWF
+            "lab_technician": random.choice(POOLS["names"][:chuk_batch.LAB_TECHNICIAN_POOL_SIZE])
+        }
+        yield laboratory_test
 
 # Generate Prescriptions
-medications_list = get_medications()
-for prx_id in range(NUM_PRESCRIPTIONS):
-    patient = random.choice(patients)
-    doctor = random.choice(doctors)
-    prescription_date = fake.date_time_between(start_date=start_date, end_date=end_date)
+def iter_prescriptions(n, patients, doctors, start_date, end_date):
+    medications_list = get_medications()
+    for prx_id in range(n):
+        patient = random.choice(patients)
+        doctor = random.choice(doctors)
+        prescription_date = random_datetime(start_date, end_date)
     
-    # Generate multiple medications per prescription
-    prescription_items = []
-    for _ in range(random.randint(1, 4)):
-        medication = random.choice(medications_list)
-        prescription_items.append({
-            "medication_name": medication,
-            "dosage": random.choice(["250mg", "500mg", "1g", "2.5mg", "5mg", "10mg"]),
-            "frequency": random.choice(["Once daily", "Twice daily", "Three times daily", "Four times daily", "As needed"]),
-            "duration": f"{random.randint(3, 30)} days",
-            "quantity": random.randint(10, 90),
-            "unit_cost": round(random.uniform(500, 10000), 0),  # RWF
-            "total_cost": 0  # Will be calculated
-        })
-        prescription_items[-1]["total_cost"] = prescription_items[-1]["quantity"] * prescription_items[-1]["unit_cost"]
+        # Generate multiple medications per prescription
+        prescription_items = []
+        for _ in range(random.randint(1, 4)):
+            medication = random.choice(medications_list)
+            prescription_items.append({
+                "medication_name": medication,
+                "dosage": random.choice(DOSAGES),
+                "frequency": random.choice(FREQUENCIES),
+                "duration": f"{random.randint(3, 30)} days",
+                "quantity": random.randint(10, 90),
+                "unit_cost": round(random.uniform(500, 10000), 0),  # RWF
+                "total_cost": 0  # Will be calculated
+            })
+            prescription_items[-1]["total_cost"] = prescription_items[-1]["quantity"] * prescription_items[-1]["unit_cost"]
     
-    prescription = {
-        "prescription_id": generate_prescription_id(),
-        "patient_id": patient["patient_id"],
-        "doctor_id": doctor["doctor_id"],
-        "prescription_date": prescription_date.isoformat(),
-        "medications": prescription_items,
-        "total_cost": sum(item["total_cost"] for item in prescription_items),
-        "status": random.choice(["Active", "Completed", "Discontinued"]),
-        "pharmacy_notes": "Dispensed as prescribed" if random.random() < 0.8 else "Partial dispensing due to stock",
-        "refills_remaining": random.randint(0, 3)
-    }
-    prescriptions.append(prescription)
+        prescription = {
+            "prescription_id": generate_prescription_id(),
+            "patient_id": patient["patient_id"],
+            "doctor_id": doctor["doctor_id"],
+            "prescription_date": prescription_date.isoformat(),
+            "medications": prescription_items,
+            "total_cost": sum(item["total_cost"] for item in prescription_items),
+            "status": random.choice(PRESCRIPTION_STATUSES),
+            "pharmacy_notes": "Dispensed as prescribed" if random.random() < 0.8 else "Partial dispensing due to stock",
+            "refills_remaining": random.randint(0, 3)
+        }
+        yield prescription
 
 # Generate Billing Records
-for bill_id in range(NUM_BILLING_RECORDS):
-    patient = random.choice(patients)
-    billing_date = fake.date_time_between(start_date=start_date, end_date=end_date)
-    
-    # Generate multiple services per bill
-    services = []
-    service_types = ["Consultation", "Laboratory Test", "Medication", "Procedure", "Admission", "Surgery"]
+def iter_billing_records(n, patients, doctors, start_date, end_date):
+    patient_ids = patients.column("patient_id").tolist()
+    coverage = patients.column("insurance_info.coverage_percentage").tolist()
+    for bill_id in range(n):
+        patient = random.randrange(len(patient_ids))  # same draw as random.choice(patients)
+        billing_date = random_datetime(start_date, end_date)
     
-    for _ in range(random.randint(1, 5)):
-        service_type = random.choice(service_types)
-        cost = round(random.uniform(5000, 200000), 0)  # RWF
-        services.append({
-            "service_type": service_type,
-            "description": f"{service_type} - {fake.sentence(nb_words=4)}",
-            "cost": cost,
-            "date": billing_date.isoformat()
-        })
+        # Generate multiple services per bill
+        services = []
+        for _ in range(random.randint(1, 5)):
+            service_type = random.choice(SERVICE_TYPES)
+            cost = round(random.uniform(5000, 200000), 0)  # RWF
+            services.append({
+                "service_type": service_type,
+                "description": f"{service_type} - {random.choice(POOLS['sentences'])}",
+                "cost": cost,
+                "date": billing_date.isoformat()
+            })
     
-    subtotal = sum(service["cost"] for service in services)
-    insurance_coverage = patient["insurance_info"]["coverage_percentage"]
-    insurance_amount = round(subtotal * (insurance_coverage / 100), 0) if insurance_coverage > 0 else 0
-    patient_amount = subtotal - insurance_amount
+        subtotal = sum(service["cost"] for service in services)
+        insurance_coverage = coverage[patient]
+        insurance_amount = round(subtotal * (insurance_coverage / 100), 0) if insurance_coverage > 0 else 0
+        patient_amount = subtotal - insurance_amount
     
-    billing_record = {
-        "billing_id": generate_bill_id(),
-        "patient_id": patient["patient_id"],
-        "billing_date": billing_date.isoformat(),
-        "services": services,
-        "subtotal": subtotal,
-        "insurance_coverage_percent": insurance_coverage,
-        "insurance_amount": insurance_amount,
-        "patient_amount": patient_amount,
-        "total_amount": subtotal,
-        "payment_status": random.choice(["Paid", "Pending", "Partial", "Overdue"]),
-        "payment_method": random.choice(["Cash", "Mobile Money", "Bank Transfer", "Insurance", "Credit"]),
-        "invoice_number": f"INV_{random.randint(100000, 999999)}",
-        "due_date": (billing_date + datetime.timedelta(days=30)).isoformat()
-    }
-    billing_records.append(billing_record)
-
-print(f"""
-Generated time-series data:
-- Appointments: {len(appointments):,}
-- Admissions: {len(admissions):,}
-- Medical Records: {len(medical_records):,}
-- Laboratory Tests: {len(laboratory_tests):,}
-- Prescriptions: {len(prescriptions):,}
-- Billing Records: {len(billing_records):,}
-""")
+        billing_record = {
+            "billing_id": generate_bill_id(),
+            "patient_id": patient_ids[patient],
+            "billing_date": billing_date.isoformat(),
+            "services": services,
+            "subtotal": subtotal,
+            "insurance_coverage_percent": insurance_coverage,
+            "insurance_amount": insurance_amount,
+            "patient_amount": patient_amount,
+            "total_amount": subtotal,
+            "payment_status": random.choice(PAYMENT_STATUSES),
+            "payment_method": random.choice(PAYMENT_METHODS),
+            "invoice_number": f"INV_{random.randint(100000, 999999)}",
+            "due_date": (billing_date + datetime.timedelta(days=30)).isoformat()
+        }
+        yield billing_record
+
+RECORD_ITERATORS = {
+    "appointments": iter_appointments,
+    "admissions": iter_admissions,
+    "medical_records": iter_medical_records,
+    "laboratory_tests": iter_laboratory_tests,
+    "prescriptions": iter_prescriptions,
+    "billing_records": iter_billing_records
+}
 
 # --- Data Export ---
 def json_serializer(obj):
@@ -519,79 +565,601 @@ def json_serializer(obj):
         return obj.isoformat()
     raise TypeError(f"Type {type(obj)} not serializable")
 
-print("Saving CHUK Healthcare datasets...")
-
-# Save all datasets
-datasets = {
-    "departments": departments,
-    "doctors": doctors,
-    "nurses": nurses,
-    "patients": patients,
-    "medical_equipment": medical_equipment,
-    "appointments": appointments,
-    "admissions": admissions,
-    "medical_records": medical_records,
-    "laboratory_tests": laboratory_tests,
-    "prescriptions": prescriptions,
-    "billing_records": billing_records
-}
+def report_progress(name, records, total):
+    """Pass records through, printing progress and the records/second rate"""
+    started = last_report = time.perf_counter()
+    count = 0
+    for count, record in enumerate(records, 1):
+        yield record
+        now = time.perf_counter()
+        if now - last_report >= PROGRESS_INTERVAL:
+            last_report = now
+            print(f"  {name}: {count:,}/{total:,} ({count / max(total, 1):.0%}), "
+                  f"{count / (now - started):,.0f} records/s")
+    elapsed = time.perf_counter() - started
+    print(f"- {name}: {count:,} records in {elapsed:.1f}s ({count / max(elapsed, 1e-9):,.0f} records/s)")
+
+def write_reference(name, records, total, out_dir, compress=None):
+    """Write a reference entity as chuk_<name>.json, or in CHUNK_SIZE-record chunk files when larger"""
+    records = iter(records)
+    if total <= CHUNK_SIZE:
+        with chuk_io.open_output(chuk_io.compressed_name(os.path.join(out_dir, f"chuk_{name}.json"), compress),
+                                 compress) as f:
+            json.dump(list(records), f, default=json_serializer, indent=2)
+        return
+    # Save larger datasets in chunks, holding one chunk in memory at a time
+    for i in itertools.count():
+        chunk = list(itertools.islice(records, CHUNK_SIZE))
+        if not chunk:
+            break
+        with chuk_io.open_output(chuk_io.compressed_name(os.path.join(out_dir, f"chuk_{name}_{i}.json"), compress),
+                                 compress) as f:
+            json.dump(chunk, f, default=json_serializer, indent=2)
+
+# --- Command Line ---
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Generate the synthetic CHUK healthcare dataset")
+    parser.add_argument("--scale-factor", type=float, default=None,
+                        help="multiply every entity size except departments (default: 1; with --entities, "
+                             "the sizes in the dataset summary)")
+    for name, size in ENTITY_SIZES.items():
+        parser.add_argument(f"--{name.replace('_', '-')}", type=int, default=None, metavar="N",
+                            help=f"number of {name.replace('_', ' ')} (default: {size:,} x scale factor)")
+    parser.add_argument("--start-date", type=datetime.datetime.fromisoformat, default=None,
+                        help="first timestamp of the time-series data (default: 2025-01-01)")
+    parser.add_argument("--end-date", type=datetime.datetime.fromisoformat, default=None,
+                        help="last timestamp of the time-series data (default: now)")
+    parser.add_argument("--out-dir", default=".", help="directory for the generated files (default: .)")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="generate time-series entities in N worker processes (batch mode only)")
+    parser.add_argument("--shards", type=int, default=None,
+                        help="shards per time-series entity (default: one per worker); output is "
+                             "identical for a given seed and shard count")
+    parser.add_argument("--pool-size", type=int, default=None, metavar="N",
+                        help="values per Faker pool (names, cities, street names, sentences); "
+                             "default: chuk_pools.POOLS sizes")
+    parser.add_argument("--columnar", action="store_true",
+                        help="also export the time-series entities to memory-mappable columns in chuk_columnar/")
+    parser.add_argument("--sqlite", action="store_true",
+                        help="also load every entity into an indexed SQLite database, chuk.sqlite")
+    parser.add_argument("--rowkey", choices=["forward", "reverse"], default=None,
+                        help="also write the time-series entities sorted by patient_id#timestamp row keys "
+                             "to chuk_rowkey/, with forward or reversed (newest first) timestamps")
+    parser.add_argument("--allocate-beds", action="store_true",
+                        help="assign admissions concrete beds within each department's bed_capacity, with "
+                             "transfer/overflow events and occupancy series in chuk_beds/; --append "
+                             "reallocates datasets that were allocated before")
+    parser.add_argument("--book-slots", action="store_true",
+                        help="rebook appointments into free 30-minute slots within each doctor's shift, with "
+                             "slot bitmaps and utilisation reports in chuk_slots/; --append rebooks datasets "
+                             "that were booked before")
+    parser.add_argument("--rollups", action="store_true",
+                        help="also build the operational rollup cubes in chuk_rollups/; --append refreshes "
+                             "existing cubes incrementally")
+    parser.add_argument("--journeys", action="store_true",
+                        help="generate the time-series entities as time-ordered per-patient journeys "
+                             "(appointment, record, tests, prescriptions, admissions, bills) that "
+                             "reference each other by ID, written grouped by patient")
+    parser.add_argument("--compress", choices=list(chuk_io.COMPRESSION), default=None,
+                        help="write every entity file as independently compressed blocks (.gz, .bz2 or .xz) "
+                             "with a block index, compressing in a thread pool")
+    parser.add_argument("--entities", type=lambda value: [name for name in value.split(",") if name],
+                        default=None, metavar="NAME,...",
+                        help="regenerate only these entities in --out-dir (e.g. laboratory_tests,prescriptions), "
+                             "loading the reference entities they depend on from disk; the files are "
+                             "identical to a full run with the same sizes and dates, which default to the "
+                             "dataset summary's")
+    parser.add_argument("--append", action="store_true",
+                        help="extend the dataset in --out-dir from its watermark to --end-date; time-series "
+                             "counts follow the existing per-day rate unless given explicitly")
+    args = parser.parse_args(argv)
+    if args.workers and GENERATION_MODE != "batch":
+        parser.error("--workers requires GENERATION_MODE = \"batch\"")
+    if args.journeys and (GENERATION_MODE != "batch" or args.workers):
+        parser.error("--journeys requires GENERATION_MODE = \"batch\" and runs in a single process")
+    if args.journeys and args.book_slots:
+        parser.error("--book-slots would move appointments away from the journey records that follow them")
+    if args.entities is not None:
+        unknown = [name for name in args.entities if name not in ENTITY_SIZES]
+        if unknown or not args.entities:
+            parser.error(f"--entities takes a comma-separated list of {', '.join(ENTITY_SIZES)}")
+        if args.append:
+            parser.error("--append extends every time-series entity; --entities cannot be given")
+        if args.journeys:
+            parser.error("--journeys generates the time-series entities together; --entities cannot be given")
+        return args
+    if args.scale_factor is None:
+        args.scale_factor = 1.0
+    if args.end_date is None:
+        args.end_date = datetime.datetime.now()
+    if args.append:
+        if args.start_date is not None:
+            parser.error("--append continues from the dataset's watermark; --start-date cannot be given")
+        if args.columnar:
+            parser.error("--append does not refresh the columnar export; rerun chuk_columnar.py afterwards")
+        if args.sqlite:
+            parser.error("--append does not refresh the SQLite export; rerun chuk_sqlite.py afterwards")
+        if args.rowkey:
+            parser.error("--append does not refresh the row-key export; rerun chuk_rowkey.py afterwards")
+        if args.journeys:
+            parser.error("--append draws independent records; it cannot continue --journeys datasets")
+        if args.compress:
+            parser.error("--append keeps the compression the dataset was generated with; drop --compress")
+        return args
+    if args.start_date is None:
+        args.start_date = DEFAULT_START_DATE
+    if args.end_date <= args.start_date:
+        parser.error("--end-date must be after --start-date")
+    return args
+
+def entity_sizes(args, counts=None):
+    """Per-entity record counts after applying the scale factor and explicit overrides.
+
+    counts, the entity counts of an existing dataset, take the place of the
+    default sizes when no scale factor is given.
+    """
+    sizes = {}
+    counts = counts or {}
+    for name, size in ENTITY_SIZES.items():
+        override = getattr(args, name)
+        if override is not None:
+            sizes[name] = override
+        elif args.scale_factor is None and name in counts:
+            sizes[name] = counts[name]
+        elif name in FIXED_SIZE_ENTITIES:
+            sizes[name] = size
+        else:
+            sizes[name] = max(1, round(size * (args.scale_factor or 1.0)))
+    return sizes
+
+def generate_timeseries(args, counts, refs, patients, doctors, start_date, end_date, seed, profiler,
+                        first_keys=None, first_chunks=None):
+    """Stream the time-series entities in counts into NDJSON chunk files; returns {entity: records written}.
+
+    Sequential runs reseed the global NumPy/random streams from seed for each
+    entity (see seed_streams) and take IDs from ID_SEQUENCES. first_keys and
+    first_chunks place an appended window after the existing IDs and chunk files.
+    """
+    first_chunks = first_chunks or {}
+    written = {}
+    if args.journeys:
+        import chuk_journeys
+        # Every patient's journey spans all six entities, so they are one stage
+        with profiler.stage("journeys") as stage:
+            written = chuk_journeys.generate_journeys(refs, counts, start_date, end_date, seed, ID_SEQUENCES,
+                                                      out_dir=args.out_dir, max_records=CHUNK_SIZE,
+                                                      max_bytes=CHUNK_BYTES, default=json_serializer,
+                                                      progress=print, compress=args.compress)
+            stage["records"] = sum(written.values())
+        return written
+    if args.workers:
+        import chuk_shards
+        # Shards run in a process pool, each seeded from the seed and its shard index.
+        # Entities overlap across workers, so they are profiled as one stage.
+        with profiler.stage("timeseries") as stage:
+            sharded = chuk_shards.generate_sharded(refs, counts, start_date, end_date, seed,
+                                                   args.workers, args.shards, out_dir=args.out_dir,
+                                                   max_records=CHUNK_SIZE, max_bytes=CHUNK_BYTES,
+                                                   progress=print, id_seed=SEED, first_keys=first_keys,
+                                                   first_chunks=first_chunks, compress=args.compress)
+            for name, result in sharded.items():
+                written[name] = result["records"]
+                stage["records"] += result["records"]
+                print(f"- {name}: {result['records']:,} records in {len(result['files'])} chunk(s), "
+                      f"{result['bytes'] / 1e6:.1f} MB, {result['records_per_second']:,.0f} records/s")
+        return written
+    for name in chuk_batch.TIMESERIES_ENTITIES:
+        if name not in counts:
+            continue
+        with profiler.stage(name) as stage:
+            seed_streams(seed, name)
+            if GENERATION_MODE == "batch":
+                records = chuk_batch.iter_entity(np.random, name, counts[name], refs,
+                                                 start_date, end_date, ID_SEQUENCES[name])
+            else:
+                records = RECORD_ITERATORS[name](counts[name], patients, doctors, start_date, end_date)
+            with chuk_io.NDJSONChunkWriter(name, out_dir=args.out_dir, max_records=CHUNK_SIZE,
+                                           max_bytes=CHUNK_BYTES, default=json_serializer,
+                                           first_chunk=first_chunks.get(name, 0), compress=args.compress) as writer:
+                writer.write_all(report_progress(name, records, counts[name]))
+            written[name] = stage["records"] = writer.records_written
+            print(f"  {len(writer.files)} chunk(s), {writer.bytes_written / 1e6:.1f} MB")
+    return written
+
+def write_summary(out_dir, entity_counts, start_date, end_date, appends=None, compress=None, journeys=False):
+    """Write chuk_dataset_summary.json, including the watermark an append run continues from.
+
+    With compression, the summary also records the codec and the raw and
+    compressed bytes of every entity. Journey datasets are flagged, since
+    their time-series entities can only be generated together.
+    """
+    summary = {
+        "dataset_info": {
+            "hospital_name": "Centre Hospitalier Universitaire de Kigali (CHUK)",
+            "data_period": f"{start_date.date()} to {end_date.date()}",
+            "generation_date": datetime.datetime.now().isoformat(),
+            "total_records": sum(entity_counts.values()),
+            "start_date": start_date.isoformat(),
+            "watermark": end_date.isoformat()  # end of the time-series window; appends continue here
+        },
+        "entity_counts": entity_counts,
+        "data_quality_notes": [
+            "All patient data is synthetic and complies with privacy regulations",
+            "Medical conditions and treatments are realistic but randomly assigned",
+            "Cost figures are in Rwandan Francs (RWF)",
+            "Time-series data spans from January 2025 to present",
+            "Insurance coverage reflects typical Rwandan health insurance patterns"
+        ]
+    }
+
+    if journeys:
+        summary["journeys"] = True
+    if appends:
+        summary["appends"] = appends
+    if compress:
+        summary["compression"] = {"codec": compress, "block_bytes": chuk_io.COMPRESS_BLOCK_BYTES,
+                                  **chuk_io.compression_summary(out_dir, entity_counts)}
+
+    with open(os.path.join(out_dir, "chuk_dataset_summary.json"), "w") as f:
+        json.dump(summary, f, default=json_serializer, indent=2)
+    return summary
+
+def stage_output_exists(out_dir, stage):
+    """Whether out_dir already holds the output of a derived stage in STAGE_MARKERS"""
+    return os.path.exists(os.path.join(out_dir, *STAGE_MARKERS[stage]))
+
+def pool_sizes(args):
+    if args.pool_size is None:
+        return None
+    return {name: args.pool_size for name in chuk_pools.POOLS}
+
+def append_window(args):
+    """Extend an existing dataset with the time-series records of [watermark, --end-date)"""
+    out_dir = args.out_dir
+    summary = chuk_append.load_summary(out_dir)
+    data_start, watermark = chuk_append.data_window(summary)
+    end_date = args.end_date
+    if end_date <= watermark:
+        raise SystemExit(f"--end-date {end_date} must be after the dataset watermark {watermark}")
+    if summary.get("journeys"):
+        raise SystemExit("The dataset was generated with --journeys; --append draws independent records "
+                         "and cannot continue it")
+    overrides = {name: getattr(args, name) for name in chuk_batch.TIMESERIES_ENTITIES}
+    counts = chuk_append.window_counts(summary, chuk_batch.TIMESERIES_ENTITIES, watermark, end_date, overrides)
+    entity_counts = summary["entity_counts"]
+    # The window gets its own random streams; IDs keep the dataset seed and
+    # continue after the existing keys, so they never collide with earlier ones.
+    seed = chuk_append.window_seed(SEED, watermark)
+    args.compress = summary.get("compression", {}).get("codec")
+
+    print(f"Appending {watermark} to {end_date} to {os.path.abspath(out_dir)}: {sum(counts.values()):,} records")
+    profiler = chuk_bench.StageProfiler(out_dir)
+
+    with profiler.stage("setup"):
+        np.random.seed(seed)
+        random.seed(seed)
+        POOLS.update(chuk_pools.build_pools(SEED, pool_sizes(args), names=pool_names(chuk_batch.TIMESERIES_ENTITIES)))
+        ID_SEQUENCES.update({name: chuk_ids.IdSequence(name, SEED, start=entity_counts.get(name, 0))
+                             for name in chuk_batch.TIMESERIES_ENTITIES})
+
+    with profiler.stage("references") as stage:
+        doctors = chuk_tables.load_table("doctors", out_dir)
+        patients, refs = [], None
+        if GENERATION_MODE == "batch":
+            patient_ids, patient_coverage = chuk_append.load_patient_columns(out_dir)
+            refs = chuk_batch.build_refs(patient_ids, patient_coverage, doctors, POOLS)
+            stage["records"] = len(patient_ids) + len(doctors)
+        else:
+            patients = chuk_tables.load_table("patients", out_dir)
+            stage["records"] = len(patients) + len(doctors)
+
+    with profiler.stage("open_admissions") as stage:
+        closed = chuk_append.close_open_admissions(out_dir, np.random, watermark, end_date)
+        stage["records"] = closed
+        print(f"Discharged {closed:,} admissions that were open at the watermark")
+
+    first_chunks = {name: chuk_append.next_chunk_index(name, out_dir) for name in chuk_batch.TIMESERIES_ENTITIES}
+    written = generate_timeseries(args, counts, refs, patients, doctors, watermark, end_date, seed, profiler,
+                                  first_keys={name: entity_counts.get(name, 0) for name in counts},
+                                  first_chunks=first_chunks)
+
+    if args.allocate_beds or stage_output_exists(out_dir, "beds"):
+        import chuk_beds
+        with profiler.stage("beds") as stage:
+            beds = chuk_beds.allocate_dataset(out_dir, watermark=end_date)
+            stage["records"] = beds["admissions"]
+            chuk_beds.print_summary(beds)
+
+    if args.book_slots or stage_output_exists(out_dir, "slots"):
+        import chuk_slots
+        with profiler.stage("slots") as stage:
+            slots = chuk_slots.book_dataset(out_dir)
+            stage["records"] = slots["appointments"]
+            chuk_slots.print_summary(slots)
+
+    with profiler.stage("export"):
+        for name, records in written.items():
+            entity_counts[name] = entity_counts.get(name, 0) + records
+        appends = summary.get("appends", []) + [{
+            "start": watermark.isoformat(),
+            "end": end_date.isoformat(),
+            "records": written,
+            "closed_admissions": closed,
+            "appended_at": datetime.datetime.now().isoformat(),
+        }]
+        write_summary(out_dir, entity_counts, data_start, end_date, appends, args.compress)
+        if args.rollups or stage_output_exists(out_dir, "rollups"):
+            import chuk_rollups
+            print("Refreshing rollups...")
+            refreshed = chuk_rollups.RollupEngine(out_dir).refresh()
+            print(f"Refreshed {sum(entry['buckets'] for entry in refreshed.values()):,} rollup day buckets "
+                  f"from {sum(entry['chunks'] for entry in refreshed.values())} chunk file(s)")
 
-for name, data in datasets.items():
-    # Save smaller datasets as single files
-    if len(data) <= 50000:
-        with open(f"chuk_{name}.json", "w") as f:
-            json.dump(data, f, default=json_serializer, indent=2)
+    profiler.write(mode="append", workers=args.workers, generation_mode=GENERATION_MODE, window_counts=counts)
+    print(f"Appended {sum(written.values()):,} records; the dataset now runs to {end_date} "
+          f"({sum(entity_counts.values()):,} records)")
+
+def resolve_entities(requested, out_dir):
+    """(entities to generate, entities to load from out_dir) for the requested entities.
+
+    Dependencies that are not regenerated are loaded from disk, or generated
+    as well when out_dir has no files for them. Both lists follow ENTITY_SIZES.
+    """
+    generate = set(requested)
+    while True:
+        missing = {dependency for name in generate for dependency in ENTITY_DEPENDENCIES[name]
+                   if dependency not in generate and not chuk_io.entity_files(dependency, out_dir)}
+        if not missing:
+            break
+        generate |= missing
+    load = {dependency for name in generate for dependency in ENTITY_DEPENDENCIES[name]} - generate
+    return [name for name in ENTITY_SIZES if name in generate], [name for name in ENTITY_SIZES if name in load]
+
+def selective_defaults(args):
+    """Fill in the dates and compression of an --entities run from the dataset summary, if any; returns it"""
+    summary = None
+    if os.path.exists(os.path.join(args.out_dir, chuk_append.SUMMARY_FILE)):
+        summary = chuk_append.load_summary(args.out_dir)
+        data_start, watermark = chuk_append.data_window(summary)
+        args.start_date = args.start_date or data_start
+        args.end_date = args.end_date or watermark
+        codec = summary.get("compression", {}).get("codec")
+        if args.compress not in (None, codec):
+            raise SystemExit(f"--compress {args.compress} differs from the dataset's compression ({codec or 'none'})")
+        args.compress = codec
+        if summary.get("appends") and set(args.entities) & set(chuk_batch.TIMESERIES_ENTITIES):
+            raise SystemExit("The dataset was extended with --append; its time-series entities cannot be "
+                             "regenerated as one window")
+        if summary.get("journeys") and set(args.entities) & set(chuk_batch.TIMESERIES_ENTITIES):
+            raise SystemExit("The dataset was generated with --journeys; its time-series entities reference "
+                             "each other and cannot be regenerated one by one")
+    args.start_date = args.start_date or DEFAULT_START_DATE
+    args.end_date = args.end_date or datetime.datetime.now()
+    if args.end_date <= args.start_date:
+        raise SystemExit("--end-date must be after --start-date")
+    return summary
+
+def remove_entity_files(name, out_dir):
+    """Delete the files (and block indexes) of an entity that is about to be regenerated"""
+    for path in chuk_io.entity_files(name, out_dir):
+        os.remove(path)
+        if os.path.exists(path + chuk_io.INDEX_SUFFIX):
+            os.remove(path + chuk_io.INDEX_SUFFIX)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.append:
+        return append_window(args)
+    out_dir = args.out_dir
+    os.makedirs(out_dir, exist_ok=True)
+    summary = selective_defaults(args) if args.entities is not None else None
+    sizes = entity_sizes(args, summary["entity_counts"] if summary else None)
+    start_date, end_date = args.start_date, args.end_date
+    # A full run generates everything; --entities adds missing dependencies
+    # and loads the others from disk
+    entities, loaded = resolve_entities(args.entities or list(ENTITY_SIZES), out_dir)
+
+    print("Initializing CHUK Healthcare Dataset Generation...")
+    if args.entities is None:
+        print(f"Scale factor {args.scale_factor:g}: {sum(sizes.values()):,} records "
+              f"from {start_date.date()} to {end_date.date()} into {os.path.abspath(out_dir)}")
     else:
-        # Save larger datasets in chunks
-        CHUNK_SIZE = 50000
-        for i in range(0, len(data), CHUNK_SIZE):
-            chunk = data[i:i+CHUNK_SIZE]
-            with open(f"chuk_{name}_{i//CHUNK_SIZE}.json", "w") as f:
-                json.dump(chunk, f, default=json_serializer, indent=2)
-
-# Generate summary statistics
-summary = {
-    "dataset_info": {
-        "hospital_name": "Centre Hospitalier Universitaire de Kigali (CHUK)",
-        "data_period": f"{start_date.date()} to {end_date.date()}",
-        "generation_date": datetime.datetime.now().isoformat(),
-        "total_records": sum(len(data) for data in datasets.values())
-    },
-    "entity_counts": {name: len(data) for name, data in datasets.items()},
-    "data_quality_notes": [
-        "All patient data is synthetic and complies with privacy regulations",
-        "Medical conditions and treatments are realistic but randomly assigned",
-        "Cost figures are in Rwandan Francs (RWF)",
-        "Time-series data spans from January 2025 to present",
-        "Insurance coverage reflects typical Rwandan health insurance patterns"
-    ]
-}
+        print(f"Regenerating {', '.join(entities)}: {sum(sizes[name] for name in entities):,} records "
+              f"from {start_date.date()} to {end_date.date()} in {os.path.abspath(out_dir)}")
+    profiler = chuk_bench.StageProfiler(out_dir)
+
+    # --- Initialization ---
+    # Every entity reseeds its own streams (seed_streams), so only the pools
+    # and ID sequences are set up here
+    with profiler.stage("setup"):
+        POOLS.update(chuk_pools.build_pools(SEED, pool_sizes(args), names=pool_names(entities, args.journeys)))
+        ID_SEQUENCES.update(chuk_ids.id_sequences(SEED))
+        for name in entities:
+            remove_entity_files(name, out_dir)
+
+    print("Saving CHUK Healthcare datasets...")
+    entity_counts = dict(summary["entity_counts"]) if summary else {}
+
+    # Patients are streamed to disk; batch mode keeps only the columns the
+    # time-series generators index into, records mode keeps a compact table.
+    departments = doctors = None
+    nurses = []
+    patients = chuk_tables.Table("patients")
+    patient_ids = []
+    patient_coverage = []
+    patient_registration = []
+
+    if loaded:
+        with profiler.stage("references") as stage:
+            if "departments" in loaded:
+                departments = list(chuk_io.iter_entity("departments", out_dir))
+                entity_counts["departments"] = len(departments)
+            if "doctors" in loaded:
+                doctors = chuk_tables.load_table("doctors", out_dir)
+                entity_counts["doctors"] = len(doctors)
+            if "patients" in loaded:
+                if GENERATION_MODE == "batch":
+                    patient_ids, patient_coverage = chuk_append.load_patient_columns(out_dir)
+                    entity_counts["patients"] = len(patient_ids)
+                else:
+                    patients = chuk_tables.load_table("patients", out_dir)
+                    entity_counts["patients"] = len(patients)
+            stage["records"] = sum(entity_counts[name] for name in loaded)
+            print(f"Loaded {', '.join(loaded)} from {os.path.abspath(out_dir)}")
+
+    if "departments" in entities:
+        with profiler.stage("departments") as stage:
+            seed_streams(SEED, "departments")
+            departments = generate_departments(sizes["departments"])
+            print(f"Generated {len(departments)} departments")
+            stage["records"] = len(departments)
+
+    staff = [name for name in ["departments", "doctors", "nurses"] if name in entities]
+    if staff:
+        with profiler.stage("staff") as stage:
+            if "doctors" in entities:
+                seed_streams(SEED, "doctors")
+                doctors = generate_doctors(sizes["doctors"], departments)
+                print(f"Generated {len(doctors)} doctors")
+            if "nurses" in entities:
+                seed_streams(SEED, "nurses")
+                nurses = generate_nurses(sizes["nurses"], departments)
+                print(f"Generated {len(nurses)} nurses")
+            if "departments" in entities:
+                seed_streams(SEED, "head_doctors")
+                assign_head_doctors(departments, doctors)
+            # Departments are written here, once their head doctors are assigned
+            tables = {"departments": departments, "doctors": doctors, "nurses": nurses}
+            for name in staff:
+                records = tables[name].records() if name == "doctors" else tables[name]
+                write_reference(name, records, len(tables[name]), out_dir, args.compress)
+                entity_counts[name] = len(tables[name])
+            stage["records"] = sum(entity_counts[name] for name in staff if name != "departments")
 
-with open("chuk_dataset_summary.json", "w") as f:
-    json.dump(summary, f, default=json_serializer, indent=2)
+    def collect_patients(records):
+        for patient in records:
+            if GENERATION_MODE == "batch":
+                patient_ids.append(patient["patient_id"])
+                patient_coverage.append(patient["insurance_info"]["coverage_percentage"])
+                if args.journeys:
+                    patient_registration.append(patient["registration_date"])
+            else:
+                patients.append(patient)
+            yield patient
 
-print(f"""
+    if "patients" in entities:
+        with profiler.stage("patients") as stage:
+            seed_streams(SEED, "patients")
+            write_reference("patients", report_progress("patients", collect_patients(iter_patients(sizes["patients"])),
+                                                        sizes["patients"]),
+                            sizes["patients"], out_dir, args.compress)
+            patients.freeze()
+            entity_counts["patients"] = stage["records"] = sizes["patients"]
+
+    if "medical_equipment" in entities:
+        with profiler.stage("medical_equipment") as stage:
+            seed_streams(SEED, "medical_equipment")
+            medical_equipment = generate_medical_equipment(sizes["medical_equipment"], departments)
+            print(f"Generated {len(medical_equipment)} medical equipment items")
+            write_reference("medical_equipment", medical_equipment, len(medical_equipment), out_dir, args.compress)
+            entity_counts["medical_equipment"] = stage["records"] = len(medical_equipment)
+
+    timeseries_counts = {name: sizes[name] for name in chuk_batch.TIMESERIES_ENTITIES if name in entities}
+    if timeseries_counts:
+        print("Generating time-series medical data...")
+        refs = None
+        if GENERATION_MODE == "batch":
+            # Whole columns are drawn with the seeded NumPy generator, one block at a
+            # time, and assembled into records as the writer consumes them.
+            refs = chuk_batch.build_refs(patient_ids, patient_coverage, doctors, POOLS,
+                                         patient_registration if args.journeys else None)
+            del patient_ids[:], patient_coverage[:], patient_registration[:]
+
+        entity_counts.update(generate_timeseries(args, timeseries_counts, refs, patients, doctors,
+                                                 start_date, end_date, SEED, profiler))
+
+        print("\nGenerated time-series data:")
+        for name in timeseries_counts:
+            print(f"- {name.replace('_', ' ').title()}: {entity_counts[name]:,}")
+        print()
+
+    # A selective run refreshes the bed, slot and rollup outputs the dataset already has
+    selective = args.entities is not None
+    if args.allocate_beds or (selective and "admissions" in entities and stage_output_exists(out_dir, "beds")):
+        import chuk_beds
+        with profiler.stage("beds") as stage:
+            print("Allocating beds...")
+            beds = chuk_beds.allocate_dataset(out_dir, watermark=end_date)
+            stage["records"] = beds["admissions"]
+            chuk_beds.print_summary(beds)
+
+    if args.book_slots or (selective and "appointments" in entities and stage_output_exists(out_dir, "slots")):
+        import chuk_slots
+        with profiler.stage("slots") as stage:
+            print("Booking appointment slots...")
+            slots = chuk_slots.book_dataset(out_dir)
+            stage["records"] = slots["appointments"]
+            chuk_slots.print_summary(slots)
+
+    with profiler.stage("export") as stage:
+        if args.columnar:
+            import chuk_columnar
+            print("Writing columnar export...")
+            chuk_columnar.export_dataset(out_dir, os.path.join(out_dir, "chuk_columnar"))
+            stage["records"] = sum(timeseries_counts.values())
+        if args.sqlite:
+            import chuk_sqlite
+            print("Writing SQLite export...")
+            chuk_sqlite.export_dataset(out_dir, os.path.join(out_dir, "chuk.sqlite"))
+            stage["records"] += sum(entity_counts.values())
+        if args.rowkey:
+            import chuk_rowkey
+            print("Writing row-key sorted export...")
+            chuk_rowkey.export_dataset(out_dir, os.path.join(out_dir, chuk_rowkey.ROWKEY_DIR), order=args.rowkey)
+            stage["records"] += sum(timeseries_counts.values())
+        if args.rollups or (selective and stage_output_exists(out_dir, "rollups")):
+            import chuk_rollups
+            print("Building rollups...")
+            chuk_rollups.RollupEngine(out_dir).refresh()
+        journeys = args.journeys or bool(summary and summary.get("journeys"))
+        summary = write_summary(out_dir, entity_counts, start_date, end_date, compress=args.compress,
+                                journeys=journeys)
+        if args.compress:
+            compression = summary["compression"]
+            print(f"Compressed with {args.compress}: {compression['raw_bytes'] / 1e6:,.1f} MB -> "
+                  f"{compression['compressed_bytes'] / 1e6:,.1f} MB ({compression['ratio']:.1f}x)")
+
+    profiler.write(scale_factor=args.scale_factor, workers=args.workers,
+                   generation_mode=GENERATION_MODE, entity_sizes=sizes, entities=entities)
+
+    if selective:
+        print(f"Regenerated {', '.join(f'{name} ({entity_counts[name]:,})' for name in entities)}; "
+              f"the dataset now holds {sum(entity_counts.values()):,} records")
+        return
+
+    print(f"""
 🏥 CHUK Healthcare Dataset Generation Complete! 🏥
 
 Dataset Summary:
-- Departments: {len(departments):,}
-- Medical Staff: {len(doctors) + len(nurses):,} (Doctors: {len(doctors)}, Nurses: {len(nurses)})
-- Patients: {len(patients):,}
-- Medical Equipment: {len(medical_equipment):,}
-- Appointments: {len(appointments):,}
-- Admissions: {len(admissions):,}
-- Medical Records: {len(medical_records):,}
-- Laboratory Tests: {len(laboratory_tests):,}
-- Prescriptions: {len(prescriptions):,}
-- Billing Records: {len(billing_records):,}
-
-Total Records: {sum(len(data) for data in datasets.values()):,}
+- Departments: {entity_counts["departments"]:,}
+- Medical Staff: {entity_counts["doctors"] + entity_counts["nurses"]:,} (Doctors: {entity_counts["doctors"]:,}, Nurses: {entity_counts["nurses"]:,})
+- Patients: {entity_counts["patients"]:,}
+- Medical Equipment: {entity_counts["medical_equipment"]:,}
+- Appointments: {entity_counts["appointments"]:,}
+- Admissions: {entity_counts["admissions"]:,}
+- Medical Records: {entity_counts["medical_records"]:,}
+- Laboratory Tests: {entity_counts["laboratory_tests"]:,}
+- Prescriptions: {entity_counts["prescriptions"]:,}
+- Billing Records: {entity_counts["billing_records"]:,}
+
+Total Records: {sum(entity_counts.values()):,}
 
 Files generated:
-- chuk_laboratory_tests.json (or chunked files if large)
-- chuk_prescriptions.json (or chunked files if large)
-- chuk_billing_records.json (or chunked files if large)
+- chuk_<entity>.json for departments, staff, patients and equipment
+- chuk_<entity>_<N>.ndjson chunks for the time-series entities (one record per line)
+- with --compress, every entity file gets a .gz/.bz2/.xz suffix and a .idx block index
 - chuk_dataset_summary.json
+- chuk_profile.json (time, CPU, memory and bytes written per stage)
 
 🔍 Key Features for Big Data Analytics:
 
@@ -639,7 +1207,10 @@ Perfect for your thesis requirements:
 
 To run this generator:
 1. Install dependencies: pip install faker numpy
-2. Run: python chuk_healthcare_dataset_generator.py
-3. Wait for generation to complete (may take several minutes)
+2. Run: python dataset-CHUK.py [--scale-factor N] [--out-dir DIR] [--workers N] [--entities NAME,...]
+3. Progress and records/second are reported for each entity as it is written
 4. Use generated JSON files for your MongoDB, HBase, and Spark implementations
 """)
+
+if __name__ == "__main__":
+    main()